@@ -0,0 +1,359 @@
+from array import array
+from collections.abc import Mapping
+
+
+class ActionType:
+    MOUSE_MOVE = "mouse_move"
+    MOUSE_CLICK = "mouse_click"
+    MOUSE_SCROLL = "mouse_scroll"
+    KEY_PRESS = "key_press"
+    KEY_RELEASE = "key_release"
+    DELAY = "delay"
+
+# Numeric type codes stored in ActionBuffer.kinds and in binary macro files
+MOUSE_MOVE = 1
+MOUSE_CLICK = 2
+MOUSE_SCROLL = 3
+KEY_PRESS = 4
+KEY_RELEASE = 5
+DELAY = 6
+
+TYPE_CODES = {
+    ActionType.MOUSE_MOVE: MOUSE_MOVE,
+    ActionType.MOUSE_CLICK: MOUSE_CLICK,
+    ActionType.MOUSE_SCROLL: MOUSE_SCROLL,
+    ActionType.KEY_PRESS: KEY_PRESS,
+    ActionType.KEY_RELEASE: KEY_RELEASE,
+    ActionType.DELAY: DELAY,
+}
+CODE_TYPES = {code: action_type for action_type, code in TYPE_CODES.items()}
+
+# Kinds whose code column holds a string table id
+NAMED_KINDS = (MOUSE_CLICK, KEY_PRESS, KEY_RELEASE)
+
+NS_PER_SECOND = 1_000_000_000
+
+
+def seconds_to_ns(seconds):
+    """Convert a time in float seconds (older macros) to integer nanoseconds"""
+    return round(float(seconds) * NS_PER_SECOND)
+
+
+def parse_seconds_ns(text):
+    """Parse seconds ("90.5") or minutes and seconds ("1:30.5") into nanoseconds, "" into None"""
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        minutes, _, seconds = text.rpartition(":")
+        return round((int(minutes or 0) * 60 + float(seconds)) * NS_PER_SECOND)
+    except ValueError:
+        raise ValueError(f"Not a time: {text}") from None
+
+
+# Column name -> array typecode. Times are integer nanoseconds since the recording
+# started. Which other columns an action uses depends on its kind:
+#   move: x, y | click: x, y, code=button id, value=1.0 down / 0.0 up
+#   scroll: x, y, code=amount | key press/release: code=key id | delay: value=duration
+COLUMNS = (
+    ("kinds", "B"),
+    ("times", "q"),
+    ("xs", "i"),
+    ("ys", "i"),
+    ("codes", "i"),
+    ("values", "d"),
+)
+
+
+class ActionView(Mapping):
+    """Read-only dict-like view of one action inside an ActionBuffer.
+
+    Views are only valid until the buffer is edited before their index.
+    """
+    __slots__ = ("buffer", "index")
+
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def kind(self):
+        return self.buffer.kinds[self.index]
+
+    def _keys(self):
+        kind = self.kind
+        if kind == MOUSE_MOVE:
+            return ("type", "time_ns", "time", "position")
+        if kind == MOUSE_CLICK:
+            return ("type", "time_ns", "time", "position", "button", "state")
+        if kind == MOUSE_SCROLL:
+            return ("type", "time_ns", "time", "position", "amount")
+        if kind == DELAY:
+            return ("type", "time_ns", "time", "duration")
+        return ("type", "time_ns", "time", "key")
+
+    def __getitem__(self, key):
+        buffer = self.buffer
+        index = self.index
+        if key not in self._keys():
+            raise KeyError(key)
+        if key == "type":
+            return CODE_TYPES[buffer.kinds[index]]
+        if key == "time_ns":
+            return buffer.times[index]
+        if key == "time":
+            # Seconds, kept for older versions reading newer macros
+            return buffer.times[index] / NS_PER_SECOND
+        if key == "position":
+            return (buffer.xs[index], buffer.ys[index])
+        if key == "button" or key == "key":
+            return buffer.strings[buffer.codes[index]]
+        if key == "state":
+            return "down" if buffer.values[index] else "up"
+        if key == "amount":
+            return buffer.codes[index]
+        return buffer.values[index]
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __repr__(self):
+        return f"ActionView({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Copy the action into a plain dict"""
+        return {key: self[key] for key in self._keys()}
+
+
+class ActionBuffer:
+    """Compact action store with one typed array per field.
+
+    Behaves like a list of actions: supports len, indexing (yielding
+    ActionView objects), slicing, iteration, append, insert and delete.
+    Key and button names are interned into a shared string table.
+    """
+
+    def __init__(self, actions=None):
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+        self.strings = []
+        self.string_ids = {}
+        self.revision = 0  # Bumped on every edit so caches know when to rebuild
+        self.metadata = {}  # Saved with the macro, e.g. recording statistics
+        if actions is not None:
+            self.extend(actions)
+
+    @classmethod
+    def coerce(cls, actions):
+        """Return actions as an ActionBuffer, converting lists of dicts"""
+        if isinstance(actions, cls):
+            return actions
+        return cls(actions)
+
+    def intern(self, value):
+        """Return the id of a key or button name in the string table"""
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            string_id = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def columns(self):
+        """Return the column arrays in COLUMNS order"""
+        return [getattr(self, name) for name, _ in COLUMNS]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield ActionView(self, index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            result = ActionBuffer()
+            result.strings = list(self.strings)
+            result.string_ids = dict(self.string_ids)
+            result.metadata = dict(self.metadata)
+            for name, _ in COLUMNS:
+                setattr(result, name, getattr(self, name)[index])
+            return result
+
+        if index < 0:
+            index += len(self.kinds)
+        if not 0 <= index < len(self.kinds):
+            raise IndexError("action index out of range")
+        return ActionView(self, index)
+
+    def __delitem__(self, index):
+        for column in self.columns():
+            del column[index]
+        self.revision += 1
+
+    def __repr__(self):
+        return f"ActionBuffer({len(self)} actions)"
+
+    def _row(self, action):
+        """Convert a dict or view into a tuple of column values"""
+        if isinstance(action, ActionView):
+            source = action.buffer
+            index = action.index
+            kind = source.kinds[index]
+            code = source.codes[index]
+            if kind in NAMED_KINDS:
+                code = self.intern(source.strings[code])
+            return (kind, source.times[index], source.xs[index], source.ys[index],
+                    code, source.values[index])
+
+        kind = TYPE_CODES.get(action["type"])
+        if kind is None:
+            raise ValueError(f"Unknown action type: {action['type']}")
+
+        x = y = code = 0
+        value = 0.0
+        if kind in (MOUSE_MOVE, MOUSE_CLICK, MOUSE_SCROLL):
+            x, y = action["position"]
+            x, y = int(x), int(y)
+        if kind == MOUSE_CLICK:
+            code = self.intern(action["button"])
+            value = 1.0 if action["state"] == "down" else 0.0
+        elif kind == MOUSE_SCROLL:
+            code = int(action["amount"])
+        elif kind in (KEY_PRESS, KEY_RELEASE):
+            code = self.intern(action["key"])
+        elif kind == DELAY:
+            value = float(action["duration"])
+        # Macros saved before nanosecond timestamps only have "time" in seconds
+        if "time_ns" in action:
+            time_ns = int(action["time_ns"])
+        else:
+            time_ns = seconds_to_ns(action.get("time", 0))
+        return (kind, time_ns, x, y, code, value)
+
+    def _append_row(self, kind, time_ns, x=0, y=0, code=0, value=0.0):
+        self.kinds.append(kind)
+        self.times.append(time_ns)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.codes.append(code)
+        self.values.append(value)
+        self.revision += 1
+
+    def append(self, action):
+        """Append a dict or ActionView"""
+        self._append_row(*self._row(action))
+
+    def extend(self, actions):
+        if isinstance(actions, ActionBuffer):
+            self._extend_buffer(actions)
+            return
+        for action in actions:
+            self.append(action)
+
+    def _extend_buffer(self, other):
+        """Append another buffer column by column, remapping its string ids"""
+        mapping = [self.intern(value) for value in other.strings]
+        codes = other.codes
+        if any(new_id != old_id for old_id, new_id in enumerate(mapping)):
+            codes = array("i", (mapping[code] if kind in NAMED_KINDS else code
+                                for kind, code in zip(other.kinds, other.codes)))
+
+        for name, _ in COLUMNS:
+            column = codes if name == "codes" else getattr(other, name)
+            getattr(self, name).extend(column)
+        self.revision += 1
+
+    def insert(self, index, action):
+        """Insert a dict or ActionView before index"""
+        for column, value in zip(self.columns(), self._row(action)):
+            column.insert(index, value)
+        self.revision += 1
+
+    def pop(self, index=-1):
+        """Remove an action and return it as a dict"""
+        action = self[index].to_dict()
+        del self[index]
+        return action
+
+    def clear(self):
+        del self[:]
+
+    def append_move(self, time_ns, x, y):
+        self._append_row(MOUSE_MOVE, time_ns, int(x), int(y))
+
+    def append_click(self, time_ns, x, y, button, state):
+        self._append_row(MOUSE_CLICK, time_ns, int(x), int(y), self.intern(button),
+                         1.0 if state == "down" else 0.0)
+
+    def append_scroll(self, time_ns, x, y, amount):
+        self._append_row(MOUSE_SCROLL, time_ns, int(x), int(y), int(amount))
+
+    def append_key(self, kind, time_ns, key):
+        self._append_row(kind, time_ns, code=self.intern(key))
+
+    def append_delay(self, time_ns, duration):
+        self._append_row(DELAY, time_ns, value=duration)
+
+    def to_list(self):
+        """Copy all actions into a list of plain dicts (for JSON)"""
+        return [view.to_dict() for view in self]
+
+
+class LazyChunk:
+    """Stand-in for one chunk of a file, decoded when its columns are used.
+
+    reader is a ContainerReader or JournalReader: it gives the chunk sizes
+    in counts and decodes chunks with chunk(number). Attribute access is
+    forwarded to the decoded ActionBuffer, so editor documents, views and
+    playback plans can use it like any chunk.
+    """
+    lazy = True
+
+    def __init__(self, reader, number):
+        self.reader = reader
+        self.number = number
+        self.count = reader.counts[number]
+
+    def load(self):
+        return self.reader.chunk(self.number)
+
+    def __len__(self):
+        return self.count
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __getitem__(self, index):
+        return self.load()[index]
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __repr__(self):
+        return f"LazyChunk({self.reader.path!r}, {self.number})"
+
+
+def format_action(action):
+    """One-line description of an action for the actions list"""
+    action_type = action.get("type", "")
+    if action_type == ActionType.MOUSE_MOVE:
+        x, y = action.get("position", (0, 0))
+        return f"Move to ({x}, {y})"
+    elif action_type == ActionType.MOUSE_CLICK:
+        x, y = action.get("position", (0, 0))
+        btn = action.get("button", "left").capitalize()
+        state = "Press" if action.get("state") == "down" else "Release"
+        return f"Mouse {btn} {state} at ({x}, {y})"
+    elif action_type == ActionType.MOUSE_SCROLL:
+        x, y = action.get("position", (0, 0))
+        return f"Scroll: {action.get('amount', 0)} at ({x}, {y})"
+    elif action_type == ActionType.KEY_PRESS:
+        return f"Key Press: {action.get('key', '')}"
+    elif action_type == ActionType.KEY_RELEASE:
+        return f"Key Release: {action.get('key', '')}"
+    elif action_type == ActionType.DELAY:
+        return f"Delay: {action.get('duration', 0):.2f}s"
+    return f"Unknown Action: {action_type}"
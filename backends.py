@@ -0,0 +1,351 @@
+"""Input backends used by Recorder and Player.
+
+A backend injects mouse/keyboard events for playback and delivers real
+input events to the recorder. Mouse buttons are passed around as names
+("left", "right", "middle") and key events as objects with ``name`` and
+``event_type`` ("down"/"up") attributes, like the keyboard library's events.
+"""
+import threading
+import time
+from collections import namedtuple
+
+KEY_DOWN = "down"
+KEY_UP = "up"
+
+KeyEvent = namedtuple("KeyEvent", ["name", "event_type"])
+
+
+class InputBackend:
+    """Interface shared by all input backends"""
+
+    # Playback side
+    def position(self):
+        raise NotImplementedError
+
+    def move_to(self, x, y):
+        raise NotImplementedError
+
+    def mouse_down(self, button):
+        raise NotImplementedError
+
+    def mouse_up(self, button):
+        raise NotImplementedError
+
+    def scroll(self, amount):
+        raise NotImplementedError
+
+    def key_down(self, key):
+        raise NotImplementedError
+
+    def key_up(self, key):
+        raise NotImplementedError
+
+    def prepare_playback(self):
+        """Called before a playback run starts"""
+
+    def finish_playback(self):
+        """Called after a playback run, even if it failed"""
+
+    # Recording side
+    def start_listening(self, on_move=None, on_click=None, on_scroll=None, on_key=None):
+        """Deliver input events to the callbacks until stop_listening is called.
+
+        on_move(x, y), on_click(x, y, button, pressed), on_scroll(x, y, dx, dy), on_key(event)
+        """
+        raise NotImplementedError
+
+    def stop_listening(self):
+        raise NotImplementedError
+
+    def add_hotkey(self, hotkey, callback):
+        """Register a hotkey and return a handle that removes only this registration"""
+        raise NotImplementedError
+
+    def remove_hotkey(self, handle):
+        raise NotImplementedError
+
+
+class PyAutoGuiBackend(InputBackend):
+    """Real input through pyautogui, keyboard and pynput"""
+
+    def __init__(self):
+        # Imported here so headless tools only load them when they really drive the desktop.
+        # keyboard is needed right away for the hotkeys, the heavier pyautogui and
+        # pynput wait until the first playback or recording.
+        import keyboard
+        self.keyboard = keyboard
+        self._pyautogui = None
+        self._mouse_listener_class = None
+        self.mouse_listener = None
+        self.key_hook = None
+        self.saved_settings = None
+
+    @property
+    def pyautogui(self):
+        if self._pyautogui is None:
+            import pyautogui
+            self._pyautogui = pyautogui
+        return self._pyautogui
+
+    @property
+    def MouseListener(self):
+        if self._mouse_listener_class is None:
+            from pynput.mouse import Listener
+            self._mouse_listener_class = Listener
+        return self._mouse_listener_class
+
+    def position(self):
+        return self.pyautogui.position()
+
+    def move_to(self, x, y):
+        self.pyautogui.moveTo(x, y)
+
+    def mouse_down(self, button):
+        self.pyautogui.mouseDown(button=button)
+
+    def mouse_up(self, button):
+        self.pyautogui.mouseUp(button=button)
+
+    def scroll(self, amount):
+        self.pyautogui.scroll(amount)
+
+    def key_down(self, key):
+        self.keyboard.press(key)
+
+    def key_up(self, key):
+        self.keyboard.release(key)
+
+    def prepare_playback(self):
+        # Save original pyautogui settings
+        self.saved_settings = (self.pyautogui.PAUSE, self.pyautogui.FAILSAFE)
+
+        # Configure pyautogui for playback
+        self.pyautogui.PAUSE = 0  # We'll handle delays ourselves
+        self.pyautogui.FAILSAFE = True  # Keep failsafe enabled
+
+        # Disable pyautogui's internal delay between actions
+        self.pyautogui.MINIMUM_DURATION = 0
+        self.pyautogui.MINIMUM_SLEEP = 0
+
+    def finish_playback(self):
+        # Restore original pyautogui settings
+        if self.saved_settings is not None:
+            self.pyautogui.PAUSE, self.pyautogui.FAILSAFE = self.saved_settings
+            self.saved_settings = None
+
+    def start_listening(self, on_move=None, on_click=None, on_scroll=None, on_key=None):
+        def click(x, y, button, pressed):
+            on_click(x, y, button.name, pressed)
+
+        self.mouse_listener = self.MouseListener(
+            on_move=on_move,
+            on_click=click if on_click else None,
+            on_scroll=on_scroll
+        )
+        self.mouse_listener.start()
+
+        if on_key is not None:
+            self.key_hook = self.keyboard.hook(on_key)
+
+    def stop_listening(self):
+        if self.mouse_listener is not None:
+            self.mouse_listener.stop()
+            self.mouse_listener = None
+
+        # Only remove our own hook, the app's hotkeys stay registered
+        if self.key_hook is not None:
+            try:
+                self.keyboard.unhook(self.key_hook)
+            except (KeyError, ValueError):
+                pass
+            self.key_hook = None
+
+    def add_hotkey(self, hotkey, callback):
+        # keyboard returns a remover for this registration, removing by name could
+        # drop the app's own hotkey on the same key
+        return self.keyboard.add_hotkey(hotkey, callback)
+
+    def remove_hotkey(self, handle):
+        try:
+            self.keyboard.remove_hotkey(handle)
+        except (KeyError, ValueError):
+            pass
+
+
+# keyboard library key names that pyautogui spells differently
+XTEST_KEY_NAMES = {
+    "left shift": "shiftleft", "right shift": "shiftright",
+    "left ctrl": "ctrlleft", "right ctrl": "ctrlright",
+    "left alt": "altleft", "right alt": "altright", "alt gr": "altright",
+    "windows": "win", "left windows": "winleft", "right windows": "winright",
+    "control": "ctrl", "return": "enter", "escape": "esc", "spacebar": "space",
+}
+
+
+class XDisplayBackend(PyAutoGuiBackend):
+    """Playback only backend that sends keys through pyautogui as well.
+
+    The keyboard library injects through /dev/uinput whatever DISPLAY says,
+    so batch workers on their own X display send keys with XTest instead.
+    """
+
+    def __init__(self):
+        self.keyboard = None
+        self._pyautogui = None
+        self._mouse_listener_class = None
+        self.mouse_listener = None
+        self.key_hook = None
+        self.saved_settings = None
+
+    def _key_name(self, key):
+        name = XTEST_KEY_NAMES.get(key, key)
+        if name not in self.pyautogui.KEY_NAMES:
+            name = name.replace(" ", "")
+        if name not in self.pyautogui.KEY_NAMES:
+            raise ValueError(f"Key {key!r} cannot be sent to an X display")
+        return name
+
+    def key_down(self, key):
+        self.pyautogui.keyDown(self._key_name(key))
+
+    def key_up(self, key):
+        self.pyautogui.keyUp(self._key_name(key))
+
+    def start_listening(self, on_move=None, on_click=None, on_scroll=None, on_key=None):
+        raise NotImplementedError("XDisplayBackend only plays macros")
+
+    def stop_listening(self):
+        pass
+
+    def add_hotkey(self, hotkey, callback):
+        raise NotImplementedError("XDisplayBackend only plays macros")
+
+    def remove_hotkey(self, handle):
+        pass
+
+
+class MemoryBackend(InputBackend):
+    """Backend that injects nothing and logs every event instead.
+
+    Each entry in ``events`` is (perf_counter_ns timestamp, event name, args).
+    Useful to time playback on machines without a display.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.current_position = (0, 0)
+        self.hotkeys = {}
+        self.prepared = False
+
+    def _log(self, name, *args):
+        self.events.append((time.perf_counter_ns(), name, args))
+
+    def position(self):
+        return self.current_position
+
+    def move_to(self, x, y):
+        self.current_position = (x, y)
+        self._log("move_to", x, y)
+
+    def mouse_down(self, button):
+        self._log("mouse_down", button)
+
+    def mouse_up(self, button):
+        self._log("mouse_up", button)
+
+    def scroll(self, amount):
+        self._log("scroll", amount)
+
+    def key_down(self, key):
+        self._log("key_down", key)
+
+    def key_up(self, key):
+        self._log("key_up", key)
+
+    def prepare_playback(self):
+        self.prepared = True
+
+    def finish_playback(self):
+        self.prepared = False
+
+    def start_listening(self, on_move=None, on_click=None, on_scroll=None, on_key=None):
+        pass
+
+    def stop_listening(self):
+        pass
+
+    def add_hotkey(self, hotkey, callback):
+        handle = (hotkey, callback)
+        self.hotkeys[handle] = callback
+        return handle
+
+    def remove_hotkey(self, handle):
+        self.hotkeys.pop(handle, None)
+
+    def clear(self):
+        self.events = []
+
+
+class SyntheticBackend(MemoryBackend):
+    """Backend that feeds a synthetic event stream into the recorder.
+
+    ``stream`` is a list of (offset seconds, event, args) tuples where event
+    is "move" (x, y), "click" (x, y, button, pressed), "scroll" (x, y, dx, dy)
+    or "key" (name, "down"/"up"). Once listening starts the events are
+    delivered from a background thread at their offsets, scaled by
+    ``time_scale`` (0 delivers them as fast as possible).
+    """
+
+    def __init__(self, stream, time_scale=1.0):
+        super().__init__()
+        self.stream = stream
+        self.time_scale = time_scale
+        self.thread = None
+        self.stopped = threading.Event()
+        self.finished = threading.Event()
+        self.delivered = 0
+
+    def start_listening(self, on_move=None, on_click=None, on_scroll=None, on_key=None):
+        callbacks = {"move": on_move, "click": on_click, "scroll": on_scroll, "key": on_key}
+        self.stopped.clear()
+        self.finished.clear()
+        self.delivered = 0
+        self.thread = threading.Thread(target=self._feed, args=(callbacks,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _feed(self, callbacks):
+        start = time.perf_counter()
+        try:
+            for offset, event, args in self.stream:
+                if self.stopped.is_set():
+                    break
+
+                if self.time_scale:
+                    remaining = start + offset * self.time_scale - time.perf_counter()
+                    if remaining > 0 and self.stopped.wait(remaining):
+                        break
+
+                if event in ("move", "click", "scroll"):
+                    self.current_position = (args[0], args[1])
+
+                callback = callbacks.get(event)
+                if callback is None:
+                    continue
+                if event == "key":
+                    callback(KeyEvent(*args))
+                else:
+                    callback(*args)
+                self.delivered += 1
+        finally:
+            self.finished.set()
+
+    def stop_listening(self):
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def wait(self, timeout=None):
+        """Block until the whole stream has been delivered"""
+        return self.finished.wait(timeout)
@@ -0,0 +1,178 @@
+"""Play many macros in parallel, one worker process per display.
+
+Each worker binds to one X display (for example a separate Xvfb server)
+before the input libraries are imported, keeps a single Player and plays
+the macros handed to it one after another. Mouse and keys both go through
+pyautogui, so they land on the worker's display. Timing stats and failures of
+every job are collected into one JSON report.
+
+Usage: python -m batch a.pcr b.json c.pcr --displays :1,:2 [--loops N] [--speed X]
+                       [--report report.json] [--backend memory]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+
+# Per worker process state, set up by _init_worker
+_worker = {}
+
+
+def _init_worker(displays, backend_name):
+    """Claim a display for this worker process"""
+    display = displays.get() if displays is not None else None
+    if display:
+        # Must happen before pyautogui/pynput are imported, they connect on import
+        os.environ["DISPLAY"] = display
+    _worker["display"] = os.environ.get("DISPLAY")
+    _worker["backend_name"] = backend_name
+    _worker["player"] = None
+
+
+def _worker_player():
+    player = _worker.get("player")
+    if player is None:
+        # Imported here so the parent process never loads the input libraries
+        from player import Player
+        if _worker.get("backend_name") == "memory":
+            from backends import MemoryBackend
+            backend = MemoryBackend()
+        else:
+            # Keys through XTest too, the keyboard module would type on the real session
+            from backends import XDisplayBackend
+            backend = XDisplayBackend()
+        player = _worker["player"] = Player(None, backend)
+    return player
+
+
+def play_job(macro, loops=1, speed=1.0):
+    """Play one macro in the current worker and return its report entry"""
+    from macro_io import load_actions
+    from journal import is_journal_path, JournalReader
+
+    result = {
+        "macro": macro,
+        "display": _worker.get("display"),
+        "pid": os.getpid(),
+        "ok": False,
+        "error": None,
+        "load_s": None,
+        "timing": None,
+    }
+    try:
+        start = time.perf_counter()
+        actions = JournalReader(macro) if is_journal_path(macro) else load_actions(macro)
+        result["load_s"] = time.perf_counter() - start
+        if not actions:
+            raise ValueError("macro contains no actions")
+
+        player = _worker_player()
+        if hasattr(player.backend, "clear"):
+            player.backend.clear()  # Memory backend: do not keep every job's events
+        result["timing"] = player.play(actions, loops, speed)
+        result["ok"] = result["timing"] is not None
+        if not result["ok"]:
+            result["error"] = "player busy"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def run_batch(macros, displays=None, workers=None, loops=1, speed=1.0, backend_name=None):
+    """Fan the macros out over worker processes and return the report dict"""
+    if displays:
+        workers = len(displays)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(macros)))
+
+    display_queue = None
+    if displays:
+        display_queue = multiprocessing.Queue()
+        for display in displays:
+            display_queue.put(display)
+
+    jobs = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(display_queue, backend_name)) as executor:
+        futures = {executor.submit(play_job, macro, loops, speed): macro for macro in macros}
+        for future in as_completed(futures):
+            try:
+                jobs.append(future.result())
+            except Exception as e:
+                # The worker process itself died
+                jobs.append({"macro": futures[future], "ok": False,
+                             "error": f"{type(e).__name__}: {e}", "timing": None})
+    elapsed = time.perf_counter() - start
+
+    jobs.sort(key=lambda job: macros.index(job["macro"]))
+    actions = sum(job["timing"]["count"] for job in jobs if job.get("timing"))
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "workers": workers,
+        "displays": displays or [],
+        "elapsed_s": elapsed,
+        "summary": {
+            "jobs": len(jobs),
+            "ok": sum(1 for job in jobs if job["ok"]),
+            "failed": sum(1 for job in jobs if not job["ok"]),
+            "actions": actions,
+            "actions_per_s": actions / elapsed if elapsed else 0.0,
+        },
+        "jobs": jobs,
+    }
+
+
+def print_report(report):
+    for job in report["jobs"]:
+        if job["ok"]:
+            timing = job["timing"]
+            print(f"OK   {job['macro']} on {job.get('display')}: {timing['count']} actions, "
+                  f"{timing['elapsed_s']:.3f} s, max late {timing['max_ms']:.2f} ms")
+        else:
+            print(f"FAIL {job['macro']} on {job.get('display')}: {job['error']}")
+    summary = report["summary"]
+    print(f"{summary['ok']}/{summary['jobs']} jobs ok on {report['workers']} worker(s) "
+          f"in {report['elapsed_s']:.3f} s ({summary['actions_per_s']:.0f} actions/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m batch",
+        description="Play many PyClickerRecorder macros in parallel worker processes."
+    )
+    parser.add_argument("macros", nargs="+", help="Macro files (.json, .pcr or .pcj)")
+    parser.add_argument("--displays", help="Comma separated X displays, one worker each (e.g. :1,:2)")
+    parser.add_argument("--workers", type=int,
+                        help="Number of worker processes when no displays are given (default: CPU count)")
+    parser.add_argument("--loops", type=int, default=1, help="Loops per macro (default: 1)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed factor (default: 1.0)")
+    parser.add_argument("--report", help="Write the JSON report to this file")
+    parser.add_argument("--backend", choices=("pyautogui", "memory"), default="pyautogui",
+                        help="Input backend; memory only times the playback (default: pyautogui)")
+    args = parser.parse_args(argv)
+
+    if args.speed <= 0:
+        print("Speed must be greater than 0", file=sys.stderr)
+        return EXIT_ERROR
+    if args.loops < 0:
+        print("Batch jobs need a finite loop count", file=sys.stderr)
+        return EXIT_ERROR
+
+    displays = [display.strip() for display in args.displays.split(",")] if args.displays else None
+    report = run_batch(args.macros, displays, args.workers, args.loops, args.speed, args.backend)
+
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return EXIT_OK if report["summary"]["failed"] == 0 else EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
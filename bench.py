@@ -0,0 +1,215 @@
+"""Benchmarks for recording, playback, serialization and list rendering.
+
+Runs without a display by driving Recorder and Player through the in-memory
+input backends. Results are printed (or written) as JSON so runs can be
+compared between releases.
+
+Usage: python bench.py [--output results.json] [--sizes 10000,100000,1000000] [--quick]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from actions import ActionBuffer, format_action
+from backends import MemoryBackend, SyntheticBackend
+from macro_io import save_actions, load_actions
+from player import Player
+from recorder import Recorder
+
+RECORD_RATES = (100, 1000, 10000)
+DEFAULT_SIZES = (10000, 100000, 1000000)
+QUICK_SIZES = (10000, 100000)
+
+
+def synthetic_actions(count):
+    """A macro of roughly count actions: mostly moves with delays, clicks and keys"""
+    buffer = ActionBuffer()
+    t = 0
+    for i in range(count):
+        t += 1_000_000  # 1 ms, times are in nanoseconds
+        step = i % 20
+        if step == 5:
+            buffer.append_delay(t, 0.06)
+        elif step == 10:
+            buffer.append_click(t, i % 1920, i % 1080, "left", "down")
+        elif step == 11:
+            buffer.append_click(t, i % 1920, i % 1080, "left", "up")
+        elif step == 15:
+            buffer.append_key(4, t, "a")
+        elif step == 16:
+            buffer.append_key(5, t, "a")
+        else:
+            buffer.append_move(t, i % 1920, i % 1080)
+    return buffer
+
+
+def synthetic_stream(rate, duration):
+    """Mouse moves along a diagonal at rate events per second, with a click every second"""
+    stream = []
+    count = int(rate * duration)
+    for i in range(count):
+        offset = i / rate
+        stream.append((offset, "move", (i % 1920, (i * 2) % 1080)))
+        if i % rate == rate - 1:
+            stream.append((offset, "click", (i % 1920, (i * 2) % 1080, "left", True)))
+            stream.append((offset, "click", (i % 1920, (i * 2) % 1080, "left", False)))
+    return stream
+
+
+def bench_recording(duration):
+    results = []
+    for rate in RECORD_RATES:
+        stream = synthetic_stream(rate, duration)
+        backend = SyntheticBackend(stream)
+        recorder = Recorder(None, backend)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        recorder.start_recording()
+        backend.wait()
+        recorder.stop_recording()
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+
+        results.append({
+            "rate_hz": rate,
+            "events": len(stream),
+            "recorded_actions": len(recorder.actions),
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "cpu_us_per_event": cpu / len(stream) * 1e6 if stream else 0.0,
+        })
+    return results
+
+
+def bench_playback(count):
+    actions = synthetic_actions(count)
+
+    # Real-time run: how close to their deadlines the actions start
+    backend = MemoryBackend()
+    timing = Player(None, backend).play(actions)
+
+    # Deadlines all in the past: pure dispatch cost per action
+    backend = MemoryBackend()
+    start = time.perf_counter()
+    Player(None, backend).play(actions, delay_factor=1e9)
+    dispatch = time.perf_counter() - start
+
+    return {
+        "actions": count,
+        "timing_error": timing,
+        "dispatch_us_per_action": dispatch / count * 1e6,
+        "backend_events": len(backend.events),
+    }
+
+
+def bench_serialization(sizes):
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for size in sizes:
+            actions = synthetic_actions(size)
+            for extension in (".pcr", ".json"):
+                path = os.path.join(folder, "macro" + extension)
+
+                start = time.perf_counter()
+                save_actions(path, actions)
+                saved = time.perf_counter()
+                loaded = load_actions(path)
+                done = time.perf_counter()
+
+                results.append({
+                    "format": extension.lstrip("."),
+                    "actions": size,
+                    "save_s": saved - start,
+                    "load_s": done - saved,
+                    "file_bytes": os.path.getsize(path),
+                    "round_trip_ok": len(loaded) == size,
+                })
+    return results
+
+
+def bench_list_rendering(sizes, visible_rows=40):
+    results = []
+    try:
+        import tkinter as tk
+        from widgets import VirtualListbox
+        root = tk.Tk()
+        root.withdraw()
+    except Exception as e:
+        root = None
+        skipped = str(e)
+
+    for size in sizes:
+        actions = synthetic_actions(size)
+        entry = {"actions": size}
+
+        # Formatting cost of one screen of rows, the work a refresh does
+        start = time.perf_counter()
+        for index in range(min(visible_rows, size)):
+            format_action(actions[index])
+        entry["format_visible_rows_s"] = time.perf_counter() - start
+
+        if root is None:
+            entry["listbox"] = {"skipped": skipped}
+        else:
+            listbox = VirtualListbox(root, format_action, height=visible_rows)
+            start = time.perf_counter()
+            listbox.set_items(actions)
+            root.update_idletasks()
+            entry["listbox_populate_s"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            listbox.see(size - 1)
+            root.update_idletasks()
+            entry["listbox_jump_to_end_s"] = time.perf_counter() - start
+            listbox.destroy()
+        results.append(entry)
+
+    if root is not None:
+        root.destroy()
+    return results
+
+
+def run(sizes, record_duration, playback_actions):
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "recording": bench_recording(record_duration),
+        "playback": bench_playback(playback_actions),
+        "serialization": bench_serialization(sizes),
+        "list_rendering": bench_list_rendering(sizes),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PyClickerRecorder hot paths.")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--sizes", help="Comma separated macro sizes for serialization and list benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Skip the largest sizes")
+    parser.add_argument("--record-duration", type=float, default=1.0,
+                        help="Seconds of synthetic input per recording rate (default: 1.0)")
+    parser.add_argument("--playback-actions", type=int, default=2000,
+                        help="Actions in the playback benchmark macro (default: 2000)")
+    args = parser.parse_args(argv)
+
+    if args.sizes:
+        sizes = [int(size) for size in args.sizes.split(",")]
+    else:
+        sizes = QUICK_SIZES if args.quick else DEFAULT_SIZES
+
+    results = run(sizes, args.record_duration, args.playback_actions)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
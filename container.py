@@ -0,0 +1,283 @@
+"""Chunked macro container (.pcc) for recordings too big to load at once.
+
+Layout: a fixed header, then the chunks, then a trailer with the seek table,
+the string table and the metadata. The header gives the offset of the
+trailer and the seek table has one entry per chunk: file offset, byte
+length, index and time of the first action, and action count. Each chunk is
+the ActionBuffer columns of up to chunk_size actions, compressed on its own,
+with key and button ids pointing into the shared string table.
+
+ContainerReader memory-maps the file and reads only the header and the
+trailer up front. Chunks are decoded when first used and the most recently
+used ones are kept, so opening a file is instant whatever its size and
+memory use depends on the chunks in use.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from actions import ActionBuffer, LazyChunk, COLUMNS
+from macro_io import (default_codec, compress_body, decompress_body, encode_strings,
+                      decode_strings, column_bytes, STRING_COUNT,
+                      METADATA_LENGTH)
+
+CONTAINER_EXTENSION = ".pcc"
+MAGIC = b"PCRC"
+CONTAINER_VERSION = 1
+CHUNK_SIZE = 4096
+CACHE_CHUNKS = 32
+
+# magic, version, codec, reserved, action count, chunk size, chunk count, trailer offset
+HEADER = struct.Struct("<4sBBHQIIQ")
+# file offset, byte length, first action index, action count, first action time
+SEEK_ENTRY = struct.Struct("<QIQIq")
+
+
+def is_container_path(filename):
+    """Check if a filename uses the container extension"""
+    return os.path.splitext(filename)[1].lower() == CONTAINER_EXTENSION
+
+
+class ContainerWriter:
+    """Writes actions to a container chunk by chunk.
+
+    Only one chunk of actions is held in memory; the seek table, strings and
+    metadata are written by close().
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE, codec=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.codec = default_codec() if codec is None else codec
+        self.count = 0
+        self.entries = []
+        # Pending actions intern their names straight into the shared string table
+        self.pending = ActionBuffer()
+        self.strings = self.pending.strings
+        self.string_ids = self.pending.string_ids
+
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, CONTAINER_VERSION, self.codec, 0, 0, chunk_size, 0, 0))
+
+    def write(self, actions):
+        """Append a buffer, chunk or list of actions"""
+        self.pending.extend(actions)
+        self._flush(final=False)
+
+    def close(self, metadata=None):
+        """Write the last chunk and the trailer, then fill in the header"""
+        self._flush(final=True)
+        if len(self.strings) > 0xFFFF:
+            raise ValueError("Too many distinct keys and buttons for the container format")
+
+        trailer_offset = self.file.tell()
+        self.file.write(b"".join(SEEK_ENTRY.pack(*entry) for entry in self.entries))
+        self.file.write(encode_strings(self.strings))
+        encoded = json.dumps(metadata or {}).encode("utf-8")
+        self.file.write(METADATA_LENGTH.pack(len(encoded)) + encoded)
+
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, CONTAINER_VERSION, self.codec, 0, self.count,
+                                    self.chunk_size, len(self.entries), trailer_offset))
+        self.file.close()
+
+    def _flush(self, final):
+        pending = self.pending
+        start = 0
+        while len(pending) - start >= self.chunk_size or (final and start < len(pending)):
+            stop = min(start + self.chunk_size, len(pending))
+            body = b"".join(column_bytes(column[start:stop]) for column in pending.columns())
+            body = compress_body(body, self.codec)
+            self.entries.append((self.file.tell(), len(body), self.count, stop - start,
+                                 pending.times[start]))
+            self.file.write(body)
+            self.count += stop - start
+            start = stop
+        if start:
+            for column in pending.columns():
+                del column[:start]
+
+
+def save_container(path, actions, chunk_size=CHUNK_SIZE, codec=None):
+    """Write a whole macro as a container, streaming documents and readers chunk by chunk.
+
+    The file is written next to the target and renamed over it. When the
+    target is the container the actions are read from, that reader is
+    closed before the rename (Windows cannot replace an open, mapped file),
+    so the caller has to open the saved file again. Returns True then.
+    """
+    temporary = path + ".tmp"
+    writer = ContainerWriter(temporary, chunk_size, codec)
+    try:
+        if hasattr(actions, "iter_chunks"):
+            for chunk in actions.iter_chunks():
+                writer.write(chunk)
+        else:
+            writer.write(ActionBuffer.coerce(actions))
+        writer.close(getattr(actions, "metadata", None))
+    except BaseException:
+        writer.file.close()
+        os.remove(temporary)
+        raise
+
+    replaced = [reader for reader in source_readers(actions)
+                if os.path.exists(path) and os.path.samefile(reader.path, path)]
+    for reader in replaced:
+        reader.close()
+    os.replace(temporary, path)
+    return bool(replaced)
+
+
+def source_readers(actions):
+    """Container readers that actions (a reader or an editor document) read from"""
+    if isinstance(actions, ContainerReader):
+        return {actions}
+    if hasattr(actions, "lazy_sources"):
+        return {source for source in actions.lazy_sources() if isinstance(source, ContainerReader)}
+    return set()
+
+
+class ContainerReader:
+    """Memory-mapped container, decoding chunks on demand into an LRU cache"""
+
+    def __init__(self, path, cache_chunks=CACHE_CHUNKS):
+        self.path = path
+        self.cache_chunks = cache_chunks
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()  # The GUI and the playback thread share the cache
+
+        self.file = open(path, "rb")
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self):
+        if os.path.getsize(self.path) < HEADER.size:
+            raise ValueError("Not a PyClicker container file")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, codec, _, count, chunk_size, chunk_count, trailer_offset = \
+            HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a PyClicker container file")
+        if version != CONTAINER_VERSION:
+            raise ValueError(f"Unsupported container version: {version}")
+        if not trailer_offset:
+            raise ValueError("Incomplete container file, it was never closed")
+        table_end = trailer_offset + chunk_count * SEEK_ENTRY.size
+        if table_end + STRING_COUNT.size > len(self.map):
+            raise ValueError("Corrupt container file: truncated seek table")
+        self.codec = codec
+        self.count = count
+        self.chunk_size = chunk_size
+
+        self.offsets = array("Q")
+        self.lengths = array("I")
+        self.first_indices = array("q")
+        self.counts = array("I")
+        self.first_times = array("q")
+        for offset, length, first_index, chunk_count, first_time in \
+                SEEK_ENTRY.iter_unpack(self.map[trailer_offset:table_end]):
+            self.offsets.append(offset)
+            self.lengths.append(length)
+            self.first_indices.append(first_index)
+            self.counts.append(chunk_count)
+            self.first_times.append(first_time)
+
+        tail = self.map[table_end:]
+        try:
+            self.strings, offset = decode_strings(tail)
+            (length,) = METADATA_LENGTH.unpack_from(tail, offset)
+        except struct.error:
+            raise ValueError("Corrupt container file: truncated trailer") from None
+        self.string_ids = {value: string_id for string_id, value in enumerate(self.strings)}
+        offset += METADATA_LENGTH.size
+        self.metadata = json.loads(tail[offset:offset + length].decode("utf-8"))
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __repr__(self):
+        return f"ContainerReader({self.path!r}, {self.count} actions, {len(self.offsets)} chunks)"
+
+    def chunk_count(self):
+        return len(self.offsets)
+
+    def chunk(self, number):
+        """Decoded chunk, from the cache when it was used recently"""
+        with self.lock:
+            buffer = self.cache.get(number)
+            if buffer is not None:
+                self.cache.move_to_end(number)
+                return buffer
+            if self.map is None:
+                raise ValueError(f"Container {self.path} is closed")
+            buffer = self.cache[number] = self._decode(number)
+            if len(self.cache) > self.cache_chunks:
+                self.cache.popitem(last=False)
+            return buffer
+
+    def _decode(self, number):
+        start = self.offsets[number]
+        body = decompress_body(self.map[start:start + self.lengths[number]], self.codec)
+        count = self.counts[number]
+        buffer = ActionBuffer()
+        buffer.strings = list(self.strings)
+        buffer.string_ids = dict(self.string_ids)
+        offset = 0
+        for name, typecode in COLUMNS:
+            column = array(typecode)
+            size = column.itemsize * count
+            column.frombytes(body[offset:offset + size])
+            if len(column) != count:
+                raise ValueError("Corrupt container file: truncated chunk")
+            if sys.byteorder == "big":
+                column.byteswap()
+            setattr(buffer, name, column)
+            offset += size
+        return buffer
+
+    def lazy_chunks(self):
+        """One LazyChunk per chunk, for opening the container in the editor"""
+        return [LazyChunk(self, number) for number in range(len(self.offsets))]
+
+    def iter_chunks(self):
+        for number in range(len(self.offsets)):
+            yield self.chunk(number)
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("action index out of range")
+        number = bisect_right(self.first_indices, index) - 1
+        return self.chunk(number)[index - self.first_indices[number]]
+
+    def chunk_at_time(self, time_ns):
+        """Number of the chunk holding the recording time time_ns, from the seek table"""
+        return max(0, bisect_right(self.first_times, time_ns) - 1)
+
+    @property
+    def closed(self):
+        return getattr(self, "map", None) is None
+
+    def close(self):
+        with self.lock:
+            self.cache.clear()
+            if getattr(self, "map", None) is not None:
+                self.map.close()
+                self.map = None
+            self.file.close()
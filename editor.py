@@ -0,0 +1,408 @@
+"""Editable macro document used by the GUI editor.
+
+MacroDocument keeps the actions as a list of ActionBuffer chunks (a simple
+rope) with a time shift per chunk. Chunks are never changed once they are in
+the document: an edit splits at most two chunks at the ends of its range and
+splices the chunk list, and moving the times of everything after an edit only
+touches the per chunk shifts. Cut, paste, move and time shift therefore cost
+O(chunk size + number of chunks), whatever the size of the range.
+
+Undo entries are the inverse edits: the chunks a delete removed (shared, not
+copied), or just a range and a count or time offset.
+
+A document opened from a container holds lazy chunks that are only decoded
+when something reads them, and chunks split by an edit are copied into
+memory.
+"""
+from array import array
+from bisect import bisect_right
+from actions import ActionBuffer, ActionView, NS_PER_SECOND
+
+CHUNK_SIZE = 1024
+UNDO_LIMIT = 200
+
+
+class ShiftedView(ActionView):
+    """ActionView whose times are moved by the shift of its chunk"""
+    __slots__ = ("shift",)
+
+    def __init__(self, buffer, index, shift):
+        super().__init__(buffer, index)
+        self.shift = shift
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if key == "time_ns":
+            return value + self.shift
+        if key == "time":
+            return value + self.shift / NS_PER_SECOND
+        return value
+
+
+def loaded(chunk):
+    """The ActionBuffer behind a chunk, decoding it if it is lazy"""
+    return chunk.load() if getattr(chunk, "lazy", False) else chunk
+
+
+def shifted_copy(chunk, shift):
+    """Copy of a chunk with the shift applied to its times"""
+    result = chunk[:]
+    result.metadata = {}
+    if shift:
+        result.times = array("q", (action_time + shift for action_time in chunk.times))
+    return result
+
+
+class Fragment:
+    """Range of actions taken out of a document, for the clipboard and undo"""
+
+    def __init__(self, entries=()):
+        self.entries = list(entries)  # (chunk, shift) pairs
+
+    @classmethod
+    def coerce(cls, actions, chunk_size=CHUNK_SIZE):
+        """Return actions as a Fragment, splitting buffers and lists into chunks"""
+        if isinstance(actions, cls):
+            return actions
+        if hasattr(actions, "lazy_chunks"):
+            return cls((chunk, 0) for chunk in actions.lazy_chunks())
+        buffer = ActionBuffer.coerce(actions)
+        return cls((buffer[start:start + chunk_size], 0)
+                   for start in range(0, len(buffer), chunk_size))
+
+    def __len__(self):
+        return sum(len(chunk) for chunk, _ in self.entries)
+
+    def first_time(self):
+        chunk, shift = self.entries[0]
+        return chunk.times[0] + shift
+
+    def last_time(self):
+        chunk, shift = self.entries[-1]
+        return chunk.times[-1] + shift
+
+    def retimed(self, delta):
+        """Same actions moved delta nanoseconds in time"""
+        return Fragment((chunk, shift + delta) for chunk, shift in self.entries)
+
+    def to_buffer(self):
+        buffer = ActionBuffer()
+        for chunk, shift in self.entries:
+            buffer.extend(shifted_copy(chunk, shift))
+        return buffer
+
+    def loaded(self):
+        """Same fragment with lazy chunks decoded, so it outlives their file"""
+        return Fragment((loaded(chunk), shift) for chunk, shift in self.entries)
+
+
+class MacroDocument:
+    """List-like macro with range edits and undo/redo.
+
+    Supports len, indexing, slicing and iteration like ActionBuffer, so the
+    actions list and the player can use it directly. Every edit bumps
+    revision; to_buffer() is cached per revision.
+    """
+
+    def __init__(self, actions=None, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.shifts = []  # Nanoseconds added to the times of each chunk
+        self.starts = []  # Index of the first action of each chunk
+        self.length = 0
+        self.revision = 0
+        self.metadata = {}
+        self.undo_stack = []
+        self.redo_stack = []
+        self.flat = None
+        if actions is not None:
+            fragment = Fragment.coerce(actions, chunk_size)
+            self.metadata = dict(getattr(actions, "metadata", None) or {})
+            self._apply(("insert", 0, fragment))
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for chunk, shift in zip(self.chunks, self.shifts):
+            chunk = loaded(chunk)
+            if shift:
+                for index in range(len(chunk)):
+                    yield ShiftedView(chunk, index, shift)
+            else:
+                yield from chunk
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            buffer = self.copy(start, stop).to_buffer() if stop > start else ActionBuffer()
+            return buffer[::step] if step != 1 else buffer
+
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("action index out of range")
+        position, offset = self.locate(index)
+        chunk = loaded(self.chunks[position])
+        shift = self.shifts[position]
+        if shift:
+            return ShiftedView(chunk, offset, shift)
+        return ActionView(chunk, offset)
+
+    def __repr__(self):
+        return f"MacroDocument({self.length} actions, {len(self.chunks)} chunks)"
+
+    @property
+    def streamed(self):
+        """True when some chunks still live in a container file"""
+        return any(getattr(chunk, "lazy", False) for chunk in self.chunks)
+
+    def lazy_sources(self):
+        """Files (container and journal readers) read by the lazy chunks of the document and its undo history"""
+        sources = set()
+        chunks = list(self.chunks)
+        edits = self.undo_stack + self.redo_stack
+        while edits:
+            edit = edits.pop()
+            if edit[0] == "group":
+                edits.extend(edit[1])
+            elif edit[0] == "insert":
+                chunks.extend(chunk for chunk, _ in edit[2].entries)
+        for chunk in chunks:
+            if getattr(chunk, "lazy", False):
+                sources.add(chunk.reader)
+        return sources
+
+    def close(self):
+        """Close the files the document reads from, it cannot be used afterwards"""
+        for source in self.lazy_sources():
+            source.close()
+
+    def time_ns(self, index):
+        """Time of the action at index, including its chunk shift"""
+        position, offset = self.locate(index)
+        return self.chunks[position].times[offset] + self.shifts[position]
+
+    def iter_chunks(self):
+        """Yield the document as ActionBuffer chunks with their times applied"""
+        for chunk, shift in zip(self.chunks, self.shifts):
+            yield shifted_copy(chunk, shift) if shift else loaded(chunk)
+
+    def to_buffer(self):
+        """The whole document as one ActionBuffer, rebuilt only after edits"""
+        if self.flat is None or self.flat[0] != self.revision:
+            buffer = ActionBuffer()
+            for chunk in self.iter_chunks():
+                buffer.extend(chunk)
+            buffer.metadata = dict(self.metadata)
+            self.flat = (self.revision, buffer)
+        return self.flat[1]
+
+    # Editing
+
+    def copy(self, start, stop):
+        """Fragment with the actions in [start, stop), the document is unchanged"""
+        start, stop = self._clamp(start, stop)
+        if start == stop:
+            return Fragment()
+        first, first_offset = self.locate(start)
+        last, last_offset = self.locate(stop - 1)
+        entries = []
+        for position in range(first, last + 1):
+            chunk = self.chunks[position]
+            low = first_offset if position == first else 0
+            high = last_offset + 1 if position == last else len(chunk)
+            if low or high < len(chunk):
+                chunk = chunk[low:high]
+            entries.append((chunk, self.shifts[position]))
+        return Fragment(entries)
+
+    def delete(self, start, stop):
+        """Remove [start, stop) and return it as a Fragment.
+
+        The actions after the range move back in time by the length of the
+        range, so the pause before them stays what it was before the range.
+        """
+        start, stop = self._clamp(start, stop)
+        if start == stop:
+            return Fragment()
+        removed = self.copy(start, stop)
+        self._push(self._delete_ops(start, stop))
+        return removed
+
+    def cut(self, start, stop):
+        return self.delete(start, stop)
+
+    def insert(self, index, actions):
+        """Insert actions (a Fragment, buffer or list of dicts) before index.
+
+        The inserted actions are retimed to start with the action before
+        them, and the actions after move forward by their duration.
+        """
+        fragment = Fragment.coerce(actions, self.chunk_size)
+        if not len(fragment):
+            return
+        self._push(self._insert_ops(max(0, min(index, self.length)), fragment))
+
+    def paste(self, index, fragment):
+        self.insert(index, fragment)
+
+    def move(self, start, stop, destination):
+        """Move [start, stop) before the action at destination (an index before the move)"""
+        start, stop = self._clamp(start, stop)
+        if start == stop or start <= destination <= stop:
+            return
+        fragment = self.copy(start, stop)
+        inverses = self._delete_ops(start, stop)
+        if destination > stop:
+            destination -= stop - start
+        inverses += self._insert_ops(destination, fragment)
+        self._push(inverses)
+
+    def shift_time(self, start, stop, delta_ns):
+        """Move the actions in [start, stop) delta_ns nanoseconds in time"""
+        start, stop = self._clamp(start, stop)
+        if start == stop or not delta_ns:
+            return
+        self._push([self._apply(("shift", start, stop, int(delta_ns)))])
+
+    def replace(self, actions):
+        """Replace every action, e.g. with the result of an optimization pass"""
+        fragment = Fragment.coerce(actions, self.chunk_size)
+        inverses = []
+        if self.length:
+            inverses.append(self._apply(("delete", 0, self.length)))
+        if len(fragment):
+            inverses.append(self._apply(("insert", 0, fragment)))
+        if inverses:
+            self._push(inverses)
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        if not self.undo_stack:
+            return False
+        self.redo_stack.append(self._apply(self.undo_stack.pop()))
+        return True
+
+    def redo(self):
+        if not self.redo_stack:
+            return False
+        self.undo_stack.append(self._apply(self.redo_stack.pop()))
+        return True
+
+    # Internals
+
+    def _delete_ops(self, start, stop):
+        """Delete [start, stop) and close the time gap, returning the inverse edits"""
+        gap = self.time_ns(stop) - self.time_ns(start) if stop < self.length else 0
+        inverses = [self._apply(("delete", start, stop))]
+        if gap and start < self.length:
+            inverses.append(self._apply(("shift", start, self.length, -gap)))
+        return inverses
+
+    def _insert_ops(self, index, fragment):
+        """Insert a retimed fragment and open a time gap for it, returning the inverse edits"""
+        inverses = []
+        if self.length:
+            anchor = self.time_ns(index - 1 if index else 0)
+            fragment = fragment.retimed(anchor - fragment.first_time())
+            duration = fragment.last_time() - fragment.first_time()
+            if duration and index < self.length:
+                inverses.append(self._apply(("shift", index, self.length, duration)))
+        inverses.append(self._apply(("insert", index, fragment)))
+        return inverses
+
+    def _push(self, inverses):
+        self.undo_stack.append(("group", inverses[::-1]))
+        del self.undo_stack[:-UNDO_LIMIT]
+        self.redo_stack.clear()
+
+    def _apply(self, edit):
+        """Perform one edit and return the edit that undoes it"""
+        operation = edit[0]
+        if operation == "group":
+            return ("group", [self._apply(step) for step in edit[1]][::-1])
+
+        if operation == "insert":
+            _, index, fragment = edit
+            position = self._boundary(index)
+            entries = [(chunk, shift) for chunk, shift in fragment.entries if len(chunk)]
+            self.chunks[position:position] = [chunk for chunk, _ in entries]
+            self.shifts[position:position] = [shift for _, shift in entries]
+            count = sum(len(chunk) for chunk, _ in entries)
+            self._changed(position, position + len(entries))
+            return ("delete", index, index + count)
+
+        if operation == "delete":
+            _, start, stop = edit
+            first = self._boundary(start)
+            last = self._boundary(stop)
+            removed = Fragment(zip(self.chunks[first:last], self.shifts[first:last]))
+            del self.chunks[first:last]
+            del self.shifts[first:last]
+            self._changed(first, first)
+            return ("insert", start, removed)
+
+        _, start, stop, delta = edit
+        first = self._boundary(start)
+        last = self._boundary(stop)
+        for position in range(first, last):
+            self.shifts[position] += delta
+        self._changed(first, last)
+        return ("shift", start, stop, -delta)
+
+    def _changed(self, first, last):
+        """Merge small chunks around the edited positions and reindex"""
+        for position in (last, first):
+            self._merge(position)
+        self._reindex()
+        self.revision += 1
+
+    def _merge(self, position):
+        """Join the chunks at position - 1 and position if they fit in one"""
+        if not 0 < position < len(self.chunks):
+            return
+        left, right = self.chunks[position - 1], self.chunks[position]
+        if len(left) + len(right) > self.chunk_size:
+            return
+        merged = shifted_copy(left, self.shifts[position - 1])
+        merged.extend(shifted_copy(right, self.shifts[position]))
+        self.chunks[position - 1:position + 1] = [merged]
+        self.shifts[position - 1:position + 1] = [0]
+
+    def _reindex(self):
+        starts = []
+        total = 0
+        for chunk in self.chunks:
+            starts.append(total)
+            total += len(chunk)
+        self.starts = starts
+        self.length = total
+
+    def locate(self, index):
+        """(chunk position, offset in the chunk) of the action at index"""
+        position = bisect_right(self.starts, index) - 1
+        return position, index - self.starts[position]
+
+    def _boundary(self, index):
+        """Split chunks so one starts at index and return its position"""
+        if index >= self.length:
+            return len(self.chunks)
+        position, offset = self.locate(index)
+        if offset:
+            chunk = self.chunks[position]
+            shift = self.shifts[position]
+            self.chunks[position:position + 1] = [chunk[:offset], chunk[offset:]]
+            self.shifts[position:position + 1] = [shift, shift]
+            self.starts.insert(position + 1, index)
+            position += 1
+        return position
+
+    def _clamp(self, start, stop):
+        start = max(0, min(start, self.length))
+        return start, max(start, min(stop, self.length))
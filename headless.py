@@ -0,0 +1,116 @@
+"""Play a saved macro without the GUI.
+
+Usage: python -m headless macro.json [--loops N] [--speed X] [--start INDEX | --at TIME] [--stop INDEX]
+"""
+import argparse
+import sys
+import time
+from actions import parse_seconds_ns
+from macro_io import load_actions
+from journal import is_journal_path, JournalReader
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_INTERRUPTED = 130
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m headless",
+        description="Play a saved PyClickerRecorder macro without opening the GUI."
+    )
+    parser.add_argument("macro", help="Macro file (.json, .pcr, a .pcc container or a .pcj recording journal)")
+    parser.add_argument("--loops", type=int, default=1,
+                        help="Number of times to play the macro, -1 for infinite (default: 1)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Playback speed factor, 2.0 plays twice as fast (default: 1.0)")
+    start_group = parser.add_mutually_exclusive_group()
+    start_group.add_argument("--start", type=int, default=0,
+                             help="Index of the action to start the first loop from (default: 0)")
+    start_group.add_argument("--at",
+                             help="Start the first loop at this time into the macro, in seconds or mm:ss")
+    parser.add_argument("--stop", type=int,
+                        help="Play only up to this action index; every loop then replays from the start")
+    parser.add_argument("--stats",
+                        help="Profile the playback and write latency histograms to this .csv or .json file")
+    return parser.parse_args(argv)
+
+
+def print_summary(timing, load_seconds):
+    print(f"Loaded in {load_seconds:.3f} s")
+    print(f"Played {timing['count']} actions in {timing['loops']} full loop(s), "
+          f"{timing['elapsed_s']:.3f} s")
+    print(f"Lateness: mean {timing['mean_ms']:.3f} ms, max {timing['max_ms']:.3f} ms")
+    if timing["errors"]:
+        print(f"{timing['errors']} action(s) failed", file=sys.stderr)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.speed <= 0:
+        print("Speed must be greater than 0", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        start_ns = parse_seconds_ns(args.at) if args.at else None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return EXIT_ERROR
+
+    load_start = time.perf_counter()
+    try:
+        if is_journal_path(args.macro):
+            # Journals are streamed from disk instead of loaded up front
+            actions = JournalReader(args.macro)
+        else:
+            actions = load_actions(args.macro)
+    except (OSError, ValueError) as e:
+        print(f"Could not load {args.macro}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    load_seconds = time.perf_counter() - load_start
+
+    if not actions:
+        print(f"{args.macro} contains no actions", file=sys.stderr)
+        return EXIT_ERROR
+
+    # Imported here so --help and load errors do not pay for the input libraries
+    from player import Player
+
+    player = Player()
+    player.profiling = bool(args.stats)
+    start = args.start
+    if start_ns is not None:
+        start = player.index_at_time(actions, start_ns)
+    if start_ns is not None and start >= len(actions):
+        print(f"--at {args.at} is past the end of the macro", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        player.check_range(actions, start, args.stop)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        timing = player.play(actions, args.loops, args.speed, start, args.stop)
+    except KeyboardInterrupt:
+        print("Playback interrupted", file=sys.stderr)
+        if player.last_timing:
+            print_summary(player.last_timing, load_seconds)
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        print(f"Playback failed: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    print_summary(timing, load_seconds)
+    if args.stats:
+        try:
+            if args.stats.lower().endswith(".csv"):
+                player.stats.export_csv(args.stats)
+            else:
+                player.stats.export_json(args.stats, {"timing": timing})
+        except OSError as e:
+            print(f"Could not write {args.stats}: {e}", file=sys.stderr)
+            return EXIT_ERROR
+    return EXIT_ERROR if timing["errors"] else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
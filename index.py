@@ -0,0 +1,230 @@
+"""Search indexes over the actions of a MacroDocument.
+
+Every chunk of a document gets its own small index: the time range of the
+chunk, a posting list of offsets per action kind and a grid of the offsets
+of positioned actions by screen cell. Document chunks never change, so a
+chunk is indexed once and edits only add the few chunks they create. A
+search walks the chunks in order, skips those whose time range or grid
+cannot match and checks the remaining candidates exactly.
+"""
+import weakref
+from array import array
+from bisect import bisect_left
+from heapq import merge
+from itertools import product
+from actions import TYPE_CODES, NAMED_KINDS, MOUSE_MOVE, MOUSE_CLICK, MOUSE_SCROLL
+
+GRID_CELL = 64  # Pixels per side of a spatial grid cell
+POSITIONED_KINDS = (MOUSE_MOVE, MOUSE_CLICK, MOUSE_SCROLL)
+
+
+class ChunkIndex:
+    """Time range of one chunk, plus its postings and grid cells once needed.
+
+    The chunk is passed in rather than kept: indexes are weak dict values
+    keyed by their chunk, and a reference back would keep the chunk alive.
+    """
+    __slots__ = ("postings", "cells", "min_time", "max_time", "times_sorted")
+
+    def __init__(self, chunk):
+        self.postings = None
+        self.cells = None
+        times = chunk.times
+        self.min_time = min(times) if times else 0
+        self.max_time = max(times) if times else 0
+        self.times_sorted = list(times) == sorted(times)
+
+    def build(self, chunk):
+        """Fill the posting lists and grid cells of chunk, once"""
+        if self.postings is not None:
+            return
+        postings = {}
+        cells = {}
+        for offset, (kind, x, y) in enumerate(zip(chunk.kinds, chunk.xs, chunk.ys)):
+            offsets = postings.get(kind)
+            if offsets is None:
+                offsets = postings[kind] = array("I")
+            offsets.append(offset)
+            if kind in POSITIONED_KINDS:
+                cell = (x // GRID_CELL, y // GRID_CELL)
+                offsets = cells.get(cell)
+                if offsets is None:
+                    offsets = cells[cell] = array("I")
+                offsets.append(offset)
+        self.postings = postings
+        self.cells = cells
+
+
+class ActionQuery:
+    """What to search for; criteria left as None match anything.
+
+    action_type is an ActionType name, name a button or key name, region
+    (x1, y1, x2, y2) an inclusive screen rectangle, start_ns/end_ns an
+    inclusive time range and state "down" or "up" for clicks.
+    """
+
+    def __init__(self, action_type=None, name=None, region=None, start_ns=None, end_ns=None,
+                 state=None):
+        self.kinds = None
+        if action_type is not None:
+            if action_type not in TYPE_CODES:
+                raise ValueError(f"Unknown action type: {action_type}")
+            self.kinds = (TYPE_CODES[action_type],)
+        self.name = name.lower() if name else None
+        self.region = None
+        if region is not None:
+            x1, y1, x2, y2 = region
+            self.region = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.state = state
+
+    def overlaps(self, min_time, max_time):
+        """Check if any time in [min_time, max_time] can match"""
+        if self.start_ns is not None and max_time < self.start_ns:
+            return False
+        if self.end_ns is not None and min_time > self.end_ns:
+            return False
+        return True
+
+    def matches(self, chunk, offset, shift):
+        """Exact check of one action"""
+        kind = chunk.kinds[offset]
+        if self.kinds is not None and kind not in self.kinds:
+            return False
+        if self.start_ns is not None or self.end_ns is not None:
+            action_time = chunk.times[offset] + shift
+            if self.start_ns is not None and action_time < self.start_ns:
+                return False
+            if self.end_ns is not None and action_time > self.end_ns:
+                return False
+        if self.region is not None:
+            x1, y1, x2, y2 = self.region
+            if kind not in POSITIONED_KINDS:
+                return False
+            if not (x1 <= chunk.xs[offset] <= x2 and y1 <= chunk.ys[offset] <= y2):
+                return False
+        if self.name is not None:
+            if kind not in NAMED_KINDS or chunk.strings[chunk.codes[offset]].lower() != self.name:
+                return False
+        if self.state is not None:
+            if kind != MOUSE_CLICK or bool(chunk.values[offset]) != (self.state == "down"):
+                return False
+        return True
+
+
+class MacroIndex:
+    """Searches a MacroDocument through per chunk indexes"""
+
+    def __init__(self, document):
+        self.document = document
+        self.chunk_indexes = weakref.WeakKeyDictionary()
+
+    def chunk_index(self, chunk):
+        entry = self.chunk_indexes.get(chunk)
+        if entry is None:
+            entry = self.chunk_indexes[chunk] = ChunkIndex(chunk)
+        return entry
+
+    def build(self, limit=None):
+        """Index the chunks not indexed yet, at most limit of them.
+
+        Returns True once every chunk is indexed, so callers can spread the
+        work over several idle callbacks.
+        """
+        for chunk in self.document.chunks:
+            entry = self.chunk_index(chunk)
+            if entry.postings is None:
+                if limit is not None and limit <= 0:
+                    return False
+                entry.build(chunk)
+                if limit is not None:
+                    limit -= 1
+        return True
+
+    def _candidates(self, chunk, shift, query):
+        """Local offsets in a chunk that may match, in order"""
+        entry = self.chunk_index(chunk)
+        if not query.overlaps(entry.min_time + shift, entry.max_time + shift):
+            return ()
+
+        if query.region is not None or query.kinds is not None:
+            entry.build(chunk)
+
+        if query.region is not None:
+            x1, y1, x2, y2 = query.region
+            columns = range(x1 // GRID_CELL, x2 // GRID_CELL + 1)
+            rows = range(y1 // GRID_CELL, y2 // GRID_CELL + 1)
+            if len(columns) * len(rows) <= len(entry.cells):
+                lists = [entry.cells[cell] for cell in product(columns, rows) if cell in entry.cells]
+            else:
+                lists = [offsets for (column, row), offsets in entry.cells.items()
+                         if column in columns and row in rows]
+        elif query.kinds is not None:
+            lists = [entry.postings[kind] for kind in query.kinds if kind in entry.postings]
+        else:
+            low = 0
+            if query.start_ns is not None and entry.times_sorted:
+                low = bisect_left(chunk.times, query.start_ns - shift)
+            return range(low, len(chunk))
+
+        if len(lists) == 1:
+            return lists[0]
+        return merge(*lists)
+
+    def chunk_matches(self, position, query):
+        """Sorted local offsets of the matches in the chunk at position"""
+        chunk = self.document.chunks[position]
+        shift = self.document.shifts[position]
+        return [offset for offset in self._candidates(chunk, shift, query)
+                if query.matches(chunk, offset, shift)]
+
+    def find(self, query, start=0):
+        """Yield the indices of matching actions from start on"""
+        document = self.document
+        if start >= len(document):
+            return
+        first, first_offset = document.locate(max(0, start))
+        for position in range(first, len(document.chunks)):
+            base = document.starts[position]
+            for offset in self.chunk_matches(position, query):
+                if position == first and offset < first_offset:
+                    continue
+                yield base + offset
+
+    def find_next(self, query, start=0):
+        """Index of the first match at or after start, or None"""
+        return next(self.find(query, start), None)
+
+    def find_previous(self, query, before):
+        """Index of the last match before the index before, or None"""
+        document = self.document
+        before = min(before, len(document))
+        if before <= 0:
+            return None
+        last, last_offset = document.locate(before - 1)
+        for position in range(last, -1, -1):
+            base = document.starts[position]
+            for offset in reversed(self.chunk_matches(position, query)):
+                if position == last and offset > last_offset:
+                    continue
+                return base + offset
+        return None
+
+    def count(self, query):
+        return sum(len(self.chunk_matches(position, query))
+                   for position in range(len(self.document.chunks)))
+
+
+class Matches:
+    """Sequence of the matching actions, for showing only the matches in a list"""
+
+    def __init__(self, document, indices):
+        self.document = document
+        self.indices = array("q", indices)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        return self.document[self.indices[index]]
@@ -0,0 +1,288 @@
+"""Append-only journal files (.pcj) for streaming long recordings to disk.
+
+Layout: a short header followed by length-prefixed records. Each record is
+the ActionBuffer row (kind, time, x, y, code, value) followed by the UTF-8
+key or button name for actions that have one. A crash can at worst cut the
+last record short; readers stop at the first incomplete record.
+"""
+import os
+import queue
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from actions import ActionBuffer, LazyChunk, NAMED_KINDS
+
+JOURNAL_EXTENSION = ".pcj"
+MAGIC = b"PCRJ"
+JOURNAL_VERSION = 2
+CACHE_CHUNKS = 32  # Decoded chunks kept by a JournalReader opened in the editor
+
+HEADER = struct.Struct("<4sB")
+LENGTH = struct.Struct("<I")
+ROW = struct.Struct("<Bqiiid")
+
+
+def is_journal_path(filename):
+    """Check if a filename uses the journal extension"""
+    return os.path.splitext(filename)[1].lower() == JOURNAL_EXTENSION
+
+
+def encode_record(kind, time_ns, x, y, code, value, name=None):
+    payload = ROW.pack(kind, time_ns, x, y, code, value)
+    if name is not None:
+        payload += name.encode("utf-8")
+    return LENGTH.pack(len(payload)) + payload
+
+
+class JournalWriter:
+    """Writes actions to a journal from a background thread.
+
+    add() only queues the row, so recorder callbacks never wait on disk.
+    Records are written in batches and flushed every batch_size records
+    or flush_interval seconds, whichever comes first.
+    """
+
+    def __init__(self, path, batch_size=256, flush_interval=0.5, fsync=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.queue = queue.SimpleQueue()
+        self.written = 0
+        self.error = None
+
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, JOURNAL_VERSION))
+        self.file.flush()
+
+        self.thread = threading.Thread(target=self._write_loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def add(self, kind, time_ns, x=0, y=0, code=0, value=0.0, name=None):
+        """Queue one action row for writing"""
+        self.queue.put((kind, time_ns, x, y, code, value, name))
+
+    def add_view(self, action):
+        """Queue an ActionView for writing"""
+        buffer = action.buffer
+        index = action.index
+        kind = buffer.kinds[index]
+        name = buffer.strings[buffer.codes[index]] if kind in NAMED_KINDS else None
+        self.add(kind, buffer.times[index], buffer.xs[index], buffer.ys[index],
+                 buffer.codes[index], buffer.values[index], name)
+
+    def close(self):
+        """Write everything still queued and close the file"""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        self.file.close()
+
+    def _write_loop(self):
+        batch = []
+        last_flush = time.monotonic()
+        running = True
+
+        while running:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                row = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                row = False
+
+            if row is None:
+                running = False
+            elif row is not False:
+                batch.append(encode_record(*row))
+                if len(batch) < self.batch_size:
+                    continue
+
+            if batch or not running:
+                self._flush(batch)
+                batch = []
+            last_flush = time.monotonic()
+
+    def _flush(self, batch):
+        try:
+            if batch:
+                self.file.write(b"".join(batch))
+                self.written += len(batch)
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+        except OSError as e:
+            # Keep draining the queue so the recorder is never blocked
+            self.error = e
+
+
+def save_journal(path, actions):
+    """Write a whole action list as a journal, without the background thread"""
+    buffer = ActionBuffer.coerce(actions)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, JOURNAL_VERSION))
+        for index, kind in enumerate(buffer.kinds):
+            name = buffer.strings[buffer.codes[index]] if kind in NAMED_KINDS else None
+            f.write(encode_record(kind, buffer.times[index], buffer.xs[index], buffer.ys[index],
+                                  buffer.codes[index], buffer.values[index], name))
+
+
+def _read_header(f):
+    """Check the header of a journal file"""
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("Not a PyClicker journal file")
+    magic, version = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Not a PyClicker journal file")
+    if version != JOURNAL_VERSION:
+        raise ValueError(f"Unsupported journal version: {version}")
+
+
+def _read_chunk(f, limit):
+    """Read up to limit records from f, fewer at the end of the file"""
+    chunk = ActionBuffer()
+    while len(chunk) < limit:
+        prefix = f.read(LENGTH.size)
+        if len(prefix) < LENGTH.size:
+            break
+        (length,) = LENGTH.unpack(prefix)
+        payload = f.read(length)
+        if len(payload) < length or length < ROW.size:
+            break  # Cut short by a crash
+
+        kind, action_time, x, y, code, value = ROW.unpack_from(payload, 0)
+        if kind in NAMED_KINDS:
+            code = chunk.intern(payload[ROW.size:].decode("utf-8"))
+        chunk._append_row(kind, action_time, x, y, code, value)
+    return chunk
+
+
+def iter_journal_chunks(path, chunk_size=4096):
+    """Yield the journal as ActionBuffer chunks of up to chunk_size actions"""
+    with open(path, "rb") as f:
+        _read_header(f)
+        while True:
+            chunk = _read_chunk(f, chunk_size)
+            if not len(chunk):
+                break
+            yield chunk
+            if len(chunk) < chunk_size:
+                break
+
+
+def iter_journal(path):
+    """Yield every action in a journal as a dict, reading the file lazily"""
+    for chunk in iter_journal_chunks(path):
+        for action in chunk:
+            yield action.to_dict()
+
+
+def load_journal(path):
+    """Read a whole journal into one ActionBuffer"""
+    buffer = ActionBuffer()
+    for chunk in iter_journal_chunks(path):
+        buffer.extend(chunk)
+    return buffer
+
+
+class JournalReader:
+    """Re-iterable, lazily read view of a journal file for playback and editing.
+
+    Every iteration opens the file again, so loops never hold the whole
+    recording in memory. For the editor, lazy_chunks() walks the record
+    length prefixes once to find where each chunk starts; chunks are then
+    read on demand and the most recently used ones are cached.
+    """
+
+    def __init__(self, path, chunk_size=4096, cache_chunks=CACHE_CHUNKS):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.cache_chunks = cache_chunks
+        self.count = None
+        self.metadata = {}  # Journals have none, the recorder adds its stats here
+        self.offsets = None  # File offset of the first record of each chunk
+        self.counts = None
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()  # The GUI and the playback thread share the cache
+        with open(path, "rb") as f:
+            _read_header(f)
+
+    def iter_chunks(self):
+        return iter_journal_chunks(self.path, self.chunk_size)
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def __len__(self):
+        if self.count is None:
+            self._index()
+        return self.count
+
+    def __bool__(self):
+        return os.path.getsize(self.path) >= HEADER.size + LENGTH.size + ROW.size
+
+    def _index(self):
+        """Count complete records and note where every chunk starts, by walking the length prefixes"""
+        offsets = array("q")
+        counts = array("I")
+        count = 0
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as f:
+            offset = HEADER.size
+            f.seek(offset)
+            while True:
+                prefix = f.read(LENGTH.size)
+                if len(prefix) < LENGTH.size:
+                    break
+                (length,) = LENGTH.unpack(prefix)
+                if offset + LENGTH.size + length > size:
+                    break
+                if count % self.chunk_size == 0:
+                    offsets.append(offset)
+                    counts.append(0)
+                counts[-1] += 1
+                count += 1
+                offset += LENGTH.size + length
+                f.seek(offset)
+        self.offsets = offsets
+        self.counts = counts
+        self.count = count
+
+    def lazy_chunks(self):
+        """One LazyChunk per chunk, for opening the journal in the editor"""
+        if self.offsets is None:
+            self._index()
+        return [LazyChunk(self, number) for number in range(len(self.offsets))]
+
+    def chunk(self, number):
+        """Decoded chunk, from the cache when it was used recently"""
+        with self.lock:
+            buffer = self.cache.get(number)
+            if buffer is not None:
+                self.cache.move_to_end(number)
+                return buffer
+            with open(self.path, "rb") as f:
+                f.seek(self.offsets[number])
+                buffer = self.cache[number] = _read_chunk(f, self.counts[number])
+            if len(self.cache) > self.cache_chunks:
+                self.cache.popitem(last=False)
+            return buffer
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("action index out of range")
+        number, local = divmod(index, self.chunk_size)
+        return self.chunk(number)[local]
+
+    def close(self):
+        """Drop the cached chunks, the file is only open while reading"""
+        with self.lock:
+            self.cache.clear()
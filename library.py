@@ -0,0 +1,308 @@
+"""Catalog of the macros in a directory, kept in SQLite.
+
+Each macro file gets one row with what the Library tab shows and searches:
+name, duration, action counts per type, the bounding box of its mouse
+actions, a content hash and the stats of its last run. Refreshing only
+reads the files whose size or modification time changed since the last
+refresh, so browsing thousands of macros never parses them all.
+
+Usage: python -m library [--dir macros] [--db library.db] [--refresh] [SEARCH]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from actions import CODE_TYPES, NS_PER_SECOND
+from index import POSITIONED_KINDS
+from macro_io import load_actions
+from journal import is_journal_path, JournalReader
+from player import Timeline
+
+LIBRARY_DIR = "macros"
+LIBRARY_DB = "library.db"
+MACRO_EXTENSIONS = (".json", ".pcr", ".pcj", ".pcc")
+HASH_BLOCK = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS macros (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    action_count INTEGER NOT NULL,
+    duration_ns INTEGER NOT NULL,
+    type_counts TEXT NOT NULL,
+    min_x INTEGER, min_y INTEGER, max_x INTEGER, max_y INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS macros_name ON macros (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS macros_hash ON macros (hash);
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY,
+    hash TEXT,
+    run_at REAL NOT NULL,
+    run_count INTEGER NOT NULL,
+    actions INTEGER NOT NULL,
+    elapsed_s REAL NOT NULL,
+    mean_late_ms REAL NOT NULL,
+    max_late_ms REAL NOT NULL,
+    errors INTEGER NOT NULL
+);
+"""
+
+SELECT_MACROS = ("SELECT m.*, r.run_at, r.run_count, r.elapsed_s, r.mean_late_ms, "
+                 "r.max_late_ms, r.errors AS run_errors "
+                 "FROM macros m LEFT JOIN runs r ON r.path = m.path ")
+
+ORDERS = {
+    "name": "m.name COLLATE NOCASE",
+    "duration": "m.duration_ns DESC",
+    "actions": "m.action_count DESC",
+    "last run": "r.run_at IS NULL, r.run_at DESC",
+}
+
+
+def file_hash(path):
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def summarize(actions):
+    """Action count, playback duration, counts per type and mouse bounding box of a macro"""
+    timeline = Timeline()
+    counts = Counter()
+    duration = 0
+    bounds = None
+    chunks = actions.iter_chunks() if hasattr(actions, "iter_chunks") else (actions,)
+    for chunk in chunks:
+        offsets = timeline.offsets(chunk)
+        if offsets:
+            duration = offsets[-1]
+        counts.update(chunk.kinds)
+        positions = [(x, y) for kind, x, y in zip(chunk.kinds, chunk.xs, chunk.ys)
+                     if kind in POSITIONED_KINDS]
+        if positions:
+            xs = [x for x, _ in positions]
+            ys = [y for _, y in positions]
+            box = (min(xs), min(ys), max(xs), max(ys))
+            if bounds is not None:
+                box = (min(box[0], bounds[0]), min(box[1], bounds[1]),
+                       max(box[2], bounds[2]), max(box[3], bounds[3]))
+            bounds = box
+    return {
+        "action_count": sum(counts.values()),
+        "duration_ns": duration,
+        "type_counts": {CODE_TYPES[kind]: count for kind, count in sorted(counts.items())},
+        "bounds": bounds,
+    }
+
+
+def open_macro(path):
+    """Actions of a macro file, streamed from disk for journals and containers"""
+    if is_journal_path(path):
+        return JournalReader(path)
+    return load_actions(path)
+
+
+def format_duration(duration_ns):
+    seconds = duration_ns / NS_PER_SECOND
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:04.1f}"
+    return f"{minutes}:{seconds:04.1f}"
+
+
+class MacroLibrary:
+    """SQLite catalog of the macro files under a directory.
+
+    Rows are keyed by absolute path. The connection is shared by the GUI,
+    the refresh thread and the scheduler, behind a lock.
+    """
+
+    def __init__(self, directory=LIBRARY_DIR, db_path=LIBRARY_DB):
+        self.directory = os.path.abspath(directory)
+        self.prefix = os.path.join(self.directory, "")
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def scan(self):
+        """(path, size, mtime_ns) of every macro file under the directory"""
+        found = []
+        for root, dirs, files in os.walk(self.directory):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in files:
+                if os.path.splitext(name)[1].lower() not in MACRO_EXTENSIONS:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Removed while scanning
+                found.append((path, stat.st_size, stat.st_mtime_ns))
+        return found
+
+    def refresh(self, progress=None):
+        """Bring the catalog up to date with the directory.
+
+        Only new files and files whose size or mtime changed are read.
+        progress(done, total) is called after each file read. Returns the
+        number of (added, updated, removed) macros.
+        """
+        with self.lock:
+            known = {row["path"]: (row["size"], row["mtime_ns"]) for row in
+                     self.connection.execute("SELECT path, size, mtime_ns FROM macros "
+                                             "WHERE substr(path, 1, ?) = ?",
+                                             (len(self.prefix), self.prefix))}
+        found = self.scan()
+        changed = [entry for entry in found if known.get(entry[0]) != (entry[1], entry[2])]
+        removed = set(known) - {path for path, _, _ in found}
+        if removed:
+            with self.lock, self.connection:
+                self.connection.executemany("DELETE FROM macros WHERE path = ?",
+                                            [(path,) for path in removed])
+
+        added = updated = 0
+        for done, (path, size, mtime_ns) in enumerate(changed, 1):
+            row = self._read_macro(path, size, mtime_ns)
+            with self.lock, self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO macros VALUES "
+                    "(:path, :name, :size, :mtime_ns, :hash, :action_count, :duration_ns, "
+                    ":type_counts, :min_x, :min_y, :max_x, :max_y, :error)", row)
+                if path not in known:
+                    # A moved or renamed macro keeps the stats of its last run
+                    self.connection.execute(
+                        "UPDATE OR IGNORE runs SET path = ? WHERE hash = ? AND path NOT IN "
+                        "(SELECT path FROM macros)", (path, row["hash"]))
+            if path in known:
+                updated += 1
+            else:
+                added += 1
+            if progress is not None:
+                progress(done, len(changed))
+        return added, updated, len(removed)
+
+    def _read_macro(self, path, size, mtime_ns):
+        row = {"path": path, "name": os.path.splitext(os.path.basename(path))[0],
+               "size": size, "mtime_ns": mtime_ns, "hash": "", "action_count": 0,
+               "duration_ns": 0, "type_counts": "{}", "min_x": None, "min_y": None,
+               "max_x": None, "max_y": None, "error": None}
+        actions = None
+        try:
+            row["hash"] = file_hash(path)
+            actions = open_macro(path)
+            summary = summarize(actions)
+        except Exception as e:
+            # Unreadable macros stay listed so the user can see what is wrong with them
+            row["error"] = str(e)
+            return row
+        finally:
+            if hasattr(actions, "close"):
+                actions.close()
+        row["action_count"] = summary["action_count"]
+        row["duration_ns"] = summary["duration_ns"]
+        row["type_counts"] = json.dumps(summary["type_counts"])
+        if summary["bounds"] is not None:
+            row["min_x"], row["min_y"], row["max_x"], row["max_y"] = summary["bounds"]
+        return row
+
+    def search(self, text="", action_type=None, order="name", limit=None):
+        """Macros whose name or path contains text (case-insensitive), with their last run.
+
+        action_type keeps only the macros with at least one action of that
+        type. Rows are dicts with type_counts decoded.
+        """
+        query = SELECT_MACROS + "WHERE substr(m.path, 1, ?) = ?"
+        parameters = [len(self.prefix), self.prefix]
+        for word in text.split():
+            query += " AND (m.name LIKE ? ESCAPE '\\' OR m.path LIKE ? ESCAPE '\\')"
+            pattern = "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            parameters += [pattern, pattern]
+        if action_type:
+            query += " AND json_extract(m.type_counts, ?) > 0"
+            parameters.append(f"$.{action_type}")
+        query += " ORDER BY " + ORDERS.get(order, ORDERS["name"])
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+
+        return self._rows(query, parameters)
+
+    def get(self, path):
+        """Catalog row of one macro, or None"""
+        rows = self._rows(SELECT_MACROS + "WHERE m.path = ?", [os.path.abspath(path)])
+        return rows[0] if rows else None
+
+    def _rows(self, query, parameters):
+        with self.lock:
+            rows = self.connection.execute(query, parameters).fetchall()
+        result = []
+        for row in rows:
+            row = dict(row)
+            row["type_counts"] = json.loads(row["type_counts"])
+            result.append(row)
+        return result
+
+    def record_run(self, path, timing):
+        """Store the timing summary of a playback of the macro at path"""
+        path = os.path.abspath(path)
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT hash FROM macros WHERE path = ?",
+                                          (path,)).fetchone()
+            self.connection.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET hash = excluded.hash, run_at = excluded.run_at, "
+                "run_count = run_count + 1, actions = excluded.actions, "
+                "elapsed_s = excluded.elapsed_s, mean_late_ms = excluded.mean_late_ms, "
+                "max_late_ms = excluded.max_late_ms, errors = excluded.errors",
+                (path, row["hash"] if row else None, time.time(), timing["count"],
+                 timing.get("elapsed_s", 0.0), timing["mean_ms"], timing["max_ms"],
+                 timing.get("errors", 0)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m library",
+                                     description="List and search the macro library.")
+    parser.add_argument("search", nargs="*", help="Words to look for in macro names and paths")
+    parser.add_argument("--dir", default=LIBRARY_DIR, help=f"Macro directory (default: {LIBRARY_DIR})")
+    parser.add_argument("--db", default=LIBRARY_DB, help=f"Catalog database (default: {LIBRARY_DB})")
+    parser.add_argument("--type", choices=sorted(CODE_TYPES.values()),
+                        help="Only macros with actions of this type")
+    parser.add_argument("--refresh", action="store_true", help="Rescan the directory first")
+    args = parser.parse_args(argv)
+
+    library = MacroLibrary(args.dir, args.db)
+    try:
+        if args.refresh:
+            added, updated, removed = library.refresh()
+            print(f"{added} added, {updated} updated, {removed} removed")
+        for row in library.search(" ".join(args.search), args.type):
+            status = f"error: {row['error']}" if row["error"] else \
+                f"{row['action_count']} actions, {format_duration(row['duration_ns'])}"
+            print(f"{row['name']:<30} {status}")
+    finally:
+        library.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from actions import ActionBuffer, COLUMNS
+from journal import is_journal_path, load_journal, save_journal, JournalReader, MAGIC as JOURNAL_MAGIC
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BINARY_EXTENSION = ".pcr"
+MAGIC = b"PCRM"
+FORMAT_VERSION = 3
+
+# Compression codecs stored in the header
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+# magic, version, codec, reserved, action count
+HEADER = struct.Struct("<4sBBHI")
+STRING_COUNT = struct.Struct("<I")
+STRING_LENGTH = struct.Struct("<H")
+METADATA_LENGTH = struct.Struct("<I")
+
+# The body is the string table, then the ActionBuffer columns back to back with times
+# as integer nanoseconds, then an optional length-prefixed JSON metadata block.
+
+
+def default_codec():
+    """Best compression codec available on this machine"""
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def is_binary_path(filename):
+    """Check if a filename uses the binary macro extension"""
+    return os.path.splitext(filename)[1].lower() == BINARY_EXTENSION
+
+
+def save_actions(filename, actions):
+    """Save actions, picking JSON, binary, journal or container from the file extension.
+
+    Returns True when a container or journal was saved over the file the
+    actions were read from: that file was closed and has to be loaded again.
+    """
+    # Imported here, the container module builds on the helpers below
+    from container import is_container_path, save_container
+    if is_container_path(filename):
+        return save_container(filename, actions)
+
+    sources = actions.lazy_sources() if hasattr(actions, "lazy_sources") else (actions,)
+    actions = _as_buffer(actions)
+    if is_journal_path(filename):
+        # Everything was read above, the journal can be written over its own source
+        replaced = [source for source in sources if isinstance(source, JournalReader)
+                    and os.path.exists(filename) and os.path.samefile(source.path, filename)]
+        save_journal(filename, actions)
+        for source in replaced:
+            source.close()
+        return bool(replaced)
+    elif is_binary_path(filename):
+        with open(filename, "wb") as f:
+            f.write(encode_actions(actions))
+    else:
+        metadata = getattr(actions, "metadata", None)
+        if isinstance(actions, ActionBuffer):
+            actions = actions.to_list()
+        # Macros without metadata stay a bare list, readable by older versions
+        if metadata:
+            actions = {"metadata": metadata, "actions": actions}
+        with open(filename, "w") as f:
+            json.dump(actions, f, indent=2)
+
+
+def load_actions(filename):
+    """Load actions saved by save_actions, or a recording journal, into an ActionBuffer.
+
+    Containers are not read into memory: they load as a memory-mapped
+    ContainerReader whose chunks are decoded on demand.
+    """
+    from container import is_container_path, ContainerReader, MAGIC as CONTAINER_MAGIC
+    with open(filename, "rb") as f:
+        data = f.read(len(JOURNAL_MAGIC))
+        if is_journal_path(filename) or data == JOURNAL_MAGIC:
+            return load_journal(filename)
+        if is_container_path(filename) or data == CONTAINER_MAGIC:
+            return ContainerReader(filename)
+        data += f.read()
+
+    if data[:len(MAGIC)] == MAGIC:
+        return decode_actions(data)
+    
+    content = json.loads(data)
+    if isinstance(content, dict):
+        buffer = ActionBuffer(content.get("actions", []))
+        buffer.metadata = content.get("metadata") or {}
+        return buffer
+    return ActionBuffer(content)
+
+
+def _as_buffer(actions):
+    """Flatten editor documents and containers for the formats written in one piece"""
+    if hasattr(actions, "to_buffer"):
+        return actions.to_buffer()
+    if hasattr(actions, "iter_chunks"):
+        buffer = ActionBuffer()
+        for chunk in actions.iter_chunks():
+            buffer.extend(chunk)
+        buffer.metadata = dict(getattr(actions, "metadata", None) or {})
+        return buffer
+    return actions
+
+
+def compress_body(body, codec):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstandard is not installed")
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if codec == CODEC_ZLIB:
+        return zlib.compress(body, 6)
+    return body
+
+
+def decompress_body(body, codec):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("This macro is zstd compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(body)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(body)
+    if codec == CODEC_NONE:
+        return body
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+def encode_strings(strings):
+    table = [STRING_COUNT.pack(len(strings))]
+    for value in strings:
+        encoded = value.encode("utf-8")
+        table.append(STRING_LENGTH.pack(len(encoded)))
+        table.append(encoded)
+    return b"".join(table)
+
+
+def decode_strings(body):
+    """Read the string table, returning the strings and the offset after it"""
+    (string_count,) = STRING_COUNT.unpack_from(body, 0)
+    offset = STRING_COUNT.size
+    strings = []
+    for _ in range(string_count):
+        (length,) = STRING_LENGTH.unpack_from(body, offset)
+        offset += STRING_LENGTH.size
+        strings.append(body[offset:offset + length].decode("utf-8"))
+        offset += length
+    return strings, offset
+
+
+def column_bytes(column):
+    """Column contents in little-endian byte order"""
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def encode_actions(actions, codec=None):
+    """Encode actions into the binary macro format"""
+    if codec is None:
+        codec = default_codec()
+
+    buffer = ActionBuffer.coerce(actions)
+    if len(buffer.strings) > 0xFFFF:
+        raise ValueError("Too many distinct keys and buttons for the binary format")
+
+    body = [encode_strings(buffer.strings)]
+    body.extend(column_bytes(column) for column in buffer.columns())
+    if buffer.metadata:
+        metadata = json.dumps(buffer.metadata).encode("utf-8")
+        body.append(METADATA_LENGTH.pack(len(metadata)) + metadata)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, codec, 0, len(buffer))
+    return header + compress_body(b"".join(body), codec)
+
+
+def decode_actions(data):
+    """Decode bytes produced by encode_actions into an ActionBuffer"""
+    magic, version, codec, _, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a PyClicker macro file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported macro format version: {version}")
+
+    body = decompress_body(data[HEADER.size:], codec)
+    strings, offset = decode_strings(body)
+
+    buffer = ActionBuffer()
+    buffer.strings = strings
+    buffer.string_ids = {value: string_id for string_id, value in enumerate(strings)}
+
+    for name, typecode in COLUMNS:
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(body[offset:offset + size])
+        if len(column) != count:
+            raise ValueError("Corrupt macro file: truncated column data")
+        if sys.byteorder == "big":
+            column.byteswap()
+        setattr(buffer, name, column)
+        offset += size
+    
+    if len(body) >= offset + METADATA_LENGTH.size:
+        (length,) = METADATA_LENGTH.unpack_from(body, offset)
+        offset += METADATA_LENGTH.size
+        buffer.metadata = json.loads(body[offset:offset + length].decode("utf-8"))
+    return buffer
@@ -1,6 +1,5 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import json
 import os
 import keyboard
 import threading
@@ -8,6 +7,24 @@ import time
 from utils import center_window, create_tooltip, show_about_dialog, show_help_dialog
 from recorder import Recorder
 from player import Player
+from macro_io import save_actions
+from actions import ActionBuffer, NS_PER_SECOND, TYPE_CODES, format_action, parse_seconds_ns
+from editor import MacroDocument
+from widgets import VirtualListbox
+from backends import PyAutoGuiBackend
+from optimize import simplify_moves
+
+MACRO_FILETYPES = [
+    ("JSON files", "*.json"),
+    ("Binary macros", "*.pcr"),
+    ("Recording journals", "*.pcj"),
+    ("Chunked macros", "*.pcc"),
+    ("All files", "*.*")
+]
+
+RECORDINGS_DIR = "recordings"
+# Chunks indexed per idle callback while a macro is indexed in the background
+INDEX_CHUNKS_PER_STEP = 20
 
 class AutoClickerApp:
     def __init__(self, root):
@@ -19,16 +36,41 @@ class AutoClickerApp:
         # Application state
         self.is_recording = False
         self.is_playing = False
-        self.recorded_actions = []
+        self.recorded_actions = MacroDocument()
+        self.clipboard = None  # Fragment of copied or cut actions
+        self.action_index = None  # MacroIndex for the find bar, built on first use
+        self.filtered = None  # Matches shown instead of the whole macro
         self.current_file = None
         self.loop_count = tk.IntVar(value=1)
         self.delay_between_actions = tk.DoubleVar(value=1.0)
         self.infinite_loop_var = tk.BooleanVar(value=False)
+        self.journal_var = tk.BooleanVar(value=False)
+        self.profile_var = tk.BooleanVar(value=False)
+        self.adaptive_var = tk.BooleanVar(value=True)
+        self.error_budget_var = tk.DoubleVar(value=2.0)
+        self.find_type_var = tk.StringVar(value="any")
+        self.find_name_var = tk.StringVar()
+        self.find_region_var = tk.StringVar()
+        self.find_from_var = tk.StringVar()
+        self.find_to_var = tk.StringVar()
+        self.find_presses_var = tk.BooleanVar(value=False)
+        self.matches_only_var = tk.BooleanVar(value=False)
+        self.library_dir_var = tk.StringVar()
+        self.library_search_var = tk.StringVar()
+        self.library_type_var = tk.StringVar(value="any")
+        self.library_order_var = tk.StringVar(value="name")
+        self.library = None  # Opened once the window is up, see refresh_library
+        self.scheduler = None
+        self.library_refreshing = False
         
         # Initialize components
         self.create_gui()
-        self.recorder = Recorder(self)
-        self.player = Player(self)
+        self.backend = PyAutoGuiBackend()
+        self.recorder = Recorder(self, self.backend)
+        self.player = Player(self, self.backend)
+        # The library and the scheduler start once the window is shown
+        self.root.after_idle(self.refresh_library)
+        self.root.after_idle(self.start_scheduler)
         
         self.last_record_press = 0
         self.last_play_press = 0
@@ -52,10 +94,14 @@ class AutoClickerApp:
         # Create tabs
         self.create_record_tab(ttk.Frame(notebook))
         self.create_settings_tab(ttk.Frame(notebook))
+        self.create_stats_tab(ttk.Frame(notebook))
+        self.create_library_tab(ttk.Frame(notebook))
         self.create_help_tab(ttk.Frame(notebook))
         
         notebook.add(self.record_tab, text="Record & Play")
+        notebook.add(self.library_tab, text="Library")
         notebook.add(self.settings_tab, text="Settings")
+        notebook.add(self.stats_tab, text="Stats")
         
         # Status bar
         self.status_var = tk.StringVar(value="Ready")
@@ -67,7 +113,7 @@ class AutoClickerApp:
         
         # File menu
         file_menu = tk.Menu(menu_bar, tearoff=0)
-        file_menu.add_command(label="New", command=self.clear_actions)
+        file_menu.add_command(label="New", command=self.new_macro)
         file_menu.add_command(label="Save", command=self.save_macro)
         file_menu.add_command(label="Load", command=self.load_macro)
         file_menu.add_separator()
@@ -75,8 +121,25 @@ class AutoClickerApp:
         
         # Edit menu
         edit_menu = tk.Menu(menu_bar, tearoff=0)
+        edit_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=self.undo_edit)
+        edit_menu.add_command(label="Redo", accelerator="Ctrl+Y", command=self.redo_edit)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Cut", accelerator="Ctrl+X", command=self.cut_selection)
+        edit_menu.add_command(label="Copy", accelerator="Ctrl+C", command=self.copy_selection)
+        edit_menu.add_command(label="Paste", accelerator="Ctrl+V", command=self.paste_clipboard)
+        edit_menu.add_command(label="Delete", accelerator="Del", command=self.delete_selected_action)
+        edit_menu.add_command(label="Shift Time...", command=self.shift_selection_time)
+        edit_menu.add_separator()
         edit_menu.add_command(label="Clear Actions", command=self.clear_actions)
         edit_menu.add_command(label="Insert Delay", command=self.insert_delay)
+        edit_menu.add_command(label="Simplify Movements", command=self.simplify_movements)
+        
+        # Play menu
+        play_menu = tk.Menu(menu_bar, tearoff=0)
+        play_menu.add_command(label="Play", accelerator="F7", command=self.toggle_playback)
+        play_menu.add_command(label="Play From Selected", command=self.play_from_selection)
+        play_menu.add_command(label="Play Selection", command=self.play_selection)
+        play_menu.add_command(label="Play From Time...", command=self.play_from_time)
         
         # Help menu
         help_menu = tk.Menu(menu_bar, tearoff=0)
@@ -85,6 +148,7 @@ class AutoClickerApp:
         
         menu_bar.add_cascade(label="File", menu=file_menu)
         menu_bar.add_cascade(label="Edit", menu=edit_menu)
+        menu_bar.add_cascade(label="Play", menu=play_menu)
         menu_bar.add_cascade(label="Help", menu=help_menu)
         
         self.root.config(menu=menu_bar)
@@ -105,22 +169,76 @@ class AutoClickerApp:
         self.play_button.grid(row=0, column=1, padx=5, pady=5)
         create_tooltip(self.play_button, "Play recorded actions")
         
+        # Find bar
+        find_frame = ttk.LabelFrame(parent, text="Find")
+        find_frame.pack(fill=tk.X, padx=10)
+        
+        ttk.Label(find_frame, text="Type:").grid(row=0, column=0, padx=5, pady=2, sticky=tk.W)
+        ttk.Combobox(find_frame, textvariable=self.find_type_var, width=12, state="readonly",
+                     values=["any"] + list(TYPE_CODES)).grid(row=0, column=1, padx=5, pady=2)
+        ttk.Label(find_frame, text="Button/Key:").grid(row=0, column=2, padx=5, pady=2, sticky=tk.W)
+        name_entry = ttk.Entry(find_frame, textvariable=self.find_name_var, width=8)
+        name_entry.grid(row=0, column=3, padx=5, pady=2)
+        ttk.Label(find_frame, text="Region:").grid(row=0, column=4, padx=5, pady=2, sticky=tk.W)
+        region_entry = ttk.Entry(find_frame, textvariable=self.find_region_var, width=16)
+        region_entry.grid(row=0, column=5, columnspan=2, padx=5, pady=2)
+        create_tooltip(region_entry, "Screen rectangle x1,y1,x2,y2")
+        
+        ttk.Label(find_frame, text="From:").grid(row=1, column=0, padx=5, pady=2, sticky=tk.W)
+        from_entry = ttk.Entry(find_frame, textvariable=self.find_from_var, width=8)
+        from_entry.grid(row=1, column=1, padx=5, pady=2, sticky=tk.W)
+        create_tooltip(from_entry, "Seconds or mm:ss since the recording started")
+        ttk.Label(find_frame, text="To:").grid(row=1, column=2, padx=5, pady=2, sticky=tk.W)
+        to_entry = ttk.Entry(find_frame, textvariable=self.find_to_var, width=8)
+        to_entry.grid(row=1, column=3, padx=5, pady=2)
+        create_tooltip(to_entry, "Seconds or mm:ss since the recording started")
+        ttk.Checkbutton(find_frame, text="Presses only",
+                        variable=self.find_presses_var).grid(row=1, column=4, padx=5, pady=2)
+        ttk.Button(find_frame, text="<", width=3,
+                   command=lambda: self.find_action(-1)).grid(row=1, column=5, padx=2, pady=2)
+        ttk.Button(find_frame, text=">", width=3,
+                   command=lambda: self.find_action(1)).grid(row=1, column=6, padx=2, pady=2)
+        ttk.Checkbutton(find_frame, text="Matches only", variable=self.matches_only_var,
+                        command=self.toggle_matches_only).grid(row=1, column=7, padx=5, pady=2)
+        for entry in (name_entry, region_entry, from_entry, to_entry):
+            entry.bind("<Return>", lambda event: self.find_action(1))
+        
         # Actions list
         actions_frame = ttk.LabelFrame(parent, text="Recorded Actions")
         actions_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        scrollbar = ttk.Scrollbar(actions_frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        self.actions_listbox = tk.Listbox(actions_frame, yscrollcommand=scrollbar.set)
+        # Only the visible rows are rendered, so huge recordings stay responsive
+        self.actions_listbox = VirtualListbox(actions_frame, format_action)
         self.actions_listbox.pack(fill=tk.BOTH, expand=True)
-        scrollbar.config(command=self.actions_listbox.yview)
         
         # Context menu
         self.context_menu = tk.Menu(self.root, tearoff=0)
+        self.context_menu.add_command(label="Cut", command=self.cut_selection)
+        self.context_menu.add_command(label="Copy", command=self.copy_selection)
+        self.context_menu.add_command(label="Paste", command=self.paste_clipboard)
         self.context_menu.add_command(label="Delete", command=self.delete_selected_action)
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="Move Up", command=lambda: self.move_selection(-1))
+        self.context_menu.add_command(label="Move Down", command=lambda: self.move_selection(1))
+        self.context_menu.add_command(label="Shift Time...", command=self.shift_selection_time)
         self.context_menu.add_command(label="Insert Delay", command=self.insert_delay)
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="Play From Here", command=self.play_from_selection)
+        self.context_menu.add_command(label="Play Selection", command=self.play_selection)
         self.actions_listbox.bind("<Button-3>", self.show_context_menu)
+        
+        # Editing shortcuts, only while the actions list has the focus
+        self.actions_listbox.bind("<Control-z>", lambda event: self.undo_edit())
+        self.actions_listbox.bind("<Control-y>", lambda event: self.redo_edit())
+        self.actions_listbox.bind("<Control-x>", lambda event: self.cut_selection())
+        self.actions_listbox.bind("<Control-c>", lambda event: self.copy_selection())
+        self.actions_listbox.bind("<Control-v>", lambda event: self.paste_clipboard())
+        self.actions_listbox.bind("<Delete>", lambda event: self.delete_selected_action())
+        self.actions_listbox.bind("<Alt-Up>", lambda event: self.move_selection(-1))
+        self.actions_listbox.bind("<Alt-Down>", lambda event: self.move_selection(1))
+        # In the matches only view, jump to the match in the whole macro
+        self.actions_listbox.bind("<Double-Button-1>", lambda event: self.show_all_actions())
+        self.actions_listbox.bind("<Return>", lambda event: self.show_all_actions())
 
     def create_settings_tab(self, parent):
         self.settings_tab = parent
@@ -146,6 +264,110 @@ class AutoClickerApp:
         speed_scale.grid(row=0, column=1, padx=5, pady=5)
         self.speed_label = ttk.Label(speed_frame, text="1.0x")
         self.speed_label.grid(row=0, column=2, padx=5, pady=5)
+        
+        # Recording settings
+        recording_frame = ttk.LabelFrame(parent, text="Recording")
+        recording_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        journal_check = ttk.Checkbutton(recording_frame, text="Stream recordings to disk",
+                                        variable=self.journal_var, command=self.toggle_journal)
+        journal_check.grid(row=0, column=0, padx=5, pady=5)
+        create_tooltip(journal_check, f"Write actions to {RECORDINGS_DIR}/*.pcj while recording")
+        
+        adaptive_check = ttk.Checkbutton(recording_frame, text="Adaptive mouse sampling",
+                                         variable=self.adaptive_var, command=self.update_sampling)
+        adaptive_check.grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        create_tooltip(adaptive_check, "Sample fast or turning movements densely and slow ones sparsely")
+        ttk.Label(recording_frame, text="Error budget (px):").grid(row=1, column=1, padx=5, pady=5)
+        budget_entry = ttk.Spinbox(recording_frame, from_=0.5, to=20.0, increment=0.5, width=5,
+                                   textvariable=self.error_budget_var, command=self.update_sampling)
+        budget_entry.grid(row=1, column=2, padx=5, pady=5)
+        budget_entry.bind("<FocusOut>", self.update_sampling)
+        
+        # Scheduled macros
+        schedule_frame = ttk.LabelFrame(parent, text="Task Scheduler")
+        schedule_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        self.schedule_listbox = tk.Listbox(schedule_frame, height=4)
+        self.schedule_listbox.grid(row=0, column=0, columnspan=3, sticky="nsew", padx=5, pady=5)
+        schedule_frame.columnconfigure(0, weight=1)
+        schedule_frame.rowconfigure(0, weight=1)
+        
+        ttk.Button(schedule_frame, text="Add...", command=self.add_scheduled_job).grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Button(schedule_frame, text="Enable/Disable", command=self.toggle_scheduled_job).grid(row=1, column=1, padx=5, pady=5)
+        ttk.Button(schedule_frame, text="Remove", command=self.remove_scheduled_job).grid(row=1, column=2, padx=5, pady=5)
+
+    def create_stats_tab(self, parent):
+        self.stats_tab = parent
+        
+        controls = ttk.Frame(parent)
+        controls.pack(fill=tk.X, padx=10, pady=(10, 0))
+        profile_check = ttk.Checkbutton(controls, text="Profile playback", variable=self.profile_var,
+                                        command=self.toggle_profiling)
+        profile_check.pack(side=tk.LEFT)
+        create_tooltip(profile_check, "Measure lateness, backend call time and UI overhead per action type")
+        ttk.Button(controls, text="Export JSON", command=lambda: self.export_stats("json")).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(controls, text="Export CSV", command=lambda: self.export_stats("csv")).pack(side=tk.RIGHT, padx=5)
+        
+        self.stats_text = tk.Text(parent, wrap=tk.NONE, height=10, font=("Courier", 9))
+        self.stats_text.insert(tk.END, "Enable profiling and play a macro to see its latency histograms.")
+        self.stats_text.config(state=tk.DISABLED)
+        self.stats_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+    def create_library_tab(self, parent):
+        self.library_tab = parent
+        
+        folder_frame = ttk.Frame(parent)
+        folder_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        ttk.Label(folder_frame, text="Folder:").pack(side=tk.LEFT)
+        ttk.Entry(folder_frame, textvariable=self.library_dir_var).pack(side=tk.LEFT, fill=tk.X,
+                                                                         expand=True, padx=5)
+        ttk.Button(folder_frame, text="Browse...", command=self.choose_library_dir).pack(side=tk.LEFT)
+        ttk.Button(folder_frame, text="Refresh", command=self.refresh_library).pack(side=tk.LEFT, padx=5)
+        
+        search_frame = ttk.Frame(parent)
+        search_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+        search_entry = ttk.Entry(search_frame, textvariable=self.library_search_var, width=20)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        create_tooltip(search_entry, "Words in the macro name or path")
+        ttk.Label(search_frame, text="Has:").pack(side=tk.LEFT)
+        type_box = ttk.Combobox(search_frame, textvariable=self.library_type_var, width=12,
+                                state="readonly", values=["any"] + list(TYPE_CODES))
+        type_box.pack(side=tk.LEFT, padx=5)
+        ttk.Label(search_frame, text="Sort:").pack(side=tk.LEFT)
+        order_box = self.library_order_box = ttk.Combobox(
+            search_frame, textvariable=self.library_order_var, width=9, state="readonly")
+        order_box.pack(side=tk.LEFT, padx=5)
+        self.library_search_var.trace_add("write", lambda *args: self.update_library_list())
+        type_box.bind("<<ComboboxSelected>>", lambda event: self.update_library_list())
+        order_box.bind("<<ComboboxSelected>>", lambda event: self.update_library_list())
+        
+        list_frame = ttk.Frame(parent)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        columns = ("duration", "actions", "area", "last_run")
+        self.library_tree = ttk.Treeview(list_frame, columns=columns, selectmode="browse")
+        self.library_tree.heading("#0", text="Name")
+        self.library_tree.heading("duration", text="Duration")
+        self.library_tree.heading("actions", text="Actions")
+        self.library_tree.heading("area", text="Mouse area")
+        self.library_tree.heading("last_run", text="Last run")
+        self.library_tree.column("#0", width=160)
+        for column, width in zip(columns, (70, 70, 120, 150)):
+            self.library_tree.column(column, width=width, anchor=tk.W)
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.library_tree.yview)
+        self.library_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.library_tree.pack(fill=tk.BOTH, expand=True)
+        self.library_tree.bind("<Double-Button-1>", lambda event: self.open_library_macro())
+        self.library_tree.bind("<Return>", lambda event: self.open_library_macro())
+        
+        buttons = ttk.Frame(parent)
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(buttons, text="Open", command=self.open_library_macro).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Play", command=lambda: self.open_library_macro(play=True)).pack(side=tk.LEFT, padx=5)
+        self.library_info_var = tk.StringVar()
+        ttk.Label(buttons, textvariable=self.library_info_var).pack(side=tk.RIGHT)
 
     def create_help_tab(self, parent):
         self.help_tab = parent
@@ -185,14 +407,14 @@ Hotkeys:
 
     def handle_f6(self, event):
         if event.event_type == 'down':
-            current_time = time.time()
+            current_time = time.monotonic()
             if current_time - self.last_record_press > self.debounce_delay:
                 self.last_record_press = current_time
                 self.toggle_recording()
 
     def handle_f7(self, event):
         if event.event_type == 'down':
-            current_time = time.time()
+            current_time = time.monotonic()
             if current_time - self.last_play_press > self.debounce_delay:
                 self.last_play_press = current_time
                 self.toggle_playback()
@@ -207,6 +429,8 @@ Hotkeys:
             self.update_actions_list()
         else:
             # start recording
+            if self.scheduled_job_playing():
+                return
             if self.is_playing:
                 self.toggle_playback()  # Detener playback si está activo
             self.is_recording = True
@@ -218,19 +442,70 @@ Hotkeys:
     def toggle_playback(self):
         if not self.is_playing:
             # Iniciar reproducción
-            if not self.recorded_actions:
-                messagebox.showinfo("No Actions", "Record some actions first!")
-                return
-            self.is_playing = True
-            self.play_button.config(text="Stop Playback (F7)")
-            self.status_var.set("Playing... Press F7 to stop")
-            self.player.start_playback()
+            self.play_range()
         else:
-            # Detener reproducción
+            # Detener reproducción, the player updates the UI once the run has ended
             self.player.stop_playback()
-            self.is_playing = False
-            self.play_button.config(text="Start Playback (F7)")
-            self.status_var.set("Playback stopped")
+            self.status_var.set("Stopping playback...")
+
+    def play_range(self, start_index=0, stop_index=None):
+        """Start playback at start_index, or of [start_index, stop_index) only"""
+        if self.is_playing or self.scheduled_job_playing():
+            return
+        if not self.recorded_actions:
+            messagebox.showinfo("No Actions", "Record some actions first!")
+            return
+        try:
+            self.player.check_range(self.recorded_actions, start_index, stop_index)
+        except ValueError as e:
+            messagebox.showerror("Playback Error", str(e))
+            return
+        self.show_all_actions()  # Progress is shown on the whole macro
+        self.is_playing = True
+        self.play_button.config(text="Stop Playback (F7)")
+        self.status_var.set("Playing... Press F7 to stop")
+        self.player.start_playback(start_index=start_index, stop_index=stop_index)
+
+    def play_from_selection(self):
+        self.show_all_actions()
+        selection = self.actions_listbox.selection_range()
+        self.play_range(selection[0] if selection else 0)
+
+    def play_selection(self):
+        self.show_all_actions()
+        selection = self.actions_listbox.selection_range()
+        if not selection:
+            messagebox.showinfo("Play Selection", "Select the actions to play first.")
+            return
+        self.play_range(*selection)
+
+    def play_from_time(self):
+        if not self.recorded_actions:
+            messagebox.showinfo("No Actions", "Record some actions first!")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Play From Time")
+        dialog.geometry("260x110")
+        ttk.Label(dialog, text="Time into the macro (seconds or mm:ss):").pack(pady=5)
+        
+        time_var = tk.StringVar(value="0")
+        ttk.Entry(dialog, textvariable=time_var).pack(pady=5)
+        
+        def play():
+            try:
+                offset_ns = parse_seconds_ns(time_var.get()) or 0
+            except ValueError as e:
+                messagebox.showerror("Play From Time", str(e))
+                return
+            index = self.player.index_at_time(self.recorded_actions, offset_ns)
+            dialog.destroy()
+            if index >= len(self.recorded_actions):
+                messagebox.showinfo("Play From Time", "The macro ends before that time.")
+                return
+            self.play_range(index)
+        
+        ttk.Button(dialog, text="Play", command=play).pack(pady=5)
 
     def on_close(self):
         keyboard.unhook_all()  # Limpiar todas las hotkeys
@@ -239,6 +514,65 @@ Hotkeys:
     def update_speed_label(self, *args):
         self.speed_label.config(text=f"{self.delay_between_actions.get():.1f}x")
 
+    def toggle_journal(self):
+        self.recorder.journal_dir = RECORDINGS_DIR if self.journal_var.get() else None
+
+    def update_sampling(self, *args):
+        self.recorder.adaptive_moves = self.adaptive_var.get()
+        try:
+            self.recorder.move_error_budget = max(0.1, self.error_budget_var.get())
+        except tk.TclError:
+            pass  # Not a number yet, keep the previous budget
+
+    def toggle_profiling(self):
+        self.player.profiling = self.profile_var.get()
+
+    def show_playback_stats(self):
+        stats = self.player.stats
+        timing = self.player.last_timing
+        text = stats.format_table() if stats else "No samples."
+        if timing:
+            text = (f"Last run: {timing['count']} actions in {timing['elapsed_s']:.3f} s, "
+                    f"{timing.get('errors', 0)} errors\n\n") + text
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, text)
+        self.stats_text.config(state=tk.DISABLED)
+
+    def show_recording_stats(self):
+        summary = self.recorder.actions.metadata.get("recording")
+        if not summary:
+            return
+        counters = summary["counters"]
+        text = (f"Last recording: {summary['duration_s']:.1f} s, {summary['events_per_s']:.0f} events/s, "
+                f"{summary['actions']} actions\n"
+                f"Moves below distance: {counters['moves_below_distance']}, "
+                f"throttled: {counters['moves_throttled']}, hotkeys skipped: {counters['hotkeys_skipped']}\n\n"
+                + self.recorder.stats.format_table())
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, text)
+        self.stats_text.config(state=tk.DISABLED)
+
+    def export_stats(self, file_format):
+        stats = self.player.stats
+        if not stats:
+            messagebox.showinfo("Export Stats", "No playback statistics yet. Enable profiling and play a macro.")
+            return
+        filename = filedialog.asksaveasfilename(
+            defaultextension="." + file_format,
+            filetypes=[(f"{file_format.upper()} files", f"*.{file_format}"), ("All files", "*.*")]
+        )
+        if filename:
+            try:
+                if file_format == "csv":
+                    stats.export_csv(filename)
+                else:
+                    stats.export_json(filename, {"timing": self.player.last_timing})
+                self.status_var.set(f"Stats exported: {os.path.basename(filename)}")
+            except Exception as e:
+                messagebox.showerror("Export Error", str(e))
+
     def toggle_infinite_loop(self):
         if self.infinite_loop_var.get():
             self.loop_count.set(0)
@@ -248,8 +582,11 @@ Hotkeys:
     def show_context_menu(self, event):
         try:
             index = self.actions_listbox.nearest(event.y)
-            self.actions_listbox.selection_clear(0, tk.END)
-            self.actions_listbox.selection_set(index)
+            selection = self.actions_listbox.selection_range()
+            # Keep a range selection when the click lands inside it
+            if not selection or not selection[0] <= index < selection[1]:
+                self.actions_listbox.selection_clear(0, tk.END)
+                self.actions_listbox.selection_set(index)
             self.context_menu.tk_popup(event.x_root, event.y_root)
         finally:
             self.context_menu.grab_release()
@@ -257,70 +594,274 @@ Hotkeys:
     def save_macro(self):
         filename = filedialog.asksaveasfilename(
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            filetypes=MACRO_FILETYPES
         )
         if filename:
             try:
-                with open(filename, 'w') as f:
-                    json.dump(self.recorded_actions, f, indent=2)
+                self.keep_clipboard()
+                if save_actions(filename, self.recorded_actions):
+                    # Saved over the file the macro was streamed from, read it from the new file
+                    from library import open_macro
+                    self.set_actions(open_macro(filename))
+                self.current_file = filename
                 self.status_var.set(f"Saved: {os.path.basename(filename)}")
             except Exception as e:
                 messagebox.showerror("Save Error", str(e))
 
     def load_macro(self):
         filename = filedialog.askopenfilename(
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            filetypes=MACRO_FILETYPES
         )
         if filename:
             try:
-                with open(filename, 'r') as f:
-                    self.recorded_actions = json.load(f)
-                self.update_actions_list()
+                from library import open_macro
+                self.set_actions(open_macro(filename))
+                self.current_file = filename
                 self.status_var.set(f"Loaded: {os.path.basename(filename)}")
             except Exception as e:
                 messagebox.showerror("Load Error", str(e))
 
     def clear_actions(self):
         if messagebox.askyesno("Clear Actions", "Clear all recorded actions?"):
-            self.recorded_actions = []
-            self.actions_listbox.delete(0, tk.END)
+            self.show_all_actions()
+            # Undoable, unlike File > New
+            self.recorded_actions.replace(ActionBuffer())
+            self.actions_listbox.set_items(self.recorded_actions)
             self.status_var.set("Actions cleared")
 
+    def new_macro(self):
+        if messagebox.askyesno("New Macro", "Discard all recorded actions?"):
+            self.set_actions(ActionBuffer())
+            self.current_file = None
+            self.status_var.set("New macro")
+
+    def set_actions(self, actions):
+        """Start editing a new macro, e.g. a finished recording or a loaded file"""
+        previous = self.recorded_actions
+        self.keep_clipboard()
+        self.recorded_actions = MacroDocument(actions)
+        self.action_index = None
+        self.filtered = None
+        self.matches_only_var.set(False)
+        self.update_actions_list()
+        previous.close()  # Release the container file the previous macro was read from
+        # Indexing a container up front would decode all of it, its chunks are indexed when searched
+        if not self.recorded_actions.streamed:
+            self.index_in_background()
+
+    def keep_clipboard(self):
+        """Decode copied actions still read from a container, before its file is closed"""
+        if self.clipboard is not None:
+            self.clipboard = self.clipboard.loaded()
+
+    def macro_index(self):
+        """Index of the macro for the find bar, created on first use"""
+        if self.action_index is None:
+            from index import MacroIndex
+            self.action_index = MacroIndex(self.recorded_actions)
+        return self.action_index
+
+    def index_in_background(self):
+        """Index a few chunks per idle callback until the whole macro is indexed"""
+        index = self.macro_index()
+        
+        def step():
+            if index is self.action_index and not index.build(INDEX_CHUNKS_PER_STEP):
+                self.root.after(1, step)
+        
+        self.root.after_idle(step)
+
+    def build_query(self):
+        """ActionQuery from the find bar, or None after showing what is wrong"""
+        from index import ActionQuery
+        try:
+            action_type = self.find_type_var.get()
+            region = None
+            if self.find_region_var.get().strip():
+                region = [int(value) for value in self.find_region_var.get().split(",")]
+                if len(region) != 4:
+                    raise ValueError("Region must be x1,y1,x2,y2")
+            return ActionQuery(
+                action_type=None if action_type == "any" else action_type,
+                name=self.find_name_var.get().strip() or None,
+                region=region,
+                start_ns=parse_seconds_ns(self.find_from_var.get()),
+                end_ns=parse_seconds_ns(self.find_to_var.get()),
+                state="down" if self.find_presses_var.get() else None,
+            )
+        except ValueError as e:
+            messagebox.showerror("Find", str(e))
+            return None
+
+    def find_action(self, step):
+        """Select the next (step 1) or previous (step -1) matching action"""
+        if self.filtered is not None:
+            # Every row is a match already
+            selection = self.actions_listbox.selection_range()
+            if self.filtered.indices:
+                row = selection[0] + step if selection else 0
+                row = max(0, min(len(self.filtered) - 1, row))
+                self.actions_listbox.selection_set(row)
+                self.actions_listbox.see(row)
+            return
+        
+        query = self.build_query()
+        if query is None:
+            return
+        selection = self.actions_listbox.selection_range()
+        if step > 0:
+            found = self.macro_index().find_next(query, selection[0] + 1 if selection else 0)
+        else:
+            found = self.macro_index().find_previous(
+                query, selection[0] if selection else len(self.recorded_actions))
+        if found is None:
+            self.status_var.set("No more matches")
+            return
+        self.actions_listbox.selection_set(found)
+        self.actions_listbox.see(found)
+        self.status_var.set(f"Match at action {found+1}")
+
+    def toggle_matches_only(self):
+        if not self.matches_only_var.get():
+            self.show_all_actions()
+            return
+        query = self.build_query()
+        if query is None:
+            self.matches_only_var.set(False)
+            return
+        from index import Matches
+        self.filtered = Matches(self.recorded_actions, self.macro_index().find(query))
+        self.actions_listbox.set_items(self.filtered)
+        self.status_var.set(f"{len(self.filtered)} matching action(s)")
+
+    def show_all_actions(self):
+        """Leave the matches only view, keeping the selected match selected"""
+        if self.filtered is None:
+            return
+        selection = self.actions_listbox.selection_range()
+        target = self.filtered.indices[selection[0]] if selection else None
+        self.filtered = None
+        self.matches_only_var.set(False)
+        self.actions_listbox.set_items(self.recorded_actions)
+        if target is not None:
+            self.actions_listbox.selection_set(target)
+            self.actions_listbox.see(target)
+
     def update_actions_list(self):
-        self.actions_listbox.delete(0, tk.END)
-        for action in self.recorded_actions:
-            self.actions_listbox.insert(tk.END, self.format_action(action))
-
-    def format_action(self, action):
-        action_type = action.get("type", "")
-        if action_type == "delay":
-            return f"Delay: {action.get('duration', 0):.2f}s"
-        elif action_type == "mouse_move":
-            x, y = action.get("position", (0, 0))
-            return f"Move to ({x}, {y})"
-        elif action_type == "mouse_click":
-            btn = action.get("button", "left").capitalize()
-            state = "Press" if action.get("state") == "down" else "Release"
-            return f"Mouse {btn} {state}"
-        elif action_type == "mouse_scroll":
-            return f"Scroll: {action.get('amount', 0)}"
-        elif action_type == "key_press":
-            return f"Key Press: {action.get('key', '')}"
-        elif action_type == "key_release":
-            return f"Key Release: {action.get('key', '')}"
-        return "Unknown Action"
+        self.actions_listbox.set_items(self.recorded_actions)
+
+    def edited(self, message, select=None):
+        """Show the result of an edit and optionally select (start, stop)"""
+        self.actions_listbox.selection_clear(0, tk.END)
+        self.actions_listbox.refresh()
+        if select and select[1] > select[0]:
+            self.actions_listbox.selection_set(select[0], select[1] - 1)
+            self.actions_listbox.see(select[0])
+        self.status_var.set(message)
+
+    def undo_edit(self):
+        self.show_all_actions()
+        if self.recorded_actions.undo():
+            self.edited("Undone")
+        return "break"
+
+    def redo_edit(self):
+        self.show_all_actions()
+        if self.recorded_actions.redo():
+            self.edited("Redone")
+        return "break"
+
+    def copy_selection(self):
+        self.show_all_actions()
+        selection = self.actions_listbox.selection_range()
+        if selection:
+            self.clipboard = self.recorded_actions.copy(*selection)
+            self.status_var.set(f"{len(self.clipboard)} action(s) copied")
+        return "break"
+
+    def cut_selection(self):
+        self.show_all_actions()
+        selection = self.actions_listbox.selection_range()
+        if selection:
+            self.clipboard = self.recorded_actions.cut(*selection)
+            self.edited(f"{len(self.clipboard)} action(s) cut")
+        return "break"
+
+    def paste_clipboard(self):
+        self.show_all_actions()
+        if not self.clipboard:
+            return "break"
+        selection = self.actions_listbox.selection_range()
+        index = selection[0] if selection else len(self.recorded_actions)
+        self.recorded_actions.paste(index, self.clipboard)
+        count = len(self.clipboard)
+        self.edited(f"{count} action(s) pasted", (index, index + count))
+        return "break"
 
     def delete_selected_action(self):
-        selected = self.actions_listbox.curselection()
-        if selected:
-            index = selected[0]
-            self.recorded_actions.pop(index)
-            self.actions_listbox.delete(index)
-            self.status_var.set(f"Action {index+1} deleted")
+        self.show_all_actions()
+        selection = self.actions_listbox.selection_range()
+        if selection:
+            start, stop = selection
+            self.recorded_actions.delete(start, stop)
+            if stop - start == 1:
+                self.edited(f"Action {start+1} deleted")
+            else:
+                self.edited(f"Actions {start+1}-{stop} deleted")
+        return "break"
+
+    def move_selection(self, step):
+        """Move the selected actions one row up (step -1) or down (step 1)"""
+        self.show_all_actions()
+        selection = self.actions_listbox.selection_range()
+        if not selection:
+            return "break"
+        start, stop = selection
+        if step < 0 and start > 0:
+            self.recorded_actions.move(start, stop, start - 1)
+        elif step > 0 and stop < len(self.recorded_actions):
+            self.recorded_actions.move(start, stop, stop + 1)
+        else:
+            return "break"
+        self.edited(f"Moved {stop - start} action(s)", (start + step, stop + step))
+        return "break"
+
+    def shift_selection_time(self):
+        self.show_all_actions()
+        selection = self.actions_listbox.selection_range()
+        if not selection:
+            messagebox.showinfo("Shift Time", "Select the actions to shift first.")
+            return
+        start, stop = selection
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Shift Time")
+        dialog.geometry("280x140")
+        ttk.Label(dialog, text="Shift by (milliseconds, negative is earlier):").pack(pady=5)
+        
+        shift_var = tk.DoubleVar(value=100.0)
+        ttk.Entry(dialog, textvariable=shift_var).pack(pady=5)
+        following_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(dialog, text="Also shift the actions after the selection",
+                        variable=following_var).pack(pady=5)
+        
+        def apply_shift():
+            try:
+                delta_ns = round(shift_var.get() * NS_PER_SECOND / 1000)
+            except tk.TclError:
+                messagebox.showerror("Shift Time", "Enter a number of milliseconds.")
+                return
+            end = len(self.recorded_actions) if following_var.get() else stop
+            self.recorded_actions.shift_time(start, end, delta_ns)
+            dialog.destroy()
+            self.edited(f"Shifted {end - start} action(s) by {delta_ns / 1e6:.0f} ms", selection)
+        
+        ttk.Button(dialog, text="Shift", command=apply_shift).pack(pady=5)
 
     def insert_delay(self):
-        selected = self.actions_listbox.curselection()
-        index = selected[0] if selected else len(self.recorded_actions)
+        self.show_all_actions()
+        selection = self.actions_listbox.selection_range()
+        index = selection[0] if selection else len(self.recorded_actions)
         
         dialog = tk.Toplevel(self.root)
         dialog.title("Insert Delay")
@@ -332,22 +873,234 @@ Hotkeys:
         
         def add_delay():
             duration = delay_var.get()
-            self.recorded_actions.insert(index, {
+            self.recorded_actions.insert(index, [{
                 "type": "delay",
                 "duration": duration,
                 "time": 0
-            })
-            self.actions_listbox.insert(index, f"Delay: {duration:.2f}s")
+            }])
             dialog.destroy()
+            self.edited(f"Delay of {duration:.2f}s inserted", (index, index + 1))
         
         ttk.Button(dialog, text="Add", command=add_delay).pack(pady=5)
 
+    def simplify_movements(self):
+        self.show_all_actions()
+        if not self.recorded_actions:
+            return
+        before = len(self.recorded_actions)
+        simplified, ratio = simplify_moves(self.recorded_actions.to_buffer(),
+                                           self.recorder.simplify_tolerance or 1.0)
+        self.recorded_actions.replace(simplified)
+        self.edited(f"Simplified {before} actions to {len(self.recorded_actions)} ({ratio:.1f}x)")
+
+    def choose_library_dir(self):
+        directory = filedialog.askdirectory(initialdir=self.library_dir_var.get())
+        if directory:
+            self.library_dir_var.set(directory)
+            self.refresh_library()
+
+    def refresh_library(self):
+        """Rescan the library folder in a thread, only changed files are read"""
+        if self.library_refreshing:
+            return
+        # Imported on first use, the library loads the macro readers and the player
+        from library import MacroLibrary, LIBRARY_DIR, LIBRARY_DB, ORDERS
+        if self.library is None:
+            self.library_order_box.config(values=list(ORDERS))
+            if not self.library_dir_var.get():
+                self.library_dir_var.set(LIBRARY_DIR)
+        directory = os.path.abspath(self.library_dir_var.get())
+        if self.library is None or directory != self.library.directory:
+            if self.library is not None:
+                self.library.close()
+            self.library = MacroLibrary(directory, LIBRARY_DB)
+            if self.scheduler is not None:
+                self.scheduler.library = self.library
+        library = self.library
+        self.library_refreshing = True
+        self.update_library_list()
+        
+        def progress(done, total):
+            self.root.after(0, lambda: self.library_info_var.set(f"Reading macros {done}/{total}..."))
+        
+        def run():
+            try:
+                result = library.refresh(progress)
+            except Exception as e:
+                result = e
+            self.root.after(0, lambda: finished(result))
+        
+        def finished(result):
+            self.library_refreshing = False
+            if isinstance(result, Exception):
+                messagebox.showerror("Library Error", str(result))
+            elif any(result):
+                self.status_var.set("Library: {} added, {} updated, {} removed".format(*result))
+            self.update_library_list()
+        
+        threading.Thread(target=run, daemon=True).start()
+
+    def update_library_list(self):
+        if self.library is None:
+            return
+        from library import format_duration
+        action_type = self.library_type_var.get()
+        rows = self.library.search(self.library_search_var.get(),
+                                   None if action_type == "any" else action_type,
+                                   self.library_order_var.get())
+        self.library_tree.delete(*self.library_tree.get_children())
+        for row in rows:
+            if row["error"]:
+                values = ("", "", "", f"Error: {row['error']}")
+            else:
+                area = ""
+                if row["min_x"] is not None:
+                    area = f"{row['min_x']},{row['min_y']} - {row['max_x']},{row['max_y']}"
+                last_run = ""
+                if row["run_at"] is not None:
+                    last_run = (f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(row['run_at']))} "
+                                f"({row['run_count']}x)")
+                values = (format_duration(row["duration_ns"]), row["action_count"], area, last_run)
+            self.library_tree.insert("", tk.END, iid=row["path"], text=row["name"], values=values)
+        if not self.library_refreshing:
+            self.library_info_var.set(f"{len(rows)} macros")
+
+    def open_library_macro(self, play=False):
+        selected = self.library_tree.selection()
+        if not selected:
+            return
+        path = selected[0]
+        try:
+            from library import open_macro
+            self.set_actions(open_macro(path))
+        except Exception as e:
+            messagebox.showerror("Load Error", str(e))
+            return
+        self.current_file = path
+        self.status_var.set(f"Loaded: {os.path.basename(path)}")
+        if play:
+            self.play_range()
+
+    def record_library_run(self, timing):
+        # Called by the player when playback stops
+        if self.library is not None and self.current_file and timing["count"]:
+            self.library.record_run(self.current_file, timing)
+            self.update_library_list()
+
+    def start_scheduler(self):
+        """Load the scheduled jobs and start running them"""
+        # Imported on first use, the scheduler pulls in the macro readers
+        from scheduler import Scheduler, SCHEDULE_FILE
+        self.scheduler = Scheduler(SCHEDULE_FILE, self.backend,
+                                   on_event=self.on_schedule_event,
+                                   can_run=lambda: not (self.is_recording or self.is_playing),
+                                   library=self.library)
+        self.scheduler.start()
+        self.update_schedule_list()
+
+    def update_schedule_list(self):
+        from scheduler import describe_rule
+        self.schedule_listbox.delete(0, tk.END)
+        for job in self.scheduler.jobs:
+            due = self.scheduler.next_due(job)
+            state = f"next {due:%Y-%m-%d %H:%M}" if due else "not scheduled"
+            if not job.get("enabled", True):
+                state = "disabled"
+            self.schedule_listbox.insert(tk.END, f"{job['name']}: {describe_rule(job['rule'])} ({state})")
+
+    def selected_scheduled_job(self):
+        selected = self.schedule_listbox.curselection()
+        if not selected or self.scheduler is None:
+            return None
+        return self.scheduler.jobs[selected[0]]
+
+    def scheduled_job_playing(self):
+        """True while the scheduler plays a job, the mouse and keyboard are busy then"""
+        job = self.scheduler.running_job if self.scheduler is not None else None
+        if job is None:
+            return False
+        self.status_var.set(f"Scheduled {job['name']} is playing, press Esc to stop it")
+        return True
+
+    def on_schedule_event(self, job, message):
+        # Called from the scheduler threads
+        self.root.after(0, lambda: (self.status_var.set(f"Scheduled {job['name']}: {message}"),
+                                    self.update_schedule_list()))
+
+    def add_scheduled_job(self):
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Schedule Macro")
+        dialog.geometry("380x260")
+        
+        macro_var = tk.StringVar(value=self.current_file or "")
+        rule_var = tk.StringVar(value="once")
+        at_var = tk.StringVar(value=time.strftime("%Y-%m-%d %H:%M"))
+        start_var = tk.StringVar(value="09:00")
+        end_var = tk.StringVar(value="17:00")
+        cron_var = tk.StringVar(value="0 9 * * 1-5")
+        loops_var = tk.IntVar(value=1)
+        
+        def browse():
+            filename = filedialog.askopenfilename(parent=dialog, filetypes=MACRO_FILETYPES)
+            if filename:
+                macro_var.set(filename)
+        
+        ttk.Label(dialog, text="Macro:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=3)
+        ttk.Entry(dialog, textvariable=macro_var, width=30).grid(row=0, column=1, padx=5, pady=3)
+        ttk.Button(dialog, text="...", width=3, command=browse).grid(row=0, column=2, padx=5, pady=3)
+        
+        ttk.Radiobutton(dialog, text="Once at", variable=rule_var, value="once").grid(row=1, column=0, sticky=tk.W, padx=5, pady=3)
+        ttk.Entry(dialog, textvariable=at_var, width=30).grid(row=1, column=1, padx=5, pady=3)
+        ttk.Radiobutton(dialog, text="Daily from", variable=rule_var, value="window").grid(row=2, column=0, sticky=tk.W, padx=5, pady=3)
+        ttk.Entry(dialog, textvariable=start_var, width=30).grid(row=2, column=1, padx=5, pady=3)
+        ttk.Label(dialog, text="to").grid(row=3, column=0, sticky=tk.E, padx=5, pady=3)
+        ttk.Entry(dialog, textvariable=end_var, width=30).grid(row=3, column=1, padx=5, pady=3)
+        ttk.Radiobutton(dialog, text="Cron", variable=rule_var, value="cron").grid(row=4, column=0, sticky=tk.W, padx=5, pady=3)
+        cron_entry = ttk.Entry(dialog, textvariable=cron_var, width=30)
+        cron_entry.grid(row=4, column=1, padx=5, pady=3)
+        create_tooltip(cron_entry, "minute hour day month weekday, e.g. */15 9-17 * * 1-5")
+        ttk.Label(dialog, text="Loops:").grid(row=5, column=0, sticky=tk.W, padx=5, pady=3)
+        ttk.Entry(dialog, textvariable=loops_var, width=5).grid(row=5, column=1, sticky=tk.W, padx=5, pady=3)
+        
+        def add_job():
+            rule_type = rule_var.get()
+            if rule_type == "once":
+                rule = {"type": "once", "at": at_var.get().strip()}
+            elif rule_type == "window":
+                rule = {"type": "window", "start": start_var.get().strip(), "end": end_var.get().strip()}
+            else:
+                rule = {"type": "cron", "expr": cron_var.get().strip()}
+            try:
+                self.scheduler.add_job(macro_var.get().strip(), rule, loops_var.get(),
+                                       self.delay_between_actions.get())
+            except (ValueError, tk.TclError) as e:
+                messagebox.showerror("Schedule Error", str(e), parent=dialog)
+                return
+            self.update_schedule_list()
+            dialog.destroy()
+        
+        ttk.Button(dialog, text="Add", command=add_job).grid(row=6, column=1, pady=8)
+
+    def toggle_scheduled_job(self):
+        job = self.selected_scheduled_job()
+        if job is not None:
+            self.scheduler.set_enabled(job["id"], not job.get("enabled", True))
+            self.update_schedule_list()
+
+    def remove_scheduled_job(self):
+        job = self.selected_scheduled_job()
+        if job is not None and messagebox.askyesno("Remove Job", f"Remove scheduled job {job['name']}?"):
+            self.scheduler.remove_job(job["id"])
+            self.update_schedule_list()
+
     def stop_all(self):
         if self.is_recording: self.toggle_recording()
         if self.is_playing: self.toggle_playback()
 
     def on_close(self):
         self.stop_all()
+        if self.scheduler is not None:
+            self.scheduler.stop()
         keyboard.clear_all_hotkeys()
         self.root.destroy()
 
@@ -0,0 +1,186 @@
+"""Optimization passes over recorded actions."""
+import math
+from actions import ActionBuffer, MOUSE_MOVE, DELAY
+
+
+def _point_line_distance(px, py, ax, ay, bx, by):
+    """Distance from point p to the segment a-b"""
+    dx = bx - ax
+    dy = by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def douglas_peucker(xs, ys, tolerance):
+    """Return a keep flag per point of the polyline (Ramer-Douglas-Peucker).
+
+    The first and last points are always kept. Iterative, so long runs do
+    not hit the recursion limit.
+    """
+    count = len(xs)
+    keep = [False] * count
+    if count == 0:
+        return keep
+    keep[0] = keep[-1] = True
+
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        ax, ay, bx, by = xs[first], ys[first], xs[last], ys[last]
+        max_distance = -1.0
+        max_index = first
+        for index in range(first + 1, last):
+            distance = _point_line_distance(xs[index], ys[index], ax, ay, bx, by)
+            if distance > max_distance:
+                max_distance = distance
+                max_index = index
+
+        if max_distance > tolerance:
+            keep[max_index] = True
+            stack.append((first, max_index))
+            stack.append((max_index, last))
+    return keep
+
+
+def simplify_moves(actions, tolerance=1.0):
+    """Drop mouse moves that lie within tolerance pixels of a straight path.
+
+    Only runs made of mouse moves and delays are touched; clicks, scrolls and
+    keys stay where they are. The delays around a dropped move are merged
+    into one delay before the next kept move, so the total time is kept.
+
+    Returns (new ActionBuffer, compression ratio of original / new count).
+    """
+    source = ActionBuffer.coerce(actions)
+    kinds = source.kinds
+    total = len(source)
+
+    # Mark which moves survive, one run of moves and delays at a time
+    keep = [True] * total
+    index = 0
+    while index < total:
+        if kinds[index] not in (MOUSE_MOVE, DELAY):
+            index += 1
+            continue
+
+        run_end = index
+        while run_end < total and kinds[run_end] in (MOUSE_MOVE, DELAY):
+            run_end += 1
+
+        moves = [i for i in range(index, run_end) if kinds[i] == MOUSE_MOVE]
+        if len(moves) > 2:
+            flags = douglas_peucker([source.xs[i] for i in moves],
+                                    [source.ys[i] for i in moves], tolerance)
+            for move_index, kept in zip(moves, flags):
+                keep[move_index] = kept
+        index = run_end
+
+    # Copy kept actions, merging the delays on both sides of a dropped move
+    result = source[0:0]
+    pending_delays = []  # [time, duration] waiting for the next kept action
+    merge_next = False
+    for index in range(total):
+        kind = kinds[index]
+        if kind == DELAY:
+            if merge_next and pending_delays:
+                pending_delays[-1][0] = source.times[index]
+                pending_delays[-1][1] += source.values[index]
+            else:
+                pending_delays.append([source.times[index], source.values[index]])
+            merge_next = False
+            continue
+
+        if not keep[index]:
+            merge_next = True
+            continue
+
+        for delay_time, duration in pending_delays:
+            result.append_delay(delay_time, duration)
+        pending_delays = []
+        merge_next = False
+        result._append_row(kind, source.times[index], source.xs[index], source.ys[index],
+                           source.codes[index], source.values[index])
+
+    for delay_time, duration in pending_delays:
+        result.append_delay(delay_time, duration)
+
+    ratio = total / len(result) if len(result) else 1.0
+    return result, ratio
+
+
+class AdaptiveMoveSampler:
+    """Online mouse move sampler driven by an error budget instead of fixed thresholds.
+
+    Incoming positions are buffered behind the last kept sample (the anchor).
+    A position is only kept when skipping it would break the budget: a
+    buffered point strays more than error_budget pixels from the straight
+    line anchor -> newest (a turn), or the cursor got more than max_step
+    pixels from the anchor (fast motion, since playback jumps between
+    samples). Fast or turning motion is therefore sampled densely, while slow
+    straight motion and jitter cost almost nothing.
+    """
+
+    def __init__(self, error_budget=2.0, max_step=80.0, max_window=64):
+        self.error_budget = error_budget
+        self.max_step = max_step
+        self.max_window = max_window
+        self.anchor = None
+        self.window = []  # (position, time) received since the anchor
+
+    def reset(self, position):
+        """Restart from a position the cursor is known to be at"""
+        self.anchor = (position[0], position[1])
+        self.window = []
+
+    def held(self):
+        """Newest buffered (position, time), or None if nothing is pending"""
+        return self.window[-1] if self.window else None
+
+    def _fits(self):
+        ax, ay = self.anchor
+        (cx, cy), _ = self.window[-1]
+        if math.hypot(cx - ax, cy - ay) > self.max_step or len(self.window) > self.max_window:
+            return False
+        budget = self.error_budget
+        for (px, py), _ in self.window[:-1]:
+            if _point_line_distance(px, py, ax, ay, cx, cy) > budget:
+                return False
+        return True
+
+    def add(self, position, event_time):
+        """Feed a position, returning the (position, time) samples to record"""
+        if self.anchor is None:
+            self.reset(position)
+            return [(position, event_time)]
+
+        # Polling reports the same position over and over while the cursor rests
+        newest = self.window[-1][0] if self.window else self.anchor
+        if position[0] == newest[0] and position[1] == newest[1]:
+            return []
+
+        self.window.append((position, event_time))
+        if self._fits():
+            return []
+
+        # Keep the last point that still fit and start a new window from it
+        samples = []
+        if len(self.window) > 1:
+            kept = self.window[-2]
+            samples.append(kept)
+            self.anchor = kept[0]
+            self.window = [self.window[-1]]
+            if self._fits():
+                return samples
+
+        # A single step over max_step: keep the new point too
+        kept = self.window[-1]
+        samples.append(kept)
+        self.anchor = kept[0]
+        self.window = []
+        return samples
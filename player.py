@@ -1,31 +1,256 @@
 import time
 import threading
-import pyautogui
-import keyboard
-from recorder import ActionType
+from bisect import bisect_left
+import actions as kinds
+from actions import ActionBuffer, CODE_TYPES, NS_PER_SECOND
+from backends import PyAutoGuiBackend
+from stats import HistogramSet
+
+# Below this much remaining time (ns) we stop sleeping and spin on the clock
+SPIN_THRESHOLD_NS = 2_000_000
+# Longest single sleep in seconds, so stop requests are honoured during long waits
+MAX_SLEEP_SLICE = 0.05
+
+
+class Timeline:
+    """Turns recorded action times into playback offsets, one chunk at a time.
+    
+    Offsets come from the recorded action times, relative to the first
+    action. Recorded delays are already part of those times, so they add
+    nothing. Delays inserted by hand carry a time that does not move forward
+    and are added on top instead, including a delay inserted before the
+    first action, which carries that action's time.
+    """
+    def __init__(self):
+        self.previous_time = 0
+        self.inserted = 0
+        self.base = None
+    
+    def offsets(self, buffer):
+        """Offsets in nanoseconds for the actions of the next chunk"""
+        offsets = []
+        if self.base is None and len(buffer):
+            # The first time is offset 0, a delay there waits before everything else
+            self.base = self.previous_time = buffer.times[0]
+        previous_time = self.previous_time
+        inserted = self.inserted
+        
+        for kind, action_time, value in zip(buffer.kinds, buffer.times, buffer.values):
+            if action_time < previous_time:
+                action_time = previous_time
+            
+            if kind == kinds.DELAY and action_time <= previous_time:
+                inserted += round(value * NS_PER_SECOND)
+            
+            offsets.append(action_time + inserted)
+            previous_time = action_time
+        
+        self.previous_time = previous_time
+        self.inserted = inserted
+        if offsets:
+            base = self.base
+            offsets = [offset - base for offset in offsets]
+        return offsets
+
+
+class PlaybackPlan:
+    """Actions compiled once into backend calls with their arguments resolved.
+    
+    steps[i] is a tuple of (function, args) pairs for action i, empty for
+    delays. The move_to before a click or scroll is left out when the
+    previous action already put the cursor there; dropped_moves keeps those
+    targets so playback can still start in the middle of the plan.
+    """
+    def __init__(self, buffer, backend, timeline=None, position=None):
+        self.buffer = buffer
+        self.backend = backend
+        self.revision = buffer.revision
+        self.offsets = (timeline or Timeline()).offsets(buffer)
+        self.steps = []
+        self.dropped_moves = {}
+        
+        move_to = backend.move_to
+        strings = buffer.strings
+        steps = self.steps
+        for index, (kind, x, y, code, value) in enumerate(zip(
+                buffer.kinds, buffer.xs, buffer.ys, buffer.codes, buffer.values)):
+            if kind == kinds.MOUSE_MOVE:
+                steps.append(((move_to, (x, y)),))
+                position = (x, y)
+                continue
+            
+            if kind == kinds.MOUSE_CLICK:
+                action = backend.mouse_down if value else backend.mouse_up
+                call = (action, (strings[code],))
+            elif kind == kinds.MOUSE_SCROLL:
+                call = (backend.scroll, (code,))
+            elif kind == kinds.KEY_PRESS:
+                steps.append(((backend.key_down, (strings[code],)),))
+                continue
+            elif kind == kinds.KEY_RELEASE:
+                steps.append(((backend.key_up, (strings[code],)),))
+                continue
+            else:
+                # Delays are covered by the deadlines
+                steps.append(())
+                continue
+            
+            # Clicks and scrolls happen at a position
+            if position == (x, y):
+                self.dropped_moves[index] = position
+                steps.append((call,))
+            else:
+                steps.append(((move_to, (x, y)), call))
+            position = (x, y)
+        
+        self.end_position = position
+    
+    def is_current(self, buffer, backend):
+        """Check if the plan still matches the buffer and backend"""
+        return (self.buffer is buffer and self.revision == buffer.revision
+                and self.backend is backend)
+
+
+class InputState:
+    """Mouse buttons and keys held down at some point of a macro, and the cursor position.
+    
+    Used to start playback in the middle of a macro: scanning the actions
+    before the start tells which presses are still waiting for their
+    release, and restore() puts the backend in that state.
+    """
+    def __init__(self):
+        self.keys = {}  # Held keys in press order (values unused)
+        self.buttons = {}
+        self.position = None
+    
+    def copy(self):
+        state = InputState()
+        state.keys = dict(self.keys)
+        state.buttons = dict(self.buttons)
+        state.position = self.position
+        return state
+    
+    def scan(self, buffer, start, stop):
+        """Apply the actions in [start, stop) of a buffer, in one pass"""
+        action_kinds = buffer.kinds
+        codes = buffer.codes
+        strings = buffer.strings
+        keys = self.keys
+        buttons = self.buttons
+        position_index = None
+        for index in range(start, stop):
+            kind = action_kinds[index]
+            if kind == kinds.KEY_PRESS:
+                keys[strings[codes[index]]] = None
+            elif kind == kinds.KEY_RELEASE:
+                keys.pop(strings[codes[index]], None)
+            elif kind == kinds.MOUSE_CLICK:
+                if buffer.values[index]:
+                    buttons[strings[codes[index]]] = None
+                else:
+                    buttons.pop(strings[codes[index]], None)
+                position_index = index
+            elif kind != kinds.DELAY:
+                position_index = index
+        if position_index is not None:
+            self.position = (buffer.xs[position_index], buffer.ys[position_index])
+    
+    def restore(self, backend):
+        """Move the cursor and press everything that is held"""
+        if self.position is not None:
+            backend.move_to(*self.position)
+        for button in self.buttons:
+            backend.mouse_down(button)
+        for key in self.keys:
+            backend.key_down(key)
+    
+    def release(self, backend):
+        """Release everything that is held"""
+        for key in reversed(list(self.keys)):
+            backend.key_up(key)
+        for button in reversed(list(self.buttons)):
+            backend.mouse_up(button)
+        self.keys.clear()
+        self.buttons.clear()
+
+
+def build_schedule(actions):
+    """Return the start offset in nanoseconds of every action, relative to the first one"""
+    return Timeline().offsets(ActionBuffer.coerce(actions))
+
+
+def as_playback_source(actions):
+    """Keep streamed sources (with iter_chunks) as they are, buffer everything else.
+    
+    Editor documents are flattened into their cached buffer, so the compiled
+    plan is reused until the next edit, unless they were opened from a
+    container: those are played chunk by chunk like a journal.
+    """
+    if hasattr(actions, "to_buffer") and not getattr(actions, "streamed", False):
+        return actions.to_buffer()
+    if hasattr(actions, "iter_chunks"):
+        return actions
+    return ActionBuffer.coerce(actions)
+
+
+class PlaybackProgress:
+    """Latest playback position, written by the playback thread and read by the GUI.
+    
+    The writer only replaces a tuple, so publishing costs the same no matter
+    how fast actions run, and readers never see a half-updated state.
+    """
+    def __init__(self):
+        self.state = None
+        self.total_actions = 0
+        self.total_loops = 1
+    
+    def reset(self, total_actions, total_loops):
+        self.state = None
+        self.total_actions = total_actions
+        self.total_loops = total_loops
+    
+    def publish(self, action_index, current_loop):
+        self.state = (action_index, current_loop)
+    
+    def latest(self):
+        return self.state
+
 
 class Player:
-    def __init__(self, app):
+    def __init__(self, app=None, backend=None):
         self.app = app
+        self.backend = backend if backend is not None else PyAutoGuiBackend()
         self.playing = False
         self.thread = None
         self.stop_requested = False
         self.stop_hotkey = "f7"  # Default hotkey to stop playback
         self.emergency_stop = "esc"  # Emergency stop key
+        self.hotkey_handles = []  # Hotkeys registered for the current playback only
+        self.last_timing = None  # Lateness summary of the last playback
+        self.progress = PlaybackProgress()
+        self.progress_hz = 30  # How often the GUI reads the playback progress
+        self.shown_progress = None
+        self.plan = None  # Compiled PlaybackPlan of the last in-memory macro
+        self.profiling = False  # Collect per action type latency histograms into stats
+        self.stats = None
         
-    def start_playback(self, actions=None, loop_count=1, delay_factor=1.0):
-        """Start playing back recorded actions"""
+    def start_playback(self, actions=None, loop_count=1, delay_factor=1.0, start_index=0,
+                       stop_index=None):
+        """Start playing back recorded actions, see play() for start_index and stop_index"""
         if self.playing:
             return
             
-        if actions is None:
+        if actions is None and self.app is not None:
             actions = self.app.recorded_actions
             
         if not actions:
             return
+        actions = as_playback_source(actions)
+        self.check_range(actions, start_index, stop_index)
             
         self.playing = True
         self.stop_requested = False
+        self.last_timing = None
         
         # Get settings from app
         if hasattr(self.app, 'loop_count') and hasattr(self.app.loop_count, 'get'):
@@ -38,52 +263,149 @@ class Player:
         if hasattr(self.app, 'delay_between_actions') and hasattr(self.app.delay_between_actions, 'get'):
             delay_factor = self.app.delay_between_actions.get()
         
+        self.progress.reset(len(actions), loop_count)
+        
+        # Register hotkeys before the thread starts, it removes them when it ends
+        self._add_stop_hotkeys((self.stop_hotkey, self.emergency_stop))
+        
         # Start playback thread
         self.thread = threading.Thread(
             target=self._playback_loop, 
-            args=(actions, loop_count, delay_factor)
+            args=(actions, loop_count, delay_factor, start_index, stop_index)
         )
         self.thread.daemon = True
         self.thread.start()
         
-        # Register hotkeys
-        keyboard.add_hotkey(self.stop_hotkey, self.stop_playback)
-        keyboard.add_hotkey(self.emergency_stop, self.stop_playback)
-        
         # Update UI in main thread
-        if self.app.root:
-            self.app.root.after(0, self._update_ui_start)
+        root = self._ui_root()
+        if root:
+            root.after(0, self._update_ui_start)
     
     def stop_playback(self):
-        """Stop the playback"""
-        if not self.playing:
-            return
-            
-        self.stop_requested = True
+        """Ask the playback to stop, the playback thread finishes it"""
+        if self.playing:
+            self.stop_requested = True
+    
+    def _finish_playback(self):
+        """Called by the playback thread once last_timing is set"""
         self.playing = False
         
-        # Remove hotkeys
-        try:
-            keyboard.remove_hotkey(self.stop_hotkey)
-            keyboard.remove_hotkey(self.emergency_stop)
-        except:
-            pass
+        # Remove only the hotkeys this playback registered
+        handles, self.hotkey_handles = self.hotkey_handles, []
+        for handle in handles:
+            self.backend.remove_hotkey(handle)
         
         # Update UI in main thread
-        if self.app.root:
-            self.app.root.after(0, self._update_ui_stop)
+        root = self._ui_root()
+        if root:
+            root.after(0, self._update_ui_stop)
+    
+    def play(self, actions, loop_count=1, delay_factor=1.0, start_index=0, stop_index=None,
+             stop_hotkeys=()):
+        """Play actions in the calling thread without any GUI.
+        
+        The first loop starts at start_index and later loops at 0. With a
+        stop_index every loop plays only [start_index, stop_index), e.g. the
+        selected actions. Keys and buttons held at start_index are pressed
+        before the first action. stop_hotkeys stop the playback and are only
+        registered while it runs. Returns the timing summary of the run.
+        """
+        actions = as_playback_source(actions)
+        if self.playing or not actions:
+            return None
+        self.check_range(actions, start_index, stop_index)
+        
+        self.playing = True
+        self.stop_requested = False
+        self._add_stop_hotkeys(stop_hotkeys)
+        self.progress.reset(len(actions), loop_count)
+        self._playback_loop(actions, loop_count, delay_factor, start_index, stop_index)
+        return self.last_timing
+    
+    def check_range(self, actions, start_index, stop_index=None):
+        """Raise ValueError unless start_index (and stop_index) leave something to play.
+        
+        An empty range would loop forever without playing anything when
+        looping infinitely.
+        """
+        count = len(actions)
+        if not 0 <= start_index < count:
+            raise ValueError(f"Start index {start_index} is outside the macro (0-{count - 1})")
+        if stop_index is not None and min(stop_index, count) <= start_index:
+            raise ValueError(f"Nothing to play: stop index {stop_index} is not after "
+                             f"start index {start_index}")
+    
+    def _add_stop_hotkeys(self, hotkeys):
+        for hotkey in hotkeys:
+            try:
+                self.hotkey_handles.append(self.backend.add_hotkey(hotkey, self.stop_playback))
+            except (ImportError, OSError) as e:
+                # e.g. keyboard needs root on Linux, play anyway without the hotkey
+                print(f"Could not register stop hotkey {hotkey}: {e}")
+    
+    def index_at_time(self, actions, offset_ns):
+        """Index of the first action due at or after offset_ns into the playback"""
+        actions = as_playback_source(actions)
+        if not hasattr(actions, "iter_chunks"):
+            return bisect_left(self._plan_for(actions).offsets, offset_ns)
+        
+        # Streamed: only the offsets are needed, skip whole chunks by their last offset
+        timeline = Timeline()
+        chunk_start = 0
+        for chunk in actions.iter_chunks():
+            offsets = timeline.offsets(chunk)
+            if offsets and offsets[-1] >= offset_ns:
+                return chunk_start + bisect_left(offsets, offset_ns)
+            chunk_start += len(offsets)
+        return chunk_start
+    
+    def _ui_root(self):
+        """Tk root of the owning app, or None when running headless"""
+        return getattr(self.app, "root", None)
     
     def _update_ui_start(self):
         """Update UI when playback starts"""
         self.app.is_playing = True
         self.app.play_button.config(text="Stop Playback")
         self.app.status_var.set("Playing...")
+        
+        # A single timer pulls the progress instead of one callback per action
+        self.shown_progress = None
+        self._poll_progress()
+    
+    def _poll_progress(self):
+        """Show the latest playback progress and reschedule while playing"""
+        if not self.playing:
+            return
+        
+        stats = self.stats
+        started = time.perf_counter_ns()
+        state = self.progress.latest()
+        if state is not None and state != self.shown_progress:
+            self.shown_progress = state
+            action_index, current_loop = state
+            self._update_ui_progress(action_index, self.progress.total_actions,
+                                     current_loop, self.progress.total_loops)
+            if stats is not None:
+                stats.record("ui", "poll", time.perf_counter_ns() - started)
+        
+        self.app.root.after(max(1, int(1000 / self.progress_hz)), self._poll_progress)
     
     def _update_ui_stop(self):
         """Update UI when playback stops"""
         self.app.is_playing = False
         self.app.play_button.config(text="Start Playback")
-        self.app.status_var.set("Playback stopped")
+        timing = self.last_timing
+        if timing and timing["count"]:
+            self.app.status_var.set(f"Playback stopped (mean late {timing['mean_ms']:.2f} ms, "
+                                    f"max late {timing['max_ms']:.2f} ms)")
+        else:
+            self.app.status_var.set("Playback stopped")
+        
+        if self.stats is not None and hasattr(self.app, "show_playback_stats"):
+            self.app.show_playback_stats()
+        if timing and hasattr(self.app, "record_library_run"):
+            self.app.record_library_run(timing)
     
     def _update_ui_progress(self, action_index, total_actions, current_loop, total_loops):
         """Update UI with playback progress"""
@@ -99,98 +421,197 @@ class Player:
         self.app.actions_listbox.selection_set(action_index)
         self.app.actions_listbox.see(action_index)
     
-    def _playback_loop(self, actions, loop_count, delay_factor):
-        """Main playback loop"""
-        # Save original pyautogui settings
-        original_pause = pyautogui.PAUSE
-        original_failsafe = pyautogui.FAILSAFE
+    def _playback_loop(self, actions, loop_count, delay_factor, start_index=0, stop_index=None):
+        """Main playback loop, the first loop starts at start_index.
         
+        With a stop_index every loop plays [start_index, stop_index).
+        """
+        held = None  # Inputs held by the actions played so far
+        unscanned = None  # Start of the actions of the current chunk not in held yet
+        lateness = {"count": 0, "total": 0, "max": 0}
+        errors = 0
+        current_loop = 0
+        run_start = time.perf_counter_ns()
         try:
-            # Configure pyautogui for playback
-            pyautogui.PAUSE = 0  # We'll handle delays ourselves
-            pyautogui.FAILSAFE = True  # Keep failsafe enabled
+            # Let the backend drop its own pauses, we handle timing ourselves
+            self.backend.prepare_playback()
             
-            # Disable pyautogui's internal delay between actions
-            pyautogui.MINIMUM_DURATION = 0
-            pyautogui.MINIMUM_SLEEP = 0
+            if hasattr(actions, "iter_chunks"):
+                plan_source = lambda: self._stream_plans(actions)
+            else:
+                plan = self._plan_for(actions)
+                plan_source = lambda: iter((plan,))
+            stats = self.stats = HistogramSet() if self.profiling else None
             
             # Start playback loops
             loops_to_run = float('inf') if loop_count < 0 else loop_count
-            current_loop = 0
+            loop_start = None  # Anchored when the first action runs
+            first_index = max(0, start_index)
+            start_state = None  # Inputs held at first_index, found on the first loop
             
             while current_loop < loops_to_run and not self.stop_requested:
-                # Execute all actions in sequence
-                for i, action in enumerate(actions):
-                    if self.stop_requested:
+                chunk_start = 0
+                loop_duration = 0
+                first_offset = None
+                scanning = InputState() if first_index and start_state is None else None
+                restore = first_index > 0
+                if not restore and (held is None or stop_index is not None):
+                    held = InputState()
+                
+                # Execute all actions in sequence, chunk by chunk for streamed macros
+                for plan in plan_source():
+                    offsets = plan.offsets
+                    steps = plan.steps
+                    count = len(steps)
+                    if stop_index is not None and chunk_start >= stop_index:
                         break
+                    if scanning is not None and chunk_start < first_index:
+                        scanning.scan(plan.buffer, 0, min(count, first_index - chunk_start))
                     
-                    # Update UI to show current action
-                    if self.app.root:
-                        self.app.root.after(0, lambda idx=i, total=len(actions), 
-                                           loop=current_loop, loops=loop_count: 
-                                           self._update_ui_progress(idx, total, loop, loops))
+                    begin = max(0, first_index - chunk_start)
+                    end = count if stop_index is None else min(count, stop_index - chunk_start)
+                    local = begin
+                    unscanned = begin
+                    for local in range(begin, end):
+                        if self.stop_requested:
+                            break
+                        
+                        if restore:
+                            # Starting mid-macro: press what the skipped actions left held
+                            if start_state is None:
+                                start_state = scanning
+                            start_state.restore(self.backend)
+                            held = start_state.copy()
+                            restore = False
+                        
+                        # Wait for the action's deadline on the monotonic clock
+                        scaled = int(offsets[local] / delay_factor)
+                        if first_offset is None:
+                            first_offset = offsets[local]
+                        if loop_start is None:
+                            # From the very start, a leading delay still waits its offset
+                            loop_start = time.perf_counter_ns() - (scaled if chunk_start + local else 0)
+                            # Starting mid-plan, the cursor is not where the plan expects
+                            if local in plan.dropped_moves:
+                                self.backend.move_to(*plan.dropped_moves[local])
+                        deadline = loop_start + scaled
+                        if not self._wait_until(deadline):
+                            break
+                        late = time.perf_counter_ns() - deadline
+                        lateness["count"] += 1
+                        lateness["total"] += late
+                        if late > lateness["max"]:
+                            lateness["max"] = late
+                        
+                        if stats is not None:
+                            label = CODE_TYPES.get(plan.buffer.kinds[local])
+                            stats.record("lateness", label, late)
+                            published = time.perf_counter_ns()
+                        
+                        # Publish progress, the GUI picks it up at its own rate
+                        self.progress.publish(chunk_start + local, current_loop)
+                        
+                        if stats is not None:
+                            called = time.perf_counter_ns()
+                            stats.record("ui", "publish", called - published)
+                        
+                        try:
+                            for function, args in steps[local]:
+                                function(*args)
+                        except Exception as e:
+                            # Don't stop playback on error, just continue with next action
+                            errors += 1
+                            kind = plan.buffer.kinds[local]
+                            print(f"Error executing action {CODE_TYPES.get(kind, kind)}: {e}")
+                        
+                        if stats is not None:
+                            stats.record("backend", label, time.perf_counter_ns() - called)
+                    else:
+                        local = end
                     
-                    # Execute the action
-                    self._execute_action(action, delay_factor)
+                    if held is not None and local > begin:
+                        # Keep track of what is held, once per chunk instead of per action
+                        held.scan(plan.buffer, begin, local)
+                    unscanned = None
+                    if self.stop_requested:
+                        break
+                    chunk_start += count
+                    if offsets and end > begin:
+                        loop_duration = offsets[end - 1]
+                
+                if stop_index is not None and held is not None:
+                    # Every loop of a range starts again from its start state
+                    held.release(self.backend)
+                    held = None
                 
-                # Increment loop counter
-                current_loop += 1
+                # Increment loop counter, the next loop starts where this one was due to end
+                if not self.stop_requested:
+                    current_loop += 1
+                if loop_start is not None and first_offset is not None:
+                    # A range loops back to its own first action, a whole macro to offset 0
+                    loop_start += int(loop_duration / delay_factor)
+                    if stop_index is not None:
+                        loop_start -= int(first_offset / delay_factor)
+                if stop_index is None:
+                    first_index = 0
         
         finally:
-            # Restore original pyautogui settings
-            pyautogui.PAUSE = original_pause
-            pyautogui.FAILSAFE = original_failsafe
+            # Stopped, interrupted and failed runs report the timing of what they played
+            self.last_timing = self._summarize_lateness(lateness)
+            self.last_timing["loops"] = current_loop
+            self.last_timing["errors"] = errors
+            self.last_timing["elapsed_s"] = (time.perf_counter_ns() - run_start) / NS_PER_SECOND
             
-            # Make sure we're no longer playing
-            if self.playing:
-                self.stop_playback()
+            if held is not None:
+                # Do not leave keys or buttons down after a stop, Ctrl+C or backend error
+                if unscanned is not None:
+                    held.scan(plan.buffer, unscanned, local)
+                held.release(self.backend)
+            
+            # Restore the backend's original settings
+            self.backend.finish_playback()
+            
+            # Only now that the run is summarized, drop the hotkeys and update the UI
+            self._finish_playback()
     
-    def _execute_action(self, action, delay_factor=1.0):
-        """Execute a single recorded action"""
-        action_type = action["type"]
+    def _wait_until(self, deadline):
+        """Sleep until close to the perf_counter_ns deadline, then spin for the last stretch.
         
-        try:
-            if action_type == ActionType.MOUSE_MOVE:
-                x, y = action["position"]
-                pyautogui.moveTo(x, y)
-                
-            elif action_type == ActionType.MOUSE_CLICK:
-                x, y = action["position"]
-                button = action["button"]
-                state = action["state"]
-                
-                # Move mouse to position
-                pyautogui.moveTo(x, y)
-                
-                # Handle mouse button state
-                if state == "down":
-                    pyautogui.mouseDown(button=button)
-                elif state == "up":
-                    pyautogui.mouseUp(button=button)
-                    
-            elif action_type == ActionType.MOUSE_SCROLL:
-                x, y = action["position"]
-                amount = action["amount"]
-                
-                # Move mouse to position
-                pyautogui.moveTo(x, y)
-                
-                # Scroll
-                pyautogui.scroll(amount)
-                
-            elif action_type == ActionType.KEY_PRESS:
-                key = action["key"]
-                keyboard.press(key)
-                
-            elif action_type == ActionType.KEY_RELEASE:
-                key = action["key"]
-                keyboard.release(key)
-                
-            elif action_type == ActionType.DELAY:
-                adjusted_duration = action["duration"] / delay_factor
-                time.sleep(adjusted_duration)
-
-                
-        except Exception as e:
-            print(f"Error executing action {action_type}: {e}")
-            # Don't stop playback on error, just continue with next action
\ No newline at end of file
+        Returns False if a stop was requested while waiting.
+        """
+        while True:
+            if self.stop_requested:
+                return False
+            remaining = deadline - time.perf_counter_ns()
+            if remaining <= SPIN_THRESHOLD_NS:
+                break
+            time.sleep(min((remaining - SPIN_THRESHOLD_NS) / NS_PER_SECOND, MAX_SLEEP_SLICE))
+        
+        while time.perf_counter_ns() < deadline:
+            pass
+        return True
+    
+    def _summarize_lateness(self, lateness):
+        """Summarize how late the actions started compared to their deadlines"""
+        count = lateness["count"]
+        return {
+            "count": count,
+            "mean_ms": lateness["total"] / count / 1e6 if count else 0.0,
+            "max_ms": lateness["max"] / 1e6
+        }
+    
+    def _plan_for(self, buffer):
+        """Compiled plan for an in-memory macro, reused until the macro is edited"""
+        plan = self.plan
+        if plan is None or not plan.is_current(buffer, self.backend):
+            plan = self.plan = PlaybackPlan(buffer, self.backend)
+        return plan
+    
+    def _stream_plans(self, source):
+        """Compile a streamed macro chunk by chunk, keeping only one chunk in memory"""
+        timeline = Timeline()
+        position = None
+        for chunk in source.iter_chunks():
+            plan = PlaybackPlan(chunk, self.backend, timeline, position)
+            position = plan.end_position
+            yield plan
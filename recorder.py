@@ -1,35 +1,59 @@
+import os
+import heapq
 import time
 import threading
-import pyautogui
-import keyboard
+from collections import deque
 import json
 from datetime import datetime
-from pynput import mouse
-from pynput.mouse import Listener as MouseListener
+from actions import ActionType, ActionBuffer, KEY_PRESS, KEY_RELEASE, NS_PER_SECOND
+from backends import KEY_DOWN, PyAutoGuiBackend
+from optimize import simplify_moves, AdaptiveMoveSampler
+from journal import JournalWriter, JournalReader, JOURNAL_EXTENSION
+from stats import HistogramSet
 
-
-class ActionType:
-    MOUSE_MOVE = "mouse_move"
-    MOUSE_CLICK = "mouse_click"
-    MOUSE_SCROLL = "mouse_scroll"
-    KEY_PRESS = "key_press"
-    KEY_RELEASE = "key_release"
-    DELAY = "delay"
+# Idle gaps shorter than this are not recorded as delays
+MIN_DELAY_NS = 50_000_000
+HOOKS = ("move", "click", "scroll", "key")
 
 class Recorder:
-    def __init__(self, app):
+    def __init__(self, app=None, backend=None):
         self.app = app
+        self.backend = backend if backend is not None else PyAutoGuiBackend()
         self.recording = False
-        self.actions = []
+        self.actions = ActionBuffer()
         self.start_time = 0
         self.last_position = None
         self.recording_thread = None
         self.hotkey_thread = None
         self.stop_hotkey = "f6"  # Default hotkey to stop recording
         self.emergency_stop = "esc"  # Emergency stop key
+        self.hotkey_handles = []  # Handles of the hotkeys registered while recording
         self.mouse_move_min_distance = 0.5  # Minimum pixel distance to record mouse movement
         self.mouse_move_min_time = 0.05  # Minimum time between recorded mouse movements
+        self.event_driven_moves = True  # Capture moves from pynput on_move instead of polling
+        self.adaptive_moves = True  # Sample moves by error budget, the two thresholds above apply when False
+        self.move_error_budget = 2.0  # Pixels a skipped move may stray from the recorded path
+        self.move_max_step = 80.0  # Pixels the cursor may travel between recorded moves
+        self.sampler = AdaptiveMoveSampler()
+        self.simplify_tolerance = 1.0  # Pixel tolerance for path simplification on stop with fixed thresholds, None to disable
+        self.last_compression = None
         self.last_recorded_time = 0
+        self.pending_move = None
+        self.journal_dir = None  # Stream actions to a journal in this folder, None keeps them in RAM
+        self.max_memory_actions = 50000  # Actions kept in memory while journaling
+        self.journal = None
+        self.journal_path = None
+        self.reorder_window = 0.002  # Seconds to hold events so late ones from other sources sort first
+        self.consumer_thread = None
+        self.wakeup = threading.Event()
+        # One single-producer queue per input source, drained by the consumer thread
+        self.move_events = deque()
+        self.click_events = deque()
+        self.scroll_events = deque()
+        self.key_events = deque()
+        self.rate_hz = 1  # How often the status bar shows the event rate
+        self.stop_time = 0
+        self._reset_stats()  # Hook and consumer latency and counters of the last recording
         
     def start_recording(self):
         """Start recording mouse and keyboard actions"""
@@ -37,19 +61,45 @@ class Recorder:
             return
         
         self.recording = True
-        self.actions = []
-        self.start_time = time.time()
-        self.last_position = pyautogui.position()
-        self.last_recorded_time = time.time()
+        self.actions = ActionBuffer()
+        self.start_time = time.perf_counter_ns()
+        self.last_position = self.backend.position()
+        self.last_recorded_time = time.perf_counter_ns()
+        self.pending_move = None
+        self.sampler = AdaptiveMoveSampler(self.move_error_budget, self.move_max_step)
+        self.sampler.reset(self.last_position)
+        for events in self._event_queues():
+            events.clear()
+        self.wakeup.clear()
+        self._reset_stats()
+        
+        if self.journal_dir:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            name = datetime.now().strftime("recording-%Y%m%d-%H%M%S") + JOURNAL_EXTENSION
+            self.journal_path = os.path.join(self.journal_dir, name)
+            self.journal = JournalWriter(self.journal_path)
         
-        # Start recording thread
-        self.recording_thread = threading.Thread(target=self._record_loop)
-        self.recording_thread.daemon = True
-        self.recording_thread.start()
+        # Builds actions from the queued hook events
+        self.consumer_thread = threading.Thread(target=self._consume_loop)
+        self.consumer_thread.daemon = True
+        self.consumer_thread.start()
+        
+        if self.event_driven_moves:
+            # Mouse moves arrive through the listener callbacks, no loop needed
+            self._setup_listeners()
+        else:
+            # Start recording thread
+            self.recording_thread = threading.Thread(target=self._record_loop)
+            self.recording_thread.daemon = True
+            self.recording_thread.start()
         
         # Start hotkey listener
-        keyboard.add_hotkey(self.stop_hotkey, self.stop_recording)
-        keyboard.add_hotkey(self.emergency_stop, self.stop_recording)
+        self.hotkey_handles = [self.backend.add_hotkey(hotkey, self.stop_recording)
+                               for hotkey in (self.stop_hotkey, self.emergency_stop)]
+        
+        root = getattr(self.app, "root", None)
+        if root:
+            root.after(0, self._show_event_rate)
         
     def stop_recording(self):
         """Stop recording mouse and keyboard actions"""
@@ -57,55 +107,65 @@ class Recorder:
             return
             
         self.recording = False
+        self.stop_time = time.perf_counter_ns()
+        
+        # Stop the listeners so input events no longer reach us
+        self._teardown_listeners()
+        
+        # Let the consumer build the actions still queued
+        self.wakeup.set()
+        if self.consumer_thread is not None and self.consumer_thread is not threading.current_thread():
+            self.consumer_thread.join()
+        self.consumer_thread = None
+        self._flush_pending_move(force=True)
+        
+        # Remove only the hotkeys this recording registered
+        handles, self.hotkey_handles = self.hotkey_handles, []
+        for handle in handles:
+            self.backend.remove_hotkey(handle)
         
-        # Remove hotkeys
-        try:
-            keyboard.remove_hotkey(self.stop_hotkey)
-            keyboard.remove_hotkey(self.emergency_stop)
-        except:
-            pass
+        # Finish the journal and read the recording back from it chunk by chunk
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+            self.actions = JournalReader(self.journal_path)
+        
+        # Collapse near-straight mouse paths. The adaptive sampler already kept the path
+        # within its error budget, and simplifying again would drop its max_step samples.
+        # Journaled recordings are left as they are, simplifying would load them whole.
+        self.last_compression = None
+        if self.simplify_tolerance is not None and not self.adaptive_moves and \
+                not isinstance(self.actions, JournalReader):
+            self.actions, self.last_compression = simplify_moves(self.actions, self.simplify_tolerance)
+        self.actions.metadata["recording"] = self.stats_summary()
             
         # Update UI in main thread
-        if self.app.root:
-            self.app.root.after(0, self._update_ui_after_stop)
+        root = getattr(self.app, "root", None)
+        if root:
+            root.after(0, self._update_ui_after_stop)
     
     def _update_ui_after_stop(self):
         """Update UI after recording stops"""
         self.app.is_recording = False
         self.app.record_button.config(text="Start Recording")
-        self.app.status_var.set("Recording stopped")
-        self.app.recorded_actions = self.actions
+        summary = self.actions.metadata.get("recording", {})
+        details = [f"{summary.get('events_per_s', 0):.0f} events/s"]
+        if self.last_compression is not None:
+            details.append(f"moves simplified {self.last_compression:.1f}x")
+        self.app.status_var.set(f"Recording stopped ({', '.join(details)})")
+        if hasattr(self.app, "show_recording_stats"):
+            self.app.show_recording_stats()
         
-        # Update actions listbox
-        self._update_actions_listbox()
+        if hasattr(self.app, "set_actions"):
+            # The app wraps the recording in an editable document and refreshes the list
+            self.app.set_actions(self.actions)
+        else:
+            self.app.recorded_actions = self.actions
+            self._update_actions_listbox()
     
     def _update_actions_listbox(self):
         """Update the actions listbox with recorded actions"""
-        self.app.actions_listbox.delete(0, "end")
-        for i, action in enumerate(self.actions):
-            action_type = action["type"]
-            
-            if action_type == ActionType.MOUSE_MOVE:
-                x, y = action["position"]
-                desc = f"Mouse Move: ({x}, {y})"
-            elif action_type == ActionType.MOUSE_CLICK:
-                x, y = action["position"]
-                button = action["button"]
-                state = "Down" if action["state"] == "down" else "Up"
-                desc = f"Mouse {button.capitalize()} {state}: ({x}, {y})"
-            elif action_type == ActionType.MOUSE_SCROLL:
-                x, y = action["position"]
-                desc = f"Mouse Scroll: {action['amount']} at ({x}, {y})"
-            elif action_type == ActionType.KEY_PRESS:
-                desc = f"Key Press: {action['key']}"
-            elif action_type == ActionType.KEY_RELEASE:
-                desc = f"Key Release: {action['key']}"
-            elif action_type == ActionType.DELAY:
-                desc = f"Delay: {action['duration']:.2f} seconds"
-            else:
-                desc = f"Unknown Action: {action_type}"
-                
-            self.app.actions_listbox.insert("end", desc)
+        self.app.actions_listbox.set_items(self.actions)
     
     def _record_loop(self):
         """Main recording loop"""
@@ -114,79 +174,259 @@ class Recorder:
         
         # Record mouse movements in a loop
         while self.recording:
-            current_pos = pyautogui.position()
-            current_time = time.time()
-            
-            # Record mouse movement if it's moved enough
-            if (abs(current_pos[0] - self.last_position[0]) > self.mouse_move_min_distance or
-                abs(current_pos[1] - self.last_position[1]) > self.mouse_move_min_distance) and \
-               (current_time - self.last_recorded_time >= self.mouse_move_min_time):
-                
-                # Add delay since last action
-                if self.actions and self.last_recorded_time > 0:
-                    delay = current_time - self.last_recorded_time
-                    if delay > 0.05:  # Only record delays greater than 50ms
-                        self._add_delay(delay)
-                
-                # Record mouse position
-                self._add_mouse_move(current_pos)
-                self.last_position = current_pos
-                self.last_recorded_time = current_time
+            x, y = self.backend.position()
+            self._on_mouse_move(x, y)
             
             # Sleep to reduce CPU usage
             time.sleep(0.01)
     
-    def _on_mouse_click(self, x, y, button, pressed):
-        """Hook para clics del mouse reales"""
+    def _reset_stats(self):
+        self.stats = HistogramSet()
+        # Created up front so the hook threads only ever record into them
+        self.hook_latency = {hook: self.stats.get("hook", hook) for hook in HOOKS}
+        self.counters = {
+            "events": 0,
+            "moves_below_distance": 0,
+            "moves_throttled": 0,
+            "moves_within_budget": 0,
+            "hotkeys_skipped": 0,
+        }
+        self.shown_events = 0
+        self.rate_time = time.perf_counter_ns()
+    
+    def stats_summary(self):
+        """Counters, rates and latency percentiles of the last recording"""
+        end = self.stop_time if not self.recording else time.perf_counter_ns()
+        duration = (end - self.start_time) / NS_PER_SECOND
+        hooks = {hook: histogram.count for hook, histogram in self.hook_latency.items()}
+        received = sum(hooks.values())
+        return {
+            "duration_s": duration,
+            "events_received": hooks,
+            "events_per_s": received / duration if duration > 0 else 0.0,
+            "counters": dict(self.counters),
+            "actions": len(self.actions),
+            "compression": self.last_compression,
+            "settings": {
+                "mouse_move_min_distance": self.mouse_move_min_distance,
+                "mouse_move_min_time": self.mouse_move_min_time,
+                "event_driven_moves": self.event_driven_moves,
+                "adaptive_moves": self.adaptive_moves,
+                "move_error_budget": self.move_error_budget,
+                "move_max_step": self.move_max_step,
+                "reorder_window": self.reorder_window,
+                "simplify_tolerance": self.simplify_tolerance,
+            },
+            "latency": self.stats.rows(),
+        }
+    
+    def _show_event_rate(self):
+        """Show the live event rate in the status bar while recording"""
         if not self.recording:
             return
-
-        current_time = time.time()
+        now = time.perf_counter_ns()
+        events = self.counters["events"]
+        elapsed = (now - self.rate_time) / NS_PER_SECOND
+        if elapsed > 0:
+            rate = (events - self.shown_events) / elapsed
+            self.app.status_var.set(f"Recording... {rate:.0f} events/s, {len(self.actions)} actions")
+        self.shown_events = events
+        self.rate_time = now
+        self.app.root.after(max(1, int(1000 / self.rate_hz)), self._show_event_rate)
+    
+    def _event_queues(self):
+        return (self.move_events, self.click_events, self.scroll_events, self.key_events)
+    
+    def _consume_loop(self):
+        """Merge the hook queues by timestamp and turn the events into actions"""
+        handlers = {
+            "move": self._handle_move,
+            "click": self._handle_click,
+            "scroll": self._handle_scroll,
+            "key": self._handle_key,
+        }
+        held = []  # Heap of events waiting out the reorder window
+        counters = self.counters
+        consume_latency = {hook: self.stats.get("consume", hook) for hook in HOOKS}
+        queue_latency = {hook: self.stats.get("queue", hook) for hook in HOOKS}
+        sequence = 0  # Tie breaker so equal timestamps keep arrival order
+        
+        timeout = None
+        while True:
+            self.wakeup.wait(timeout)
+            self.wakeup.clear()
+            running = self.recording
+            
+            for events in self._event_queues():
+                while events:
+                    event = events.popleft()
+                    heapq.heappush(held, (event[0], sequence, event))
+                    sequence += 1
+            
+            # Anything older than the window can no longer be overtaken
+            if running:
+                horizon = time.perf_counter_ns() - self.reorder_window * NS_PER_SECOND
+            else:
+                horizon = float("inf")
+            while held and held[0][0] <= horizon:
+                event = heapq.heappop(held)[2]
+                started = time.perf_counter_ns()
+                handlers[event[1]](event[0], *event[2:])
+                done = time.perf_counter_ns()
+                consume_latency[event[1]].record(done - started)
+                # Time from the hook firing to the action being built
+                queue_latency[event[1]].record(done - event[0])
+                counters["events"] += 1
+            
+            if not running and not held and not any(self._event_queues()):
+                break
+            timeout = self.reorder_window if held else None
+    
+    def _add_delay_since_last(self, current_time):
+        """Add a delay action for the idle time before an action at current_time"""
         if self.actions and self.last_recorded_time > 0:
             delay = current_time - self.last_recorded_time
-            if delay > 0.05:
-                self._add_delay(delay)
-
+            if delay > MIN_DELAY_NS:
+                self._add_delay(delay / NS_PER_SECOND, current_time)
+    
+    def _process_mouse_move(self, current_pos, current_time):
+        """Apply the sampler or the distance/time thresholds to a mouse position and record it"""
+        if self.adaptive_moves:
+            samples = self.sampler.add(current_pos, current_time)
+            if not samples:
+                self.counters["moves_within_budget"] += 1
+            for position, move_time in samples:
+                self._record_mouse_move(position, move_time)
+            # The newest buffered position is recorded if another action comes first
+            self.pending_move = self.sampler.held()
+            return
+        
+        # Ignore jitter below the minimum distance
+        if not (abs(current_pos[0] - self.last_position[0]) > self.mouse_move_min_distance or
+                abs(current_pos[1] - self.last_position[1]) > self.mouse_move_min_distance):
+            self.counters["moves_below_distance"] += 1
+            return
+        
+        # Too soon after the last action, keep it so the final position is not lost
+        if current_time - self.last_recorded_time < self.mouse_move_min_time * NS_PER_SECOND:
+            if self.pending_move is not None:
+                self.counters["moves_throttled"] += 1
+            self.pending_move = (current_pos, current_time)
+            return
+        
+        self._record_mouse_move(current_pos, current_time)
+    
+    def _record_mouse_move(self, current_pos, current_time):
+        """Record a mouse move that passed the thresholds"""
+        # Add delay since last action
+        self._add_delay_since_last(current_time)
+        
+        # Record mouse position
+        self._add_mouse_move(current_pos, current_time)
+        self.last_position = current_pos
+        self.last_recorded_time = current_time
+        self.pending_move = None
+    
+    def _flush_pending_move(self, force=False):
+        """Record the last throttled mouse position before another action"""
+        pending = self.pending_move
+        if pending is None or not (self.recording or force):
+            return
+        
+        position, move_time = pending
+        if position != self.last_position:
+            self._record_mouse_move(position, move_time)
+        self.pending_move = None
+        self.sampler.reset(position)
+    
+    def _handle_move(self, current_time, x, y):
+        self._process_mouse_move((x, y), current_time)
+    
+    def _handle_click(self, current_time, x, y, button, pressed):
+        self._flush_pending_move(force=True)
+        self._add_delay_since_last(current_time)
+        
         state = "down" if pressed else "up"
-        self._add_mouse_click((x, y), button.name, state)
+        self._add_mouse_click((x, y), button, state, current_time)
+        self.last_recorded_time = current_time
+        self.sampler.reset((x, y))
+    
+    def _handle_scroll(self, current_time, x, y, dy):
+        self._flush_pending_move(force=True)
+        self._add_delay_since_last(current_time)
+        
+        self._add_mouse_scroll((x, y), dy, current_time)
+        self.last_recorded_time = current_time
+        self.sampler.reset((x, y))
+    
+    def _handle_key(self, current_time, name, event_type):
+        # Skip recording of our own hotkeys
+        if name in [self.stop_hotkey, self.emergency_stop]:
+            self.counters["hotkeys_skipped"] += 1
+            return
+        
+        self._flush_pending_move(force=True)
+        self._add_delay_since_last(current_time)
+        
+        # Record key press or release
+        if event_type == KEY_DOWN:
+            self._add_key_press(name, current_time)
+        
         self.last_recorded_time = current_time
+    
+    # The hooks below run on the input library threads: they only timestamp
+    # the event and queue it, the consumer thread does the rest.
+    
+    def _on_mouse_move(self, x, y):
+        """Hook para movimientos del mouse reales"""
+        if self.recording:
+            now = time.perf_counter_ns()
+            self.move_events.append((now, "move", x, y))
+            if not self.wakeup.is_set():
+                self.wakeup.set()
+            self.hook_latency["move"].record(time.perf_counter_ns() - now)
+    
+    def _on_mouse_click(self, x, y, button, pressed):
+        """Hook para clics del mouse reales"""
+        if self.recording:
+            now = time.perf_counter_ns()
+            self.click_events.append((now, "click", x, y, button, pressed))
+            if not self.wakeup.is_set():
+                self.wakeup.set()
+            self.hook_latency["click"].record(time.perf_counter_ns() - now)
 
     def _on_mouse_scroll(self, x, y, dx, dy):
         """Hook para scroll del mouse real"""
-        if not self.recording:
-            return
-
-        current_time = time.time()
-        if self.actions and self.last_recorded_time > 0:
-            delay = current_time - self.last_recorded_time
-            if delay > 0.05:
-                self._add_delay(delay)
+        if self.recording:
+            now = time.perf_counter_ns()
+            self.scroll_events.append((now, "scroll", x, y, dy))
+            if not self.wakeup.is_set():
+                self.wakeup.set()
+            self.hook_latency["scroll"].record(time.perf_counter_ns() - now)
 
-        self._add_mouse_scroll((x, y), dy)
-        self.last_recorded_time = current_time
+    def _keyboard_hook(self, event):
+        """Hook for keyboard events"""
+        if self.recording:
+            now = time.perf_counter_ns()
+            self.key_events.append((now, "key", event.name, event.event_type))
+            if not self.wakeup.is_set():
+                self.wakeup.set()
+            self.hook_latency["key"].record(time.perf_counter_ns() - now)
 
 
     def _setup_listeners(self):
-        """Set up mouse and keyboard event listeners using pynput"""
-        # Inicia el listener de mouse
-        self.mouse_listener = MouseListener(
+        """Set up mouse and keyboard event listeners through the input backend"""
+        self.backend.start_listening(
+            on_move=self._on_mouse_move if self.event_driven_moves else None,
             on_click=self._on_mouse_click,
-            on_scroll=self._on_mouse_scroll
+            on_scroll=self._on_mouse_scroll,
+            on_key=self._keyboard_hook
         )
-        self.mouse_listener.start()
-
-        # Teclado: mantiene el hook existente
-        keyboard.hook(self._keyboard_hook)
 
     
     def _teardown_listeners(self):
-        """Remove all hooks and restore original functions"""
-        # Detener listener de mouse si existe
-        if hasattr(self, "mouse_listener"):
-            self.mouse_listener.stop()
-        
-        # Quitar hooks de teclado
-        keyboard.unhook_all()
+        """Remove the mouse and keyboard listeners"""
+        self.backend.stop_listening()
 
     
     def _mouse_down_hook(self, x=None, y=None, button='left'):
@@ -194,14 +434,11 @@ class Recorder:
         if not self.recording:
             return self._original_mouseDown(x, y, button)
         
-        current_time = time.time()
-        position = pyautogui.position() if x is None or y is None else (x, y)
+        current_time = time.perf_counter_ns()
+        position = self.backend.position() if x is None or y is None else (x, y)
         
         # Add delay if needed
-        if self.actions and self.last_recorded_time > 0:
-            delay = current_time - self.last_recorded_time
-            if delay > 0.05:
-                self._add_delay(delay)
+        self._add_delay_since_last(current_time)
         
         # Record mouse down
         self._add_mouse_click(position, button, "down")
@@ -215,14 +452,11 @@ class Recorder:
         if not self.recording:
             return self._original_mouseUp(x, y, button)
         
-        current_time = time.time()
-        position = pyautogui.position() if x is None or y is None else (x, y)
+        current_time = time.perf_counter_ns()
+        position = self.backend.position() if x is None or y is None else (x, y)
         
         # Add delay if needed
-        if self.actions and self.last_recorded_time > 0:
-            delay = current_time - self.last_recorded_time
-            if delay > 0.05:
-                self._add_delay(delay)
+        self._add_delay_since_last(current_time)
         
         # Record mouse up
         self._add_mouse_click(position, button, "up")
@@ -236,14 +470,11 @@ class Recorder:
         if not self.recording:
             return self._original_click(x, y, clicks, interval, button)
         
-        position = pyautogui.position() if x is None or y is None else (x, y)
-        current_time = time.time()
+        position = self.backend.position() if x is None or y is None else (x, y)
+        current_time = time.perf_counter_ns()
         
         # Add delay if needed
-        if self.actions and self.last_recorded_time > 0:
-            delay = current_time - self.last_recorded_time
-            if delay > 0.05:
-                self._add_delay(delay)
+        self._add_delay_since_last(current_time)
         
         # Record mouse down and up for each click
         for i in range(clicks):
@@ -253,7 +484,7 @@ class Recorder:
             self._add_mouse_click(position, button, "down")
             self._add_mouse_click(position, button, "up")
         
-        self.last_recorded_time = time.time()
+        self.last_recorded_time = time.perf_counter_ns()
         
         # Call original function
         return self._original_click(x, y, clicks, interval, button)
@@ -263,14 +494,11 @@ class Recorder:
         if not self.recording:
             return self._original_scroll(clicks, x, y)
         
-        position = pyautogui.position() if x is None or y is None else (x, y)
-        current_time = time.time()
+        position = self.backend.position() if x is None or y is None else (x, y)
+        current_time = time.perf_counter_ns()
         
         # Add delay if needed
-        if self.actions and self.last_recorded_time > 0:
-            delay = current_time - self.last_recorded_time
-            if delay > 0.05:
-                self._add_delay(delay)
+        self._add_delay_since_last(current_time)
         
         # Record scroll
         self._add_mouse_scroll(position, clicks)
@@ -279,86 +507,53 @@ class Recorder:
         # Call original function
         return self._original_scroll(clicks, x, y)
     
-    def _keyboard_hook(self, event):
-        """Hook for keyboard events"""
-        if not self.recording:
-            return
-        
-        # Skip recording of our own hotkeys
-        if event.name in [self.stop_hotkey, self.emergency_stop]:
-            return
-        
-        current_time = time.time()
-        
-        # Add delay if needed
-        if self.actions and self.last_recorded_time > 0:
-            delay = current_time - self.last_recorded_time
-            if delay > 0.05:
-                self._add_delay(delay)
-        
-        # Record key press or release
-        if event.event_type == keyboard.KEY_DOWN:
-            self._add_key_press(event.name)
-
-        
-        self.last_recorded_time = current_time
-    
-    def _add_mouse_move(self, position):
+    def _add_mouse_move(self, position, event_time=None):
         """Add a mouse move action"""
-        action = {
-            "type": ActionType.MOUSE_MOVE,
-            "time": time.time() - self.start_time,
-            "position": position
-        }
-        self.actions.append(action)
+        self.actions.append_move(self._offset(event_time), position[0], position[1])
+        self._after_add()
     
-    def _add_mouse_click(self, position, button, state):
+    def _add_mouse_click(self, position, button, state, event_time=None):
         """Add a mouse click action"""
-        action = {
-            "type": ActionType.MOUSE_CLICK,
-            "time": time.time() - self.start_time,
-            "position": position,
-            "button": button,
-            "state": state
-        }
-        self.actions.append(action)
+        self.actions.append_click(self._offset(event_time), position[0], position[1],
+                                  button, state)
+        self._after_add()
     
-    def _add_mouse_scroll(self, position, amount):
+    def _add_mouse_scroll(self, position, amount, event_time=None):
         """Add a mouse scroll action"""
-        action = {
-            "type": ActionType.MOUSE_SCROLL,
-            "time": time.time() - self.start_time,
-            "position": position,
-            "amount": amount
-        }
-        self.actions.append(action)
+        self.actions.append_scroll(self._offset(event_time), position[0], position[1], amount)
+        self._after_add()
     
-    def _add_key_press(self, key):
+    def _add_key_press(self, key, event_time=None):
         """Add a keyboard press action"""
-        action = {
-            "type": ActionType.KEY_PRESS,
-            "time": time.time() - self.start_time,
-            "key": key
-        }
-        self.actions.append(action)
+        self.actions.append_key(KEY_PRESS, self._offset(event_time), key)
+        self._after_add()
     
-    def _add_key_release(self, key):
+    def _add_key_release(self, key, event_time=None):
         """Add a keyboard release action"""
-        action = {
-            "type": ActionType.KEY_RELEASE,
-            "time": time.time() - self.start_time,
-            "key": key
-        }
-        self.actions.append(action)
+        self.actions.append_key(KEY_RELEASE, self._offset(event_time), key)
+        self._after_add()
     
-    def _add_delay(self, duration):
+    def _add_delay(self, duration, event_time=None):
         """Add a delay action"""
-        action = {
-            "type": ActionType.DELAY,
-            "time": time.time() - self.start_time,
-            "duration": duration
-        }
-        self.actions.append(action)
+        self.actions.append_delay(self._offset(event_time), duration)
+        self._after_add()
+    
+    def _offset(self, event_time):
+        """Nanoseconds from the start of the recording to an event"""
+        if event_time is None:
+            event_time = time.perf_counter_ns()
+        return event_time - self.start_time
+    
+    def _after_add(self):
+        """Stream the newest action to the journal and keep memory bounded"""
+        journal = self.journal
+        if journal is None:
+            return
+        
+        journal.add_view(self.actions[-1])
+        if len(self.actions) > self.max_memory_actions:
+            # Everything is on disk already, only keep the newest half in memory
+            del self.actions[:len(self.actions) // 2]
     
     def get_actions(self):
         """Get the recorded actions"""
@@ -366,6 +561,6 @@ class Recorder:
     
     def set_actions(self, actions):
         """Set actions from loaded file"""
-        self.actions = actions
+        self.actions = ActionBuffer.coerce(actions)
         if self.app:
             self._update_actions_listbox()
\ No newline at end of file
@@ -2,12 +2,10 @@
 import os
 import sys
 import subprocess
-import tkinter as tk
-from tkinter import messagebox
 import traceback
-import platform
 
-from utils import check_required_modules, install_missing_modules
+from utils import (check_required_modules, install_missing_modules, required_packages,
+                   deps_verified, mark_deps_verified)
 
 VENV_DIR = "venv"
 
@@ -28,12 +26,8 @@ def install_deps_in_venv():
     try:
         subprocess.check_call([python_bin, "-m", "pip", "install", "--upgrade", "pip"])
         
-        # Dependencias base
-        modules = ['pyautogui', 'keyboard', 'Pillow', 'pynput']
-        
-        # Solo en Windows se incluye pywin32
-        if platform.system() == "Windows":
-            modules.append('pywin32')
+        # Dependencias base (pywin32 solo en Windows)
+        modules = required_packages()
 
         subprocess.check_call([python_bin, "-m", "pip", "install"] + modules)
         return True
@@ -122,6 +116,7 @@ def create_windows_shortcut():
     except Exception as e:
         error_msg = f"Error creating shortcut: {e}\n{traceback.format_exc()}"
         print(error_msg)
+        from tkinter import messagebox
         messagebox.showerror("Shortcut Creation Error", error_msg)
         return False
 
@@ -169,6 +164,14 @@ def create_shortcut():
 
 
 def main():
+    # Fast path: the venv is set up and verified, start it without any checks or pip
+    if not is_running_in_venv() and deps_verified(VENV_DIR) and os.path.exists(get_venv_python()):
+        restart_in_venv()
+
+    # Only imported past the fast path, the restarted process loads it itself
+    import tkinter as tk
+    from tkinter import messagebox
+
     root = tk.Tk()
     root.withdraw()
 
@@ -217,37 +220,43 @@ def main():
     # Now we're running in the virtual environment
     print("Running in virtual environment...")
 
-    # Check for necessary modules first
-    missing_modules = check_required_modules()
-    if missing_modules:
-        msg = f"The following required modules are missing:\n\n{', '.join(missing_modules)}\n\nWould you like to install them now?"
-        if messagebox.askyesno("Missing Dependencies", msg):
-            if not install_missing_modules(missing_modules):
-                messagebox.showerror("Installation Failed",
-                                     "Failed to install required modules manually, please use pip.")
-                sys.exit(1)
+    # Modules were all found on an earlier launch, skip the checks
+    if deps_verified():
+        print("Dependencies already verified.")
+    else:
+        # Check for necessary modules first
+        missing_modules = check_required_modules()
+        if missing_modules:
+            msg = f"The following required modules are missing:\n\n{', '.join(missing_modules)}\n\nWould you like to install them now?"
+            if messagebox.askyesno("Missing Dependencies", msg):
+                if not install_missing_modules(missing_modules):
+                    messagebox.showerror("Installation Failed",
+                                         "Failed to install required modules manually, please use pip.")
+                    sys.exit(1)
+                else:
+                    messagebox.showinfo("Installation Successful", "Modules installed successfully. Restarting...")
+                    os.execv(sys.executable, [sys.executable] + sys.argv)
             else:
-                messagebox.showinfo("Installation Successful", "Modules installed successfully. Restarting...")
-                os.execv(sys.executable, [sys.executable] + sys.argv)
-        else:
-            sys.exit(1)
+                sys.exit(1)
 
-    # Check if pywin32 is required and install it if needed (Windows only)
-    if os.name == "nt":
-        try:
-            import win32com.client
-            print("pywin32 is already installed.")
-        except ImportError:
-            print("pywin32 is not installed. Installing...")
+        # Check if pywin32 is required and install it if needed (Windows only)
+        if os.name == "nt":
             try:
-                subprocess.check_call([sys.executable, "-m", "pip", "install", "pywin32"])
-                messagebox.showinfo("Module Installed",
-                                    "pywin32 was installed. The application will now restart.")
-                os.execv(sys.executable, [sys.executable] + sys.argv)
-            except Exception as e:
-                print(f"Error installing pywin32: {e}")
-                messagebox.showerror("Installation Error", f"Failed to install pywin32: {e}")
-                sys.exit(1)
+                import win32com.client
+                print("pywin32 is already installed.")
+            except ImportError:
+                print("pywin32 is not installed. Installing...")
+                try:
+                    subprocess.check_call([sys.executable, "-m", "pip", "install", "pywin32"])
+                    messagebox.showinfo("Module Installed",
+                                        "pywin32 was installed. The application will now restart.")
+                    os.execv(sys.executable, [sys.executable] + sys.argv)
+                except Exception as e:
+                    print(f"Error installing pywin32: {e}")
+                    messagebox.showerror("Installation Error", f"Failed to install pywin32: {e}")
+                    sys.exit(1)
+
+        mark_deps_verified()
 
     # Check if shortcut already exists before asking
     shortcut_exists = False
@@ -289,8 +298,8 @@ def main():
         print("Successfully loaded all modules and components")
 
         app = AutoClickerApp(root)
-        app.recorder = Recorder(app)
-        app.player = Player(app)
+        app.recorder = Recorder(app, app.backend)
+        app.player = Player(app, app.backend)
 
         app.start_recording = app.recorder.start_recording
         app.stop_recording = app.recorder.stop_recording
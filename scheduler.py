@@ -0,0 +1,479 @@
+"""Scheduled macro playback.
+
+Jobs are kept in a JSON file so they survive restarts. Each job plays a
+saved macro file following one of three rules:
+
+    {"type": "once", "at": "2024-05-01 09:30"}
+    {"type": "window", "start": "09:00", "end": "17:30", "days": [0, 1, 2, 3, 4]}
+    {"type": "cron", "expr": "*/15 9-17 * * 1-5"}
+
+A window job loops the macro from the window start until its end (days are
+0 = Monday, windows may cross midnight). Cron expressions use the usual
+minute, hour, day of month, month and day of week fields (0 = Sunday).
+
+One worker thread keeps the due times in a heap and sleeps on a condition
+until the earliest one, so nothing polls between jobs. Due jobs are handed
+to a runner thread that plays them one after another through Player.
+
+Usage: python -m scheduler [--store schedule.json]
+"""
+import argparse
+import heapq
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from macro_io import load_actions
+from journal import is_journal_path, JournalReader
+
+SCHEDULE_FILE = "schedule.json"
+STOP_HOTKEY = "esc"  # Stops the job that is playing
+RULE_TYPES = ("once", "window", "cron")
+
+# One-shot jobs missed by more than this (app closed) are not run late
+MISFIRE_GRACE = 60
+# Longest single sleep, so suspend/resume or clock changes are noticed
+MAX_WAIT = 300
+
+CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def parse_datetime(text):
+    """Parse 'YYYY-MM-DD HH:MM' (seconds optional)"""
+    return datetime.fromisoformat(text.strip())
+
+
+def parse_clock(text):
+    """Parse 'HH:MM' into (hour, minute)"""
+    hour, minute = text.strip().split(":")
+    hour, minute = int(hour), int(minute)
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid time of day: {text}")
+    return hour, minute
+
+
+def _parse_cron_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/")
+            step = int(step)
+            if step < 1:
+                raise ValueError(f"Invalid cron step: {step}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-"))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not (low <= start <= end <= high):
+            raise ValueError(f"Cron value out of range: {part}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronRule:
+    """Five-field cron expression"""
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError("A cron expression needs 5 fields: minute hour day month weekday")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_cron_field(field, low, high)
+            for field, (low, high) in zip(fields, CRON_RANGES))
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        # Like cron: when both fields are restricted either one may match
+        if not self.any_day and not self.any_weekday:
+            return day or weekday
+        return day and weekday
+
+    def next_after(self, moment):
+        """First matching minute strictly after moment, None if there is none"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                month = moment.month % 12 + 1
+                moment = moment.replace(year=moment.year + (month == 1), month=month,
+                                        day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        return None
+
+
+def next_window(rule, after):
+    """(start, end) of the first window that has not ended at after"""
+    start_clock = parse_clock(rule["start"])
+    end_clock = parse_clock(rule["end"])
+    days = rule.get("days")
+    for offset in range(-1, 8):
+        day = after.date() + timedelta(days=offset)
+        if days and day.weekday() not in days:
+            continue
+        start = datetime.combine(day, datetime.min.time()).replace(
+            hour=start_clock[0], minute=start_clock[1])
+        end = start.replace(hour=end_clock[0], minute=end_clock[1])
+        if end <= start:
+            end += timedelta(days=1)  # Window crosses midnight
+        if end > after:
+            return max(start, after), end
+    return None
+
+
+def next_run(job, after):
+    """Next (start, end) of a job after the given datetime, or None.
+
+    end is only set for window jobs.
+    """
+    if not job.get("enabled", True):
+        return None
+    rule = job["rule"]
+    if rule["type"] == "once":
+        if job.get("last_run"):
+            return None
+        at = parse_datetime(rule["at"])
+        if at < after - timedelta(seconds=MISFIRE_GRACE):
+            return None
+        return max(at, after), None
+    if rule["type"] == "window":
+        return next_window(rule, after)
+    if rule["type"] == "cron":
+        start = CronRule(rule["expr"]).next_after(after)
+        return (start, None) if start else None
+    raise ValueError(f"Unknown schedule rule: {rule['type']}")
+
+
+def validate_job(job):
+    """Raise ValueError if a job cannot be scheduled"""
+    rule = job.get("rule") or {}
+    if rule.get("type") not in RULE_TYPES:
+        raise ValueError(f"Unknown schedule rule: {rule.get('type')}")
+    if not job.get("macro"):
+        raise ValueError("A scheduled job needs a macro file")
+    if rule["type"] == "once":
+        parse_datetime(rule["at"])
+    elif rule["type"] == "window":
+        parse_clock(rule["start"])
+        parse_clock(rule["end"])
+    else:
+        CronRule(rule["expr"])
+
+
+def describe_rule(rule):
+    """Short human readable form of a rule for the job list"""
+    if rule["type"] == "once":
+        return f"Once at {rule['at']}"
+    if rule["type"] == "window":
+        days = rule.get("days")
+        suffix = " on " + ",".join("MTWTFSS"[day] for day in days) if days else " daily"
+        return f"From {rule['start']} to {rule['end']}{suffix}"
+    return f"Cron {rule['expr']}"
+
+
+class JobStore:
+    """Jobs persisted as a JSON list of dicts"""
+
+    def __init__(self, path=SCHEDULE_FILE):
+        self.path = path
+        self.jobs = []
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            self.jobs = []
+            return
+        try:
+            with open(self.path) as f:
+                self.jobs = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read schedule {self.path}: {e}")
+            self.jobs = []
+
+    def save(self):
+        # Write then rename, so a crash never leaves half a file behind
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.jobs, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def get(self, job_id):
+        for job in self.jobs:
+            if job["id"] == job_id:
+                return job
+        return None
+
+
+class Scheduler:
+    """Runs the jobs of a JobStore at their due times.
+
+    on_event(job, message) is called from the scheduler threads whenever a
+    job starts, finishes or fails. can_run() is asked before each run, so a
+    job does not fight the user over the mouse while they record or play,
+    and running_job is set while a job plays so the GUI can refuse to start
+    in turn. STOP_HOTKEY stops a playing job.
+    """
+
+    def __init__(self, store_path=SCHEDULE_FILE, backend=None, on_event=None, can_run=None,
+                 library=None):
+        self.store = JobStore(store_path)
+        self.backend = backend
+        self.on_event = on_event
+        self.can_run = can_run
+        self.library = library  # MacroLibrary that keeps the last run stats, if any
+        self.player = None
+        self.running_job = None
+        self.heap = []
+        self.sequence = 0
+        self.open_windows = {}  # job id -> end timestamp of the window being played
+        self.condition = threading.Condition()
+        self.runs = queue.SimpleQueue()
+        self.stopped = True
+        self.worker = None
+        self.runner = None
+
+    @property
+    def jobs(self):
+        return self.store.jobs
+
+    def start(self):
+        """Start the worker and runner threads"""
+        if not self.stopped:
+            return
+        self.stopped = False
+        with self.condition:
+            self._rebuild()
+        self.worker = threading.Thread(target=self._timer_loop)
+        self.worker.daemon = True
+        self.worker.start()
+        self.runner = threading.Thread(target=self._run_loop)
+        self.runner.daemon = True
+        self.runner.start()
+
+    def stop(self):
+        """Stop the threads, interrupting a job that is playing"""
+        if self.stopped:
+            return
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.runs.put(None)
+        if self.player is not None:
+            self.player.stop_playback()
+        for thread in (self.worker, self.runner):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join()
+        self.worker = self.runner = None
+
+    def add_job(self, macro, rule, loops=1, speed=1.0, name=None):
+        """Add a job and return it"""
+        job = {
+            "id": uuid.uuid4().hex[:8],
+            "name": name or os.path.splitext(os.path.basename(macro))[0],
+            "macro": macro,
+            "rule": rule,
+            "loops": loops,
+            "speed": speed,
+            "enabled": True,
+            "last_run": None,
+        }
+        validate_job(job)
+        with self.condition:
+            self.store.jobs.append(job)
+            self._changed()
+        return job
+
+    def remove_job(self, job_id):
+        with self.condition:
+            self.store.jobs = [job for job in self.store.jobs if job["id"] != job_id]
+            self._changed()
+        if self.running_job is not None and self.running_job["id"] == job_id:
+            self.player.stop_playback()
+
+    def set_enabled(self, job_id, enabled):
+        with self.condition:
+            job = self.store.get(job_id)
+            if job is not None:
+                job["enabled"] = enabled
+                self._changed()
+
+    def next_due(self, job):
+        """When a job runs next, as a datetime or None"""
+        run = next_run(job, datetime.now())
+        return run[0] if run else None
+
+    def _changed(self):
+        """Save the store and reschedule, called with the condition held"""
+        self.store.save()
+        self._rebuild()
+        self.condition.notify()
+
+    def _rebuild(self):
+        """Recompute the heap from the jobs, called with the condition held"""
+        # Stop entries of windows already playing must survive the rebuild
+        self.heap = [entry for entry in self.heap if entry[2] == "stop"]
+        heapq.heapify(self.heap)
+        now = datetime.now()
+        for job in self.store.jobs:
+            end = self.open_windows.get(job["id"])
+            after = datetime.fromtimestamp(end) + timedelta(seconds=1) if end else now
+            self._push_next(job, max(after, now))
+
+    def _push(self, due, action, job_id, end=None):
+        heapq.heappush(self.heap, (due, self.sequence, action, job_id, end))
+        self.sequence += 1
+
+    def _push_next(self, job, after):
+        try:
+            run = next_run(job, after)
+        except ValueError as e:
+            print(f"Skipping scheduled job {job.get('name')}: {e}")
+            return
+        if run is not None:
+            start, end = run
+            self._push(start.timestamp(), "start", job["id"],
+                       end.timestamp() if end else None)
+
+    def _timer_loop(self):
+        with self.condition:
+            while not self.stopped:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                remaining = self.heap[0][0] - time.time()
+                if remaining > 0:
+                    self.condition.wait(min(remaining, MAX_WAIT))
+                    continue
+                due, _, action, job_id, end = heapq.heappop(self.heap)
+                self._fire(due, action, job_id, end)
+
+    def _fire(self, due, action, job_id, end):
+        """Handle a due heap entry, called with the condition held"""
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        if action == "stop":
+            self.open_windows.pop(job_id, None)
+            if self.running_job is job and self.player is not None:
+                self.player.stop_playback()
+            return
+
+        self.runs.put((job, end))
+        if end is not None:
+            self.open_windows[job_id] = end
+            self._push(end, "stop", job_id)
+        if job["rule"]["type"] == "once":
+            # Mark it right away so a rebuild before it plays cannot queue it twice
+            job["last_run"] = datetime.now().isoformat(timespec="seconds")
+            self._save()
+            return
+        # The next occurrence starts after this one (and its window) is over
+        after = datetime.fromtimestamp(end if end is not None else due)
+        self._push_next(job, after + timedelta(seconds=1))
+
+    def _run_loop(self):
+        while True:
+            run = self.runs.get()
+            if run is None or self.stopped:
+                break
+            job, end = run
+            if end is not None and time.time() >= end:
+                continue  # Waited behind another job until its window closed
+            if self.can_run is not None and not self.can_run():
+                self._notify(job, "skipped, recorder or player busy")
+                continue
+            self._run_job(job, end)
+
+    def _run_job(self, job, end):
+        # Imported here so the scheduler module loads without the input libraries
+        from player import Player
+
+        try:
+            if is_journal_path(job["macro"]):
+                actions = JournalReader(job["macro"])
+            else:
+                actions = load_actions(job["macro"])
+        except (OSError, ValueError) as e:
+            self._notify(job, f"could not load {job['macro']}: {e}")
+            return
+
+        if self.player is None:
+            self.player = Player(None, self.backend)
+        # Window jobs loop until the stop entry at the end of the window
+        loops = -1 if end is not None else job.get("loops", 1)
+
+        self.running_job = job
+        self._notify(job, "started")
+        try:
+            timing = self.player.play(actions, loops, job.get("speed", 1.0),
+                                      stop_hotkeys=(STOP_HOTKEY,))
+        except Exception as e:
+            self._notify(job, f"failed: {e}")
+            timing = None
+        finally:
+            self.running_job = None
+            if hasattr(actions, "close"):
+                actions.close()  # Journals and containers keep their file open
+
+        with self.condition:
+            job["last_run"] = datetime.now().isoformat(timespec="seconds")
+            self._save()
+        if timing is not None:
+            if self.library is not None:
+                self.library.record_run(job["macro"], timing)
+            self._notify(job, f"finished, {timing['count']} actions")
+
+    def _save(self):
+        try:
+            self.store.save()
+        except OSError as e:
+            print(f"Could not save schedule: {e}")
+
+    def _notify(self, job, message):
+        if self.on_event is not None:
+            self.on_event(job, message)
+        else:
+            print(f"[{datetime.now():%H:%M:%S}] {job['name']}: {message}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scheduler",
+                                     description="Run scheduled macros without the GUI.")
+    parser.add_argument("--store", default=SCHEDULE_FILE,
+                        help=f"Job store file (default: {SCHEDULE_FILE})")
+    args = parser.parse_args(argv)
+
+    scheduler = Scheduler(args.store)
+    for job in scheduler.jobs:
+        due = scheduler.next_due(job)
+        print(f"{job['name']}: {describe_rule(job['rule'])}, next run {due or 'never'}")
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
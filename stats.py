@@ -0,0 +1,148 @@
+"""Latency histograms for profiling playback and recording.
+
+LatencyHistogram is HDR style: values (integer nanoseconds) go into
+log-linear buckets, 64 to 128 per power of two, so any percentile is known
+to within about 1.6% whatever the range, and recording a value is a couple
+of integer operations and a dict update.
+"""
+import csv
+import json
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUMMARY_PERCENTILES = (50, 90, 99, 99.9)
+
+
+def bucket_index(value):
+    """Bucket of a non-negative integer value"""
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+
+def bucket_value(index):
+    """Middle of the value range covered by a bucket"""
+    shift = index >> SUB_BUCKET_BITS
+    if shift == 0:
+        return index
+    low = (index & (SUB_BUCKET_COUNT - 1)) << shift
+    return low + (1 << (shift - 1))
+
+
+class LatencyHistogram:
+    """Log-linear histogram of nanosecond durations"""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        value = max(0, int(value))
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """Value at or below which percent of the recorded values fall"""
+        if not self.count:
+            return 0
+        target = max(1, round(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(max(bucket_value(index), self.min), self.max)
+        return self.max
+
+    def summary(self):
+        """Count, mean, min, max and percentiles in milliseconds"""
+        result = {
+            "count": self.count,
+            "mean_ms": self.mean() / 1e6,
+            "min_ms": (self.min or 0) / 1e6,
+            "max_ms": (self.max or 0) / 1e6,
+        }
+        for percent in SUMMARY_PERCENTILES:
+            result[f"p{percent:g}_ms"] = self.percentile(percent) / 1e6
+        return result
+
+
+class HistogramSet:
+    """Histograms keyed by (metric, label), e.g. ("backend", "mouse_click")"""
+
+    def __init__(self):
+        self.histograms = {}
+
+    def get(self, metric, label):
+        key = (metric, label)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        return histogram
+
+    def record(self, metric, label, value):
+        self.get(metric, label).record(value)
+
+    def __bool__(self):
+        return bool(self.histograms)
+
+    def rows(self):
+        """One summary dict per non-empty histogram, sorted by metric and label"""
+        rows = []
+        for (metric, label), histogram in sorted(self.histograms.items()):
+            if not histogram.count:
+                continue
+            row = {"metric": metric, "label": label}
+            row.update(histogram.summary())
+            rows.append(row)
+        return rows
+
+    def to_dict(self):
+        return {"histograms": self.rows()}
+
+    def export_json(self, path, extra=None):
+        data = self.to_dict()
+        if extra:
+            data.update(extra)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def export_csv(self, path):
+        rows = self.rows()
+        fields = ["metric", "label", "count", "mean_ms", "min_ms", "max_ms"]
+        fields += [f"p{percent:g}_ms" for percent in SUMMARY_PERCENTILES]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def format_table(self):
+        """Plain text table for the Stats tab"""
+        lines = [f"{'metric':<10} {'action':<14} {'count':>8} {'mean':>9} {'p50':>9} "
+                 f"{'p99':>9} {'max':>9}  (ms)"]
+        for row in self.rows():
+            lines.append(f"{row['metric']:<10} {row['label']:<14} {row['count']:>8} "
+                         f"{row['mean_ms']:>9.3f} {row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f} "
+                         f"{row['max_ms']:>9.3f}")
+        return "\n".join(lines)
@@ -2,8 +2,22 @@ import os
 import platform
 import ctypes
 import sys
-import tkinter as tk
-from tkinter import messagebox
+import subprocess
+import hashlib
+import importlib.util
+
+# Import name -> pip package for everything the app needs
+REQUIRED_MODULES = {
+    "pyautogui": "pyautogui",
+    "keyboard": "keyboard",
+    "PIL": "Pillow",
+    "pynput": "pynput"
+}
+if platform.system() == "Windows":
+    REQUIRED_MODULES["win32com"] = "pywin32"
+
+# Written inside the venv once all modules are found, so later launches skip the checks
+DEPS_STAMP = ".deps_verified"
 
 def get_system_info():
     """Get information about the operating system"""
@@ -35,29 +49,43 @@ def require_admin():
         sys.exit(0)
 
 def is_module_available(module_name):
-    """Check if a Python module is available"""
+    """Check if a Python module is available, without importing it"""
     try:
-        __import__(module_name)
-        return True
-    except ImportError:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
         return False
 
+def required_packages():
+    """Pip packages needed by the app"""
+    return list(REQUIRED_MODULES.values())
+
 def check_required_modules():
-    """Check if all required modules are available"""
-    required_modules = {
-        "pyautogui": "pyautogui",
-        "keyboard": "keyboard",
-        "PIL": "Pillow",
-        "pynput": "pynput"
-    }
+    """Return the pip packages whose modules are missing"""
+    return [package for module, package in REQUIRED_MODULES.items()
+            if not is_module_available(module)]
+
+def requirements_hash():
+    """Hash of the required packages, so the stamp goes stale when they change"""
+    text = "\n".join(f"{module}={package}" for module, package in sorted(REQUIRED_MODULES.items()))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def deps_verified(prefix=None):
+    """Check the stamp left in a venv by mark_deps_verified"""
+    prefix = prefix or sys.prefix
+    try:
+        with open(os.path.join(prefix, DEPS_STAMP)) as f:
+            return f.read().strip() == requirements_hash()
+    except OSError:
+        return False
 
-    missing_modules = []
-    for module, package in required_modules.items():
-        try:
-            __import__(module)
-        except ImportError:
-            missing_modules.append(package)
-    return missing_modules
+def mark_deps_verified(prefix=None):
+    """Remember that every required module is installed in this venv"""
+    prefix = prefix or sys.prefix
+    try:
+        with open(os.path.join(prefix, DEPS_STAMP), "w") as f:
+            f.write(requirements_hash())
+    except OSError as e:
+        print(f"Could not write dependency stamp: {e}")
 
 def install_missing_modules(modules):
     """Try to install missing modules using pip"""
@@ -83,6 +111,8 @@ def center_window(window):
 
 def create_tooltip(widget, text):
     """Create a tooltip for a widget"""
+    # tkinter is imported by the GUI functions only, run.py's fast path never loads it
+    import tkinter as tk
     def enter(event):
         x, y, _, _ = widget.bbox("insert")
         x += widget.winfo_rootx() + 25
@@ -136,6 +166,7 @@ Features:
 
 This software is open source and provided as-is without warranty.
 """
+    from tkinter import messagebox
     messagebox.showinfo("About Python AutoClicker", about_text, parent=parent)
 
 def show_help_dialog(parent):
@@ -166,4 +197,5 @@ Tips:
 - Export to Python script creates a standalone automation script
 - Right-click on actions in the list to edit or delete them
 """
+    from tkinter import messagebox
     messagebox.showinfo("Help", help_text, parent=parent)
\ No newline at end of file
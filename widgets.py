@@ -0,0 +1,187 @@
+import tkinter as tk
+from tkinter import ttk
+import tkinter.font as tkfont
+
+
+class VirtualListbox(ttk.Frame):
+    """Listbox that only renders the rows currently on screen.
+
+    Items can be any sequence supporting len() and indexing; each visible
+    row is turned into text by the formatter when it scrolls into view, so
+    the cost of a refresh depends on the window height, not the item count.
+    Indices passed to and returned from this widget are item indices.
+    The selection is one contiguous range: click selects an item, shift-click
+    and shift-arrow extend the range from the anchor.
+    """
+
+    def __init__(self, parent, formatter, **listbox_options):
+        super().__init__(parent)
+        self.formatter = formatter
+        self.items = []
+        self.top = 0
+        self.rows = 1
+        self.selected = None  # Active end of the selection
+        self.anchor = None  # Fixed end of the selection
+
+        self.scrollbar = ttk.Scrollbar(self, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.listbox = tk.Listbox(self, exportselection=False, **listbox_options)
+        self.listbox.pack(fill=tk.BOTH, expand=True)
+
+        font = tkfont.Font(font=self.listbox.cget("font"))
+        self.row_height = font.metrics("linespace") + 1
+
+        self.listbox.bind("<Configure>", self._on_configure)
+        self.listbox.bind("<<ListboxSelect>>", self._on_select)
+        self.listbox.bind("<MouseWheel>", self._on_mousewheel)
+        self.listbox.bind("<Button-4>", lambda event: self.yview("scroll", -3, "units"))
+        self.listbox.bind("<Button-5>", lambda event: self.yview("scroll", 3, "units"))
+        self.listbox.bind("<Up>", lambda event: self._move_selection(-1))
+        self.listbox.bind("<Down>", lambda event: self._move_selection(1))
+        self.listbox.bind("<Prior>", lambda event: self._move_selection(-self.rows))
+        self.listbox.bind("<Next>", lambda event: self._move_selection(self.rows))
+        self.listbox.bind("<Shift-Button-1>", self._on_shift_click)
+        self.listbox.bind("<Shift-Up>", lambda event: self._move_selection(-1, extend=True))
+        self.listbox.bind("<Shift-Down>", lambda event: self._move_selection(1, extend=True))
+
+    def set_items(self, items):
+        """Show a new sequence of items"""
+        self.items = items
+        self.selected = self.anchor = None
+        self.top = 0
+        self.refresh()
+
+    def size(self):
+        return len(self.items)
+
+    def refresh(self):
+        """Re-render the visible rows, e.g. after the items were edited"""
+        total = len(self.items)
+        self.top = max(0, min(self.top, total - self.rows))
+        if self.selected is not None and self.selected >= total:
+            self.selected = total - 1 if total else None
+        if self.anchor is not None and self.anchor >= total:
+            self.anchor = self.selected
+
+        end = min(total, self.top + self.rows)
+        self.listbox.delete(0, tk.END)
+        if end > self.top:
+            self.listbox.insert(tk.END, *[self.formatter(self.items[index])
+                                          for index in range(self.top, end)])
+
+        self._highlight()
+
+        if total:
+            self.scrollbar.set(self.top / total, end / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def yview(self, *args):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", n, "units"/"pages")"""
+        total = len(self.items)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self.rows
+            self.top += step
+        self.refresh()
+
+    def see(self, index):
+        """Scroll so the item at index is visible"""
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.rows:
+            self.top = index - self.rows + 1
+        else:
+            return
+        self.refresh()
+
+    def nearest(self, y):
+        """Index of the item closest to a y coordinate inside the widget"""
+        if not self.items:
+            return 0
+        return min(self.top + self.listbox.nearest(y), len(self.items) - 1)
+
+    def selection_range(self):
+        """(start, stop) of the selected items, or None"""
+        if self.selected is None:
+            return None
+        anchor = self.selected if self.anchor is None else self.anchor
+        return min(anchor, self.selected), max(anchor, self.selected) + 1
+
+    def curselection(self):
+        selection = self.selection_range()
+        return tuple(range(*selection)) if selection else ()
+
+    def selection_clear(self, first=0, last=None):
+        self.selected = self.anchor = None
+        self.listbox.selection_clear(0, tk.END)
+
+    def selection_set(self, first, last=None):
+        """Select one item, or the items from first to last inclusive"""
+        total = len(self.items)
+        if not 0 <= first < total:
+            return
+        self.anchor = first
+        self.selected = first if last is None else max(0, min(last, total - 1))
+        self.listbox.selection_clear(0, tk.END)
+        self._highlight()
+
+    def bind(self, sequence=None, func=None, add=None):
+        """Bind events on the inner listbox"""
+        return self.listbox.bind(sequence, func, add)
+
+    def _highlight(self):
+        """Select the rendered rows that fall inside the selection"""
+        selection = self.selection_range()
+        if selection:
+            first = max(selection[0], self.top)
+            last = min(selection[1], self.top + self.rows, len(self.items))
+            if first < last:
+                self.listbox.selection_set(first - self.top, last - 1 - self.top)
+
+    def _on_configure(self, event):
+        rows = max(1, event.height // self.row_height)
+        if rows != self.rows:
+            self.rows = rows
+            self.refresh()
+
+    def _on_select(self, event):
+        local = self.listbox.curselection()
+        if local:
+            self.selected = self.anchor = self.top + local[0]
+
+    def _on_shift_click(self, event):
+        if self.items:
+            index = self.nearest(event.y)
+            if self.anchor is None:
+                self.anchor = index
+            self.selected = index
+            self.listbox.selection_clear(0, tk.END)
+            self._highlight()
+        return "break"
+
+    def _on_mousewheel(self, event):
+        self.yview("scroll", -3 if event.delta > 0 else 3, "units")
+        return "break"
+
+    def _move_selection(self, step, extend=False):
+        if not self.items:
+            return "break"
+        current = self.selected if self.selected is not None else self.top
+        index = max(0, min(len(self.items) - 1, current + step))
+        if extend:
+            if self.anchor is None:
+                self.anchor = current
+            self.selected = index
+            self.see(index)
+            self.listbox.selection_clear(0, tk.END)
+            self._highlight()
+            return "break"
+        self.selection_set(index)
+        self.see(index)
+        self.listbox.event_generate("<<ListboxSelect>>")
+        return "break"